@@ -0,0 +1,89 @@
+"""
+Время и память на один график: встроенный рендерер против matplotlib.
+
+Каждый рендерер запускается в отдельном процессе, как воркер пула
+отрисовки: измеряются время импорта, прирост RSS после импорта и
+после серии графиков, среднее и p95 время на график и пик выделенной
+памяти на график (tracemalloc).
+
+Запуск:
+    python benchmarks/bench_charts.py --charts 50 --points 200
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKENDS = ("lite", "matplotlib")
+
+
+def make_series(points):
+    start = datetime(2024, 1, 1, 8, 0)
+    times = [start + timedelta(minutes=3 * i) for i in range(points)]
+    values = [250 * (i + 1) for i in range(points)]
+    return times, values
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend, charts, points):
+    """Выполняется в дочернем процессе."""
+    rss_start = rss_mb()
+    started = time.perf_counter()
+    if backend == "lite":
+        from lite_chart import render_progress_png
+    else:
+        try:
+            from rendering import render_progress_png_matplotlib as render_progress_png
+            render_progress_png("warmup", [], [], [], [])
+        except ImportError:
+            print(f"{backend:>11}: не установлен")
+            return
+    import_time = time.perf_counter() - started
+    rss_import = rss_mb()
+
+    times, values = make_series(points)
+    render_progress_png("warmup", times, values, times, values)
+    durations = []
+    size = 0
+    for i in range(charts):
+        started = time.perf_counter()
+        size = len(render_progress_png(f"bench {i}", times, values, times, values))
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    render_progress_png("traced", times, values, times, values)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations.sort()
+    print(f"{backend:>11}: импорт {import_time * 1000:6.0f} мс (RSS +{rss_import - rss_start:5.1f} МБ), "
+          f"график в среднем {sum(durations) / charts * 1000:6.1f} мс, p95 {durations[int(charts * 0.95) - 1] * 1000:6.1f} мс, "
+          f"пик памяти {peak / 1024 / 1024:5.1f} МБ, RSS итого {rss_mb():5.1f} МБ, PNG {size / 1024:.0f} КБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=50)
+    parser.add_argument("--points", type=int, default=200, help="точек в каждом ряду")
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        measure(args.backend, args.charts, args.points)
+        return
+    for backend in BACKENDS:
+        subprocess.run([sys.executable, __file__, "--backend", backend,
+                        "--charts", str(args.charts), "--points", str(args.points)], check=True)
+
+
+if __name__ == "__main__":
+    main()
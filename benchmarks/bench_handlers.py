@@ -0,0 +1,172 @@
+"""
+Сквозной бенчмарк обработчиков бота на синтетических обновлениях.
+
+N пользователей параллельно проходят /set_profile, а затем несколько
+раундов /log_water, /log_food (+ граммы), /log_workout, /check_progress,
+/recommend и /show_graph. Погода, поиск продуктов и Bot API заменены
+локальными заглушками с задержкой; графики рисуются по-настоящему.
+
+Отчет: пропускная способность, задержки по командам (p50/p95/p99)
+и пиковая память процесса. Результат можно сохранить и сравнить с
+прошлым запуском — при замедлении скрипт завершится с кодом 1:
+
+    python benchmarks/bench_handlers.py --users 200 --save baseline.json
+    python benchmarks/bench_handlers.py --users 200 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import bot  # noqa: E402
+import products  # noqa: E402
+from fakes import Outbox, dispatch, make_update  # noqa: E402
+
+FOODS = ["яблоко", "банан", "гречка", "творог", "хлеб", "молоко", "курица", "рис"]
+WORKOUTS = ["бег", "ходьба", "велосипед", "плавание", "йога"]
+
+
+def install_stubs(weather_latency, product_latency):
+    async def fetch_weather(city):
+        await asyncio.sleep(weather_latency)
+        return 15.0 + hash(city) % 20
+
+    async def fetch_product(query):
+        await asyncio.sleep(product_latency)
+        return query.capitalize(), 50.0 + hash(query) % 300
+
+    bot.fetch_weather = fetch_weather
+    products.fetch_product = fetch_product
+
+
+def user_script(user_id, rounds):
+    rng = random.Random(user_id)
+    script = ["/set_profile", str(rng.randint(50, 110)), str(rng.randint(150, 200)),
+              str(rng.randint(18, 70)), str(rng.choice([0, 30, 60, 90])), f"City{user_id % 50}"]
+    for _ in range(rounds):
+        script += [
+            f"/log_water {rng.choice([150, 250, 330, 500])}",
+            f"/log_food {rng.choice(FOODS)}",
+            str(rng.randint(50, 300)),
+            f"/log_workout {rng.choice(WORKOUTS)} {rng.choice([15, 30, 45, 60])}",
+            "/check_progress",
+            "/recommend",
+        ]
+    script += ["/show_graph", "/show_graph"]
+    return script
+
+
+def command_name(text):
+    return text.split()[0] if text.startswith("/") else "<text>"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(args):
+    install_stubs(args.weather_latency, args.product_latency)
+    outbox = Outbox(latency=args.api_latency)
+    latencies = defaultdict(list)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def simulate(user_id):
+        async with semaphore:
+            for text in user_script(user_id, args.rounds):
+                update, context = make_update(user_id, text, outbox)
+                started = time.perf_counter()
+                await dispatch(bot, update, context)
+                latencies[command_name(text)].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(user_id) for user_id in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - started
+    bot.render_pool.shutdown()
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "users": args.users,
+        "updates": total,
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "commands": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+            }
+            for name, values in sorted(latencies.items())
+        },
+    }
+
+
+def report(result):
+    print(f"Пользователей: {result['users']}, обновлений: {result['updates']}, "
+          f"время: {result['elapsed']:.2f} с, {result['throughput']:.0f} обн/с, "
+          f"пик RSS: {result['peak_rss_mb']:.0f} МБ")
+    print(f"{'команда':<16}{'кол-во':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for name, stats in result["commands"].items():
+        print(f"{name:<16}{stats['count']:>8}{stats['p50'] * 1000:>10.2f}"
+              f"{stats['p95'] * 1000:>10.2f}{stats['p99'] * 1000:>10.2f}")
+
+
+def compare(result, baseline, tolerance):
+    """Печатает изменения относительно baseline и возвращает число регрессий."""
+    regressions = 0
+    print(f"\nСравнение с базовым запуском (допуск {tolerance:.0%}):")
+    ratio = result["throughput"] / baseline["throughput"]
+    print(f"{'throughput':<16}{ratio:>8.2f}x")
+    if ratio < 1 - tolerance:
+        regressions += 1
+    for name, stats in result["commands"].items():
+        base = baseline["commands"].get(name)
+        if base is None:
+            continue
+        for key in ("p50", "p95"):
+            change = stats[key] / base[key] if base[key] else 1.0
+            mark = ""
+            if change > 1 + tolerance:
+                mark = "  <-- регрессия"
+                regressions += 1
+            print(f"{name:<16}{key:>8}{base[key] * 1000:>10.2f} -> {stats[key] * 1000:.2f} мс ({change:.2f}x){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="раундов логирования на пользователя")
+    parser.add_argument("--concurrency", type=int, default=50, help="пользователей одновременно")
+    parser.add_argument("--weather-latency", type=float, default=0.1)
+    parser.add_argument("--product-latency", type=float, default=0.2)
+    parser.add_argument("--api-latency", type=float, default=0.02, help="задержка Bot API на ответ")
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="сравнить с сохраненным результатом")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    report(result)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Проверка отзывчивости цикла событий при медленных внешних сервисах.
+
+Поднимает локальную заглушку OpenWeatherMap/OpenFoodFacts с задержкой,
+параллельно запускает много вызовов get_weather/search_product и
+замеряет, насколько опаздывает "тикер", который просыпается каждые 10 мс.
+Если HTTP-вызовы блокируют цикл, задержка тикера будет порядка задержки сервиса.
+
+Запуск:
+    python benchmarks/bench_http.py --latency 0.5 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import bot  # noqa: E402
+from http_client import upstream  # noqa: E402
+from stub_server import StubServer, upstreams_handler  # noqa: E402
+
+TICK = 0.01
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def run(latency, n_requests):
+    async with StubServer(upstreams_handler, latency=latency) as stub:
+        config.OPENWEATHERMAP_URL = stub.url + "/data/2.5/weather"
+        config.OPENFOODFACTS_URL = stub.url + "/cgi/search.pl"
+
+        lags = []
+        stop = asyncio.Event()
+        tick_task = asyncio.create_task(ticker(lags, stop))
+
+        started = time.perf_counter()
+        calls = []
+        for i in range(n_requests):
+            if i % 2:
+                calls.append(bot.get_weather(f"City{i}"))
+            else:
+                calls.append(bot.search_product(f"apple {i}"))
+        results = await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await tick_task
+        await upstream.aclose()
+
+    failed = sum(1 for r in results if r is None)
+    lags.sort()
+    print(f"Запросов: {n_requests}, задержка сервиса: {latency * 1000:.0f} мс, ошибок: {failed}")
+    print(f"Общее время: {elapsed:.2f} с, запросов на заглушке: {stub.requests}, "
+          f"максимум одновременно: {stub.max_in_flight}")
+    print(f"Опоздание тикера: p50={lags[len(lags) // 2] * 1000:.1f} мс, "
+          f"p99={lags[int(len(lags) * 0.99)] * 1000:.1f} мс, max={lags[-1] * 1000:.1f} мс")
+    if lags[-1] >= latency / 2:
+        print("ВНИМАНИЕ: цикл событий блокировался на время запроса!")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка заглушки, сек")
+    parser.add_argument("--requests", type=int, default=200, help="число запросов")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.latency, args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Импорт и экспорт истории: время и память на большом файле.
+
+Генерирует NDJSON или CSV с N записями (вода, еда, тренировки) в
+случайном порядке, импортирует его в выбранное хранилище и выгружает
+обратно. Пик RSS показывает, что память не растет с размером файла
+сверх самих логов пользователей.
+
+Запуск:
+    python benchmarks/bench_import.py --entries 100000 --users 10 --format csv
+"""
+import argparse
+import io
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history  # noqa: E402
+from storage import MemoryStorage, SQLiteStorage, UserRegistry  # noqa: E402
+
+
+def generate(entries, n_users):
+    rng = random.Random(1)
+    start = datetime.now() - timedelta(days=180)
+    for user_id in range(1, n_users + 1):
+        yield {"type": "profile", "user_id": user_id, "weight": 70, "height": 175, "age": 30,
+               "activity": 30, "city": "Moscow", "water_goal": 2500, "calorie_goal": 2200}
+    for _ in range(entries):
+        kind = rng.choice(("water", "food", "workout"))
+        record = {"type": kind, "user_id": rng.randint(1, n_users),
+                  "time": (start + timedelta(seconds=rng.randint(0, 180 * 86400))).isoformat()}
+        if kind == "water":
+            record["amount"] = rng.choice([150, 250, 500])
+        else:
+            record["calories"] = rng.randint(50, 600)
+        if kind == "workout":
+            record.update(workout="бег", duration=30)
+        yield record
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--storage", choices=("sqlite", "memory"), default="sqlite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"history.{args.format}")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            history.write_records(generate(args.entries, args.users), f, args.format)
+        print(f"Файл: {os.path.getsize(path) / 1024 / 1024:.1f} МБ, RSS до импорта {rss_mb():.0f} МБ")
+
+        storage = SQLiteStorage(os.path.join(tmp, "bench.db")) if args.storage == "sqlite" else MemoryStorage()
+        users = UserRegistry(storage)
+        started = time.perf_counter()
+        with open(path, encoding="utf-8", newline="") as f:
+            result = history.import_records(history.read_records(f, args.format), users, storage)
+        parsed = time.perf_counter() - started
+        storage.flush()
+        elapsed = time.perf_counter() - started
+        print(f"Импорт: {result['imported']} записей за {elapsed:.2f} с "
+              f"(разбор и логи {parsed:.2f} с), {result['imported'] / elapsed:.0f} зап/с, пик RSS {rss_mb():.0f} МБ")
+
+        started = time.perf_counter()
+        out = io.StringIO()
+        written = history.write_records(
+            (record for user_id in range(1, args.users + 1)
+             for record in history.export_user(user_id, users[user_id])), out, args.format)
+        print(f"Экспорт: {written} записей за {time.perf_counter() - started:.2f} с")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
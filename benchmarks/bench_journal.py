@@ -0,0 +1,142 @@
+"""
+Журнал (STORAGE_BACKEND=journal): цена записи и время восстановления.
+
+Запись: имитирует log_water_entry (добавление в историю, запись в
+хранилище, сохранение профиля) для словаря без хранилища и для журнала
+с fsync и без; показывает задержку вызова, байты журнала на событие и
+сколько событий пришлось на один fsync (group commit). Восстановление:
+новый процесс (здесь — новый JournalStorage) проигрывает весь журнал,
+затем то же из снимка.
+
+Запуск:
+    python benchmarks/bench_journal.py --users 10000 --entries 50
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_logs import DailyLog  # noqa: E402
+from journal import JournalStorage  # noqa: E402
+from storage import MemoryStorage, UserRegistry  # noqa: E402
+
+
+def new_profile():
+    return {
+        "step": None, "weight": 70.0, "height": 175.0, "age": 30, "activity": 30, "city": "Moscow",
+        "water_goal": 2600, "calorie_goal": 1900.0, "log_version": 0,
+        "water_logs": DailyLog(), "food_logs": DailyLog(), "workout_logs": DailyLog(),
+    }
+
+
+def log_entry(users, storage, user_id, dt, amount):
+    user = users[user_id]
+    user["water_logs"].add(dt, amount)
+    user["log_version"] += 1
+    storage.append_water(user_id, dt, amount)
+    storage.save_profile(user_id, user)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write(name, storage, args):
+    users = UserRegistry(storage)
+    for user_id in range(args.users):
+        users[user_id] = new_profile()
+        storage.save_profile(user_id, users[user_id])
+    storage.flush()
+    records = getattr(storage, "stats", {}).get("records", 0)
+    written = getattr(storage, "stats", {}).get("bytes", 0)
+    batches = getattr(storage, "stats", {}).get("batches", 0)
+
+    # Записи за последние дни — чтобы в истории был индекс дней
+    start = datetime.now() - timedelta(days=args.days)
+    step = timedelta(days=args.days) / args.entries
+    order = [(user_id, i) for user_id in range(args.users) for i in range(args.entries)]
+    random.Random(1).shuffle(order)
+    order.sort(key=lambda item: item[1])  # время идет вперед, пользователи вперемешку
+    latencies = []
+    started = time.perf_counter()
+    for user_id, i in order:
+        t = time.perf_counter()
+        log_entry(users, storage, user_id, start + step * i, 250)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    t = time.perf_counter()
+    storage.flush()
+    flushed = time.perf_counter() - t
+
+    line = (f"{name:>14}: {len(order) / elapsed:>8.0f} событий/с, p50={percentile(latencies, 0.5) * 1e6:.1f} мкс, "
+            f"p99={percentile(latencies, 0.99) * 1e6:.1f} мкс, дозапись очереди {flushed * 1000:.0f} мс")
+    if hasattr(storage, "stats"):
+        events = storage.stats["records"] - records
+        line += (f"\n{'':>16}{(storage.stats['bytes'] - written) / len(order):.0f} байт на событие "
+                 f"({events / len(order):.0f} записи журнала), "
+                 f"{events / max(1, storage.stats['batches'] - batches):.0f} записей на fsync")
+    print(line)
+    return users
+
+
+def replay(directory, label):
+    started = time.perf_counter()
+    storage = JournalStorage(directory)
+    storage.warm_up()
+    elapsed = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    replayed = storage.stats["replayed"]
+    rate = f", {replayed / elapsed:.0f} записей/с" if replayed else ""
+    print(f"Восстановление {label}: {elapsed:.2f} с ({replayed} записей журнала{rate}), "
+          f"{size / 2**20:.1f} МБ на диске, RSS {rss_mb():.0f} МБ")
+    return storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--entries", type=int, default=50, help="записей на пользователя")
+    parser.add_argument("--days", type=int, default=30, help="за сколько дней записи")
+    args = parser.parse_args()
+
+    write("dict", MemoryStorage(), args)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JournalStorage(os.path.join(tmp, "no-fsync"), fsync=False)
+        write("журнал", storage, args)
+        storage.close()
+
+        directory = os.path.join(tmp, "journal")
+        # Один большой сегмент: снимок делается только по команде ниже
+        storage = JournalStorage(directory, segment_bytes=2**40, snapshot_interval=10**9)
+        users = write("журнал + fsync", storage, args)
+        storage.close()
+
+        storage = replay(directory, "из журнала")
+        check = random.Random(2).sample(range(args.users), min(100, args.users))
+        for user_id in check:
+            assert list(storage.load_user(user_id)["water_logs"].arrays()[1]) == \
+                list(users[user_id]["water_logs"].arrays()[1])
+        started = time.perf_counter()
+        storage.compact()
+        print(f"Снимок: {time.perf_counter() - started:.2f} с")
+        storage.close()
+
+        storage = replay(directory, "из снимка")
+        for user_id in check:
+            assert storage.load_user(user_id)["log_version"] == users[user_id]["log_version"]
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Память на записи логов: прежний список словарей против DailyLog.
+
+Каждая раскладка строится в отдельном процессе, чтобы честно измерить
+прирост RSS; байты на запись считаются через tracemalloc.
+
+Запуск:
+    python benchmarks/bench_memory.py --entries 1000000 --users 1000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_logs import DailyLog  # noqa: E402
+
+START = datetime(2024, 1, 1, 8, 0)
+
+
+def build_dicts(n_entries, n_users):
+    users = {user_id: [] for user_id in range(n_users)}
+    for i in range(n_entries):
+        users[i % n_users].append({"datetime": START + timedelta(seconds=60 * (i // n_users)), "amount": 250})
+    return users
+
+
+def build_daily_logs(n_entries, n_users):
+    users = {user_id: DailyLog() for user_id in range(n_users)}
+    for i in range(n_entries):
+        users[i % n_users].add(START + timedelta(seconds=60 * (i // n_users)), 250)
+    return users
+
+
+LAYOUTS = {"dicts": build_dicts, "daily_logs": build_daily_logs}
+
+
+def measure(layout, n_entries, n_users):
+    """Выполняется в дочернем процессе."""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = LAYOUTS[layout](n_entries, n_users)
+    elapsed = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{layout:>11}: {traced / n_entries:7.1f} байт/запись, "
+          f"RSS +{(rss_after - rss_before) / 1024:7.1f} МБ, построение {elapsed:.2f} с (с tracemalloc)")
+    del data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--layout", choices=LAYOUTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.layout:
+        measure(args.layout, args.entries, args.users)
+        return
+    for layout in LAYOUTS:
+        subprocess.run([sys.executable, __file__, "--layout", layout,
+                        "--entries", str(args.entries), "--users", str(args.users)], check=True)
+
+
+if __name__ == "__main__":
+    main()
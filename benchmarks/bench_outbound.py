@@ -0,0 +1,109 @@
+"""
+Исходящие сообщения во время рассылки: ограничитель против прямой отправки.
+
+Поднимает заглушку Bot API с лимитами Telegram (--global-limit сообщений в
+секунду всего, --chat-limit в один чат; сверх них — 429 с retry_after) и
+одновременно запускает рассылку (--bulk сообщений разным чатам, как
+напоминания) и поток ответов на команды (--interactive, --reply-rate в
+секунду). Считает ответы 429, потерянные сообщения, задержки ответов на
+команды и время рассылки, а также максимальную длину очередей ограничителя.
+
+Запуск:
+    python benchmarks/bench_outbound.py --bulk 600 --interactive 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from stub_server import StubServer, telegram_api_handler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbound import BULK, OutboundLimiter  # noqa: E402
+
+
+def percentiles(values):
+    if not values:
+        return "нет данных"
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(len(values) * p))] * 1000  # noqa: E731
+    return f"p50={pick(0.5):.0f} мс, p90={pick(0.9):.0f} мс, max={values[-1] * 1000:.0f} мс"
+
+
+async def run(args, limited):
+    floods = []
+    handler = telegram_api_handler(global_limit=args.global_limit, chat_limit=args.chat_limit,
+                                   on_flood=lambda method, chat_id: floods.append(chat_id))
+    async with StubServer(handler, latency=args.latency) as server:
+        limiter = OutboundLimiter() if limited else None
+        bot = ExtBot("1:bench", base_url=f"{server.url}/bot", rate_limiter=limiter)
+        await bot.initialize()
+        lost = 0
+        max_depth = {}
+
+        async def send(chat_id, priority):
+            nonlocal lost
+            kwargs = {"rate_limit_args": {"priority": priority}} if limited else {}
+            try:
+                await bot.send_message(chat_id=chat_id, text="bench", **kwargs)
+            except RetryAfter:
+                lost += 1
+
+        async def replies(latencies):
+            # Ответы на команды приходят равномерно, пока идет рассылка
+            tasks = []
+            for i in range(args.interactive):
+                async def reply(chat_id=1_000_000 + i % 50):
+                    started = time.perf_counter()
+                    await send(chat_id, 0)
+                    latencies.append(time.perf_counter() - started)
+                tasks.append(asyncio.create_task(reply()))
+                await asyncio.sleep(1 / args.reply_rate)
+            await asyncio.gather(*tasks)
+
+        async def sample_depth():
+            while True:
+                for lane, depth in limiter.pending.items():
+                    max_depth[lane] = max(max_depth.get(lane, 0), depth)
+                await asyncio.sleep(0.05)
+
+        sampler = asyncio.create_task(sample_depth()) if limited else None
+        latencies = []
+        started = time.perf_counter()
+        bulk = asyncio.gather(*(send(chat_id, BULK) for chat_id in range(1, args.bulk + 1)))
+        await replies(latencies)
+        await bulk
+        elapsed = time.perf_counter() - started
+        if sampler is not None:
+            sampler.cancel()
+        await bot.shutdown()
+
+    name = "с ограничителем" if limited else "напрямую"
+    print(f"{name}: {args.bulk + args.interactive} сообщений за {elapsed:.1f} с, "
+          f"ответов 429: {len(floods)}, потеряно: {lost}")
+    print(f"    ответы на команды: {percentiles(latencies)}")
+    if limited:
+        print(f"    макс. длина очередей: {max_depth}, повторов: {limiter.stats['retried']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk", type=int, default=600, help="сообщений рассылки")
+    parser.add_argument("--interactive", type=int, default=100, help="ответов на команды")
+    parser.add_argument("--reply-rate", type=float, default=10, help="ответов в секунду")
+    parser.add_argument("--global-limit", type=int, default=30, help="лимит заглушки, сообщений в секунду")
+    parser.add_argument("--chat-limit", type=int, default=3, help="лимит заглушки на чат, сообщений в секунду")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка заглушки, сек")
+    args = parser.parse_args()
+
+    asyncio.run(run(args, limited=False))
+    asyncio.run(run(args, limited=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Графики за период (/show_graph week, month, from..to) для активного пользователя.
+
+Строит DailyLog с записями каждые несколько минут и замеряет агрегацию
+(срез массивов + суммы по часам или по дням) и полную отрисовку графика.
+Агрегация считается через NumPy и, для сравнения, на чистом Python.
+
+Запуск:
+    python benchmarks/bench_periods.py --days 90 --per-day 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aggregation  # noqa: E402
+from daily_logs import DailyLog  # noqa: E402
+from rendering import render_progress_png  # noqa: E402
+
+
+def build_log(days, per_day):
+    rng = random.Random(1)
+    log = DailyLog()
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    for day in range(days):
+        base = start + timedelta(days=day)
+        for i in range(per_day):
+            log.add(base + timedelta(seconds=int(86400 * (i + rng.random()) / per_day)), rng.choice([150, 250, 500]))
+    return log, start
+
+
+def aggregate(log, start, days):
+    first, last = start.date(), (start + timedelta(days=days - 1)).date()
+    start_ts = int(start.timestamp())
+    if days <= 7:
+        times, values = log.range_arrays(start_ts, start_ts + days * 86400)
+        return aggregation.hourly_cumulative(times, values, start_ts, days)
+    return aggregation.daily_totals(*log.day_totals(first, last), first.toordinal(), days)
+
+
+def timeit(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--per-day", type=int, default=100, help="записей в день")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    log, start = build_log(args.days, args.per_day)
+    print(f"Записей: {len(log)} за {args.days} дней")
+    numpy_module = aggregation.load_numpy()
+    for period in (7, args.days):
+        timings = []
+        for name, np in (("numpy", numpy_module), ("python", None)):
+            if name == "numpy" and np is None:
+                continue
+            aggregation.np = np
+            elapsed, values = timeit(lambda: aggregate(log, start, period), args.repeat)
+            timings.append(f"{name} {elapsed * 1000:.2f} мс")
+        aggregation.np = numpy_module
+        print(f"{period:>4} дн.: агрегация — " + ", ".join(timings))
+
+        if period <= 7:
+            xs = [start + timedelta(hours=i) for i in range(period * 24)]
+        else:
+            xs = [start + timedelta(days=i) for i in range(period)]
+        elapsed, png = timeit(lambda: render_progress_png("bench", xs, values, xs, values, 2500, 2000, period > 7),
+                              max(1, args.repeat // 4))
+        print(f"{'':>10}отрисовка {elapsed * 1000:.1f} мс, PNG {len(png) / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
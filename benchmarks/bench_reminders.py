@@ -0,0 +1,84 @@
+"""
+Напоминания для большого числа пользователей.
+
+Замеряет загрузку расписания при старте (одна куча на всех), стоимость
+тиков — снятие наступивших проверок, расчет темпа по логам и перенос
+следующей проверки. Пользователи разбросаны по часовым поясам, так что у
+части из них тихие часы. Скорость отправки — в bench_outbound.py.
+
+Запуск:
+    python benchmarks/bench_reminders.py --users 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_logs import DailyLog  # noqa: E402
+from reminders import ReminderScheduler  # noqa: E402
+from storage import MemoryStorage, UserRegistry  # noqa: E402
+
+TIMEZONES = ["", "Europe/Moscow", "Asia/Yekaterinburg", "Asia/Vladivostok", "+0", "-5"]
+
+
+def build_users(n_users):
+    rng = random.Random(1)
+    storage = MemoryStorage()
+    users = UserRegistry(storage)
+    now = datetime.now()
+    settings = []
+    for user_id in range(1, n_users + 1):
+        water_logs = DailyLog()
+        for _ in range(rng.randint(0, 4)):
+            water_logs.add(now - timedelta(minutes=rng.randint(0, 600)), 250)
+        users[user_id] = {"water_goal": 2500, "calorie_goal": 2000, "water_logs": water_logs,
+                          "food_logs": DailyLog(), "workout_logs": DailyLog()}
+        settings.append((user_id, {"enabled": True, "tz": rng.choice(TIMEZONES)}))
+    return users, storage, settings
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(args):
+    users, storage, settings = build_users(args.users)
+    print(f"Пользователей: {args.users}, RSS {rss_mb():.0f} МБ")
+
+    scheduler = ReminderScheduler(users, storage, interval=args.interval, queue_size=args.users)
+    started = time.perf_counter()
+    scheduler.load(settings)
+    print(f"Загрузка расписания: {(time.perf_counter() - started) * 1000:.0f} мс, RSS {rss_mb():.0f} МБ")
+
+    # Очередь без отправки (её скорость — в bench_outbound.py): только считаем напоминания
+    scheduler._queue = asyncio.Queue()
+    # Тики раз в 30 секунд «ускоренного» времени за один интервал проверок
+    now = time.time()
+    tick_times = []
+    for step in range(1, int(args.interval // 30) + 2):
+        started = time.perf_counter()
+        checked = scheduler.tick(now + step * 30)
+        if checked:
+            tick_times.append((time.perf_counter() - started) / checked)
+    checked = scheduler.stats["checked"]
+    per_check = sum(tick_times) / len(tick_times) * 1e6 if tick_times else 0
+    print(f"Проверок за интервал: {checked}, в среднем {per_check:.1f} мкс на проверку, "
+          f"напоминаний: {scheduler.pending}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--interval", type=float, default=3600, help="сек между проверками пользователя")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
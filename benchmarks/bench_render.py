@@ -0,0 +1,89 @@
+"""
+Задержка цикла событий во время отрисовки графиков.
+
+Отправляет пачку графиков в пул процессов и параллельно измеряет,
+насколько опаздывает "тикер" (имитация текстовых команд), а также
+сколько запросов получили отказ из-за переполненной очереди.
+
+Запуск:
+    python benchmarks/bench_render.py --graphs 50 --points 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rendering import RenderPool, RenderQueueFull, render_progress_png  # noqa: E402
+
+TICK = 0.01
+
+
+def make_series(points):
+    start = datetime(2024, 1, 1, 8, 0)
+    times = [start + timedelta(minutes=3 * i) for i in range(points)]
+    values = [250 * (i + 1) for i in range(points)]
+    return times, values
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def run(graphs, points, workers, queue):
+    pool = RenderPool(workers=workers, max_queue=queue)
+    times, values = make_series(points)
+    # Прогрев процессов
+    await pool.render(render_progress_png, "warmup", times[:2], values[:2], [], [])
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    waits = 0
+    rejected = 0
+
+    async def on_wait():
+        nonlocal waits
+        waits += 1
+
+    async def one():
+        nonlocal rejected
+        try:
+            await pool.render(render_progress_png, "bench", times, values, times, values, on_wait=on_wait)
+        except RenderQueueFull:
+            rejected += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(graphs)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+    pool.shutdown()
+
+    lags.sort()
+    done = graphs - rejected
+    print(f"Графиков: {graphs}, точек: {points}, процессов: {workers}, очередь: {queue}")
+    print(f"Построено: {done} за {elapsed:.2f} с ({done / elapsed:.1f} граф/с), "
+          f"ждали очереди: {waits}, отказов: {rejected}")
+    print(f"Опоздание тикера: p50={lags[len(lags) // 2] * 1000:.1f} мс, "
+          f"p99={lags[int(len(lags) * 0.99)] * 1000:.1f} мс, max={lags[-1] * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graphs", type=int, default=50)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.graphs, args.points, args.workers, args.queue))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Пересчет дневных отчетов и рекомендаций для всех пользователей (reports.py).
+
+Строит синтетические столбцы (нормы и суммы по дням за неделю) на --users
+пользователей и замеряет расчет по столбцам: с NumPy — на всех, на чистом
+Python — на --python-users (пересчитывается на одного пользователя).
+Для сравнения — прежний путь, по одному пользователю за раз. Затем —
+поиск готового отчета (/report, /recommend) и память под отчеты. Отдельно
+замеряется сбор столбцов из SQLite (--sqlite-users пользователей, история
+не загружена в память).
+
+Запуск:
+    python benchmarks/bench_reports.py --users 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # noqa: E402
+from aggregation import load_numpy  # noqa: E402
+from reports import Columns, ReportStore, build, collect  # noqa: E402
+from storage import SQLiteStorage, UserRegistry  # noqa: E402
+
+TODAY = date.today()
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_columns(n_users, days):
+    rng = random.Random(1)
+    columns = Columns(TODAY, days)
+    for user_id in rng.sample(range(1, n_users * 10), n_users):
+        columns.add_user(user_id, rng.choice((1800, 2100, 2500, 3000)), rng.choice((1700, 2000, 2400)), 1)
+    np = load_numpy()
+    if np is not None:
+        generator = np.random.default_rng(1)
+        for values, high in ((columns.water, 3500), (columns.food, 3000), (columns.burned, 800)):
+            np.frombuffer(values)[:] = generator.integers(0, high, len(values))
+    else:
+        for values, high in ((columns.water, 3500), (columns.food, 3000), (columns.burned, 800)):
+            for i in range(len(values)):
+                values[i] = rng.randrange(high)
+    return columns
+
+
+def subset(columns, n_users):
+    part = Columns(columns.today, columns.days)
+    width = n_users * columns.days
+    for name in ("user_ids", "versions", "water_goal", "calorie_goal"):
+        getattr(part, name).extend(getattr(columns, name)[:n_users])
+    for name in ("water", "food", "burned"):
+        getattr(part, name).extend(getattr(columns, name)[:width])
+    return part
+
+
+def one_at_a_time(columns, n_users):
+    """Прежний путь: правила и суммы по одному пользователю за раз."""
+    days = columns.days
+    started = time.perf_counter()
+    for row in range(n_users):
+        today = row * days + days - 1
+        reports.flags_for(columns.water_goal[row], columns.calorie_goal[row],
+                          columns.water[today], columns.food[today], columns.burned[today])
+        single = Columns(columns.today, days)
+        single.add_user(columns.user_ids[row], columns.water_goal[row], columns.calorie_goal[row], 1)
+        build(single, use_numpy=False)
+    return (time.perf_counter() - started) / n_users
+
+
+def run_build(args):
+    started = time.perf_counter()
+    columns = synthetic_columns(args.users, args.days)
+    print(f"Пользователей: {args.users}, столбцы построены за {time.perf_counter() - started:.1f} с, "
+          f"RSS {rss_mb():.0f} МБ")
+
+    store = ReportStore()
+    if load_numpy() is not None:
+        started = time.perf_counter()
+        result = build(columns)
+        elapsed = time.perf_counter() - started
+        print(f"NumPy: {elapsed:.2f} с, {args.users / elapsed:,.0f} польз./с")
+        store.replace(TODAY, args.days, result)
+    else:
+        print("NumPy не установлен — только расчет на чистом Python")
+
+    n_python = min(args.python_users, args.users)
+    started = time.perf_counter()
+    result = build(subset(columns, n_python), use_numpy=False)
+    elapsed = time.perf_counter() - started
+    print(f"Чистый Python: {n_python} польз. за {elapsed:.2f} с, {n_python / elapsed:,.0f} польз./с "
+          f"(на {args.users} — около {elapsed * args.users / n_python:.1f} с)")
+    if not len(store):
+        store.replace(TODAY, args.days, result)
+
+    n_single = min(10_000, args.users)
+    per_user = one_at_a_time(columns, n_single)
+    print(f"По одному пользователю: {per_user * 1e6:.1f} мкс на пользователя "
+          f"(на {args.users} — около {per_user * args.users:.1f} с)")
+
+    ids = list(store._columns["user_ids"][:: max(1, len(store) // 100_000)])
+    random.Random(2).shuffle(ids)
+    started = time.perf_counter()
+    for user_id in ids:
+        store.get(user_id)
+    elapsed = time.perf_counter() - started
+    print(f"Готовый отчет: {elapsed / len(ids) * 1e6:.1f} мкс на поиск, "
+          f"память под отчеты: {store.nbytes / 2**20:.0f} МБ ({store.nbytes / len(store):.0f} байт на пользователя), "
+          f"RSS {rss_mb():.0f} МБ")
+
+
+def run_sqlite(args):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+        now = datetime.now()
+        for user_id in range(1, args.sqlite_users + 1):
+            storage.save_profile(user_id, {"water_goal": 2500, "calorie_goal": 2000, "log_version": 1})
+            for key in ("water_logs", "food_logs"):
+                storage.append_many(key, user_id, [(now - timedelta(days=rng.randrange(args.days), minutes=i), 250)
+                                                   for i in range(rng.randint(3, 15))])
+        storage.flush()
+
+        started = time.perf_counter()
+        columns = collect(UserRegistry(storage), storage, TODAY, args.days)
+        collected = time.perf_counter() - started
+        build(columns)
+        total = time.perf_counter() - started
+        storage.close()
+    print(f"SQLite, {len(columns)} польз. не в памяти: сбор {collected:.2f} с, со сбором и расчетом {total:.2f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--python-users", type=int, default=100_000, help="пользователей для расчета без NumPy")
+    parser.add_argument("--sqlite-users", type=int, default=20_000, help="0 — не замерять SQLite")
+    parser.add_argument("--days", type=int, default=reports.REPORT_DAYS)
+    args = parser.parse_args()
+    run_build(args)
+    if args.sqlite_users:
+        run_sqlite(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Масштабирование режима нескольких процессов (sharding.py) по числу воркеров.
+
+Для каждого числа воркеров запускает ShardRouter с настоящими процессами
+bot.py; этот скрипт играет роль front-процесса и раскладывает по ним
+синтетические обновления от многих пользователей. Каждому воркеру — своя
+заглушка Bot API в отдельном процессе, чтобы заглушка не стала узким
+местом. Пропускная способность — от первой пачки обновлений до последнего
+ответа бота (sendMessage в заглушке).
+
+Запуск:
+    python benchmarks/bench_sharding.py --workers 1 2 4 --updates 20000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+from stub_server import StubServer, telegram_api_handler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import ShardRouter  # noqa: E402
+
+COMMANDS = ["/start", "/help", "/check_progress", "/recommend"]
+BATCH = 100  # обновлений в пачке, как у getUpdates
+
+
+def make_update(update_id, user_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }
+
+
+def run_stub(port_pipe, counter):
+    def on_send(method, chat_id):
+        with counter.get_lock():
+            counter.value += 1
+
+    async def serve():
+        async with StubServer(telegram_api_handler(on_send)) as server:
+            port_pipe.send(server.port)
+            await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def wait_for(counter, target, timeout):
+    deadline = time.monotonic() + timeout
+    while counter.value < target and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return counter.value >= target
+
+
+def run(n_workers, args, context):
+    counter = context.Value("q", 0)
+    stubs, envs = [], []
+    for _ in range(n_workers):
+        receiver, sender = context.Pipe(duplex=False)
+        stub = context.Process(target=run_stub, args=(sender, counter), daemon=True)
+        stub.start()
+        stubs.append(stub)
+        envs.append({
+            "TELEGRAM_TOKEN": "1:bench",
+            "TELEGRAM_BASE_URL": f"http://127.0.0.1:{receiver.recv()}/bot",
+            "STORAGE_BACKEND": "memory",
+            "METRICS_ENABLED": "0",
+            "RENDER_WORKERS": "1",
+            # Лимиты Telegram здесь не нужны — меряем обработку, а не ограничитель
+            "OUTBOUND_GLOBAL_RATE": "1000000",
+            "OUTBOUND_CHAT_RATE": "1000000",
+            "OUTBOUND_CHAT_BURST": "1000000",
+        })
+
+    router = ShardRouter(n_workers, env=envs)
+    router.start()
+    update_id = 0
+
+    def send(count):
+        nonlocal update_id
+        updates = []
+        for i in range(count):
+            update_id += 1
+            updates.append(make_update(update_id, 1 + update_id % args.users, COMMANDS[i % len(COMMANDS)]))
+            if len(updates) == BATCH:
+                router.dispatch(updates)
+                updates = []
+        if updates:
+            router.dispatch(updates)
+
+    try:
+        # Прогрев: воркеры стартуют и отвечают всем пользователям хотя бы раз
+        send(args.users)
+        if not wait_for(counter, args.users, args.timeout):
+            raise RuntimeError(f"воркеры не ответили на прогрев ({counter.value} из {args.users})")
+
+        counter.value = 0
+        started = time.perf_counter()
+        send(args.updates)
+        routed = time.perf_counter() - started
+        done = wait_for(counter, args.updates, args.timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        router.stop()
+        for stub in stubs:
+            stub.terminate()
+    if not done:
+        print(f"{n_workers} воркер(ов): ответов {counter.value} из {args.updates} за {args.timeout:.0f} с")
+        return None
+    print(f"{n_workers} воркер(ов): {args.updates / elapsed:.0f} обн/с "
+          f"(раскладка во front {args.updates / routed:.0f} обн/с), по воркерам {router.routed}")
+    return args.updates / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"Ядер: {os.cpu_count()}, обновлений: {args.updates}, пользователей: {args.users}")
+    baseline = None
+    for n_workers in args.workers:
+        throughput = run(n_workers, args, context)
+        if throughput and baseline is None:
+            baseline = throughput / n_workers
+        if throughput and baseline:
+            print(f"    ускорение {throughput / baseline:.2f}x на {n_workers} (идеально — {n_workers}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Задержка записи логов: обычный словарь против UserRegistry + SQLite.
+
+Имитирует то, что делает log_water_entry/log_food_entry: добавление
+в историю и запись в хранилище. Отдельно измеряет холодную загрузку
+пользователя из базы и время записи всей очереди на диск.
+
+Запуск:
+    python benchmarks/bench_storage.py --users 1000 --entries 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_logs import DailyLog  # noqa: E402
+from storage import MemoryStorage, SQLiteStorage, UserRegistry  # noqa: E402
+
+
+def new_profile():
+    return {
+        "step": None, "weight": 70.0, "height": 175.0, "age": 30, "activity": 30, "city": "Moscow",
+        "water_goal": 2600, "calorie_goal": 1900.0, "log_version": 0,
+        "water_logs": DailyLog(), "food_logs": DailyLog(), "workout_logs": DailyLog(),
+    }
+
+
+def log_entry(users, storage, user_id, amount):
+    user = users[user_id]
+    now = datetime.now()
+    user["water_logs"].add(now, amount)
+    user["log_version"] += 1
+    storage.append_water(user_id, now, amount)
+    storage.save_profile(user_id, user)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(name, users, storage, n_users, n_entries):
+    for user_id in range(n_users):
+        users[user_id] = new_profile()
+        storage.save_profile(user_id, users[user_id])
+    storage.flush()
+
+    latencies = []
+    order = [user_id for user_id in range(n_users) for _ in range(n_entries)]
+    random.shuffle(order)
+    started = time.perf_counter()
+    for user_id in order:
+        t = time.perf_counter()
+        log_entry(users, storage, user_id, 250)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    t = time.perf_counter()
+    storage.flush()
+    flushed = time.perf_counter() - t
+
+    print(f"{name:>8}: {len(order) / elapsed:>10.0f} записей/с, "
+          f"p50={percentile(latencies, 0.5) * 1e6:.1f} мкс, p99={percentile(latencies, 0.99) * 1e6:.1f} мкс, "
+          f"дозапись очереди {flushed * 1000:.0f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--entries", type=int, default=50, help="записей на пользователя")
+    args = parser.parse_args()
+
+    run("dict", {}, MemoryStorage(), args.users, args.entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        storage = SQLiteStorage(path)
+        run("sqlite", UserRegistry(storage), storage, args.users, args.entries)
+        storage.close()
+
+        # Холодный старт: новый процесс ничего не загружает заранее,
+        # пользователь читается из базы при первом обращении
+        t = time.perf_counter()
+        storage = SQLiteStorage(path)
+        users = UserRegistry(storage)
+        startup = time.perf_counter() - t
+        loads = []
+        for user_id in random.sample(range(args.users), min(200, args.users)):
+            t = time.perf_counter()
+            assert user_id in users
+            loads.append(time.perf_counter() - t)
+        storage.close()
+        print(f"старт: {startup * 1000:.2f} мс, загрузка пользователя ({args.entries} записей): "
+              f"p50={percentile(loads, 0.5) * 1000:.2f} мс, p99={percentile(loads, 0.99) * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
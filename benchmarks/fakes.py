@@ -0,0 +1,93 @@
+"""
+Поддельные Update/Context для вызова обработчиков bot.py без Telegram.
+
+Ответы бота (reply_text, send_photo) не уходят в сеть, а складываются
+в Outbox; задержку Bot API можно имитировать параметром latency.
+"""
+import asyncio
+import itertools
+from collections import defaultdict
+from types import SimpleNamespace
+
+
+class Outbox:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = defaultdict(list)  # chat_id -> [текст или "<photo>"]
+        self._file_ids = itertools.count(1)
+
+    async def send(self, chat_id, text):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages[chat_id].append(text)
+
+    def last(self, chat_id):
+        return self.messages[chat_id][-1] if self.messages[chat_id] else None
+
+
+class FakeMessage:
+    def __init__(self, user_id, text, outbox):
+        self.from_user = SimpleNamespace(id=user_id, is_bot=False)
+        self.chat = SimpleNamespace(id=user_id, type="private")
+        self.text = text
+        self._outbox = outbox
+
+    async def reply_text(self, text, **kwargs):
+        await self._outbox.send(self.chat.id, text)
+
+
+class FakeBot:
+    def __init__(self, outbox):
+        self._outbox = outbox
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        if hasattr(photo, "read"):
+            photo.read()
+        await self._outbox.send(chat_id, "<photo>")
+        file_id = f"file-{next(self._outbox._file_ids)}"
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)])
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._outbox.send(chat_id, text)
+
+
+class FakeUpdate:
+    def __init__(self, user_id, text, outbox):
+        self.message = FakeMessage(user_id, text, outbox)
+        self.effective_user = self.message.from_user
+        self.effective_chat = self.message.chat
+
+
+def make_update(user_id, text, outbox):
+    """(update, context) для текста text; для команд args — слова после команды."""
+    update = FakeUpdate(user_id, text, outbox)
+    args = text.split()[1:] if text.startswith("/") else []
+    context = SimpleNamespace(args=args, bot=FakeBot(outbox))
+    return update, context
+
+
+async def dispatch(bot, update, context):
+    """
+    Вызывает обработчики bot.py так же, как их зарегистрировал main():
+    команда — свой обработчик, обычный текст — группы 0 и 1 по очереди.
+    """
+    text = update.message.text
+    if text.startswith("/"):
+        handler = {
+            "/start": bot.start,
+            "/set_profile": bot.set_profile,
+            "/log_water": bot.log_water,
+            "/log_food": bot.log_food,
+            "/log_workout": bot.log_workout,
+            "/workouts": bot.workouts_command,
+            "/reminders": bot.reminders_command,
+            "/show_graph": bot.show_graph,
+            "/check_progress": bot.check_progress,
+            "/recommend": bot.recommend_command,
+            "/report": bot.report_command,
+            "/help": bot.help_command,
+        }[text.split()[0]]
+        await handler(update, context)
+    else:
+        await bot.handle_food_logging(update, context)
+        await bot.handle_profile_setup(update, context)
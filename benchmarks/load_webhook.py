@@ -0,0 +1,152 @@
+"""
+Нагрузочный тест режима webhook.
+
+Поднимает заглушку Bot API, запускает bot.py в режиме webhook (ответы
+бота уходят в заглушку), отправляет синтетические обновления от многих
+пользователей и считает:
+  - пропускную способность приема (обновлений/с) и задержку ответа webhook;
+  - полную задержку: от отправки обновления до sendMessage бота в этот чат.
+
+Запуск:
+    python benchmarks/load_webhook.py --updates 5000 --users 500 --concurrency 50
+    python benchmarks/load_webhook.py --concurrent-updates 8
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from stub_server import StubServer, telegram_api_handler, upstreams_handler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = "load-test-secret"
+COMMANDS = ["/start", "/help", "/check_progress", "/recommend"]
+
+
+def make_update(update_id, user_id, text):
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else []
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(len(values) * p))] * 1000  # noqa: E731
+    return f"p50={pick(0.5):.1f} мс, p90={pick(0.9):.1f} мс, p99={pick(0.99):.1f} мс, max={values[-1] * 1000:.1f} мс"
+
+
+async def wait_ready(client, url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("bot.py завершился при запуске")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("bot.py не поднял webhook вовремя")
+
+
+async def run(args):
+    sent_at = {}  # chat_id -> очередь времен отправки обновлений
+    e2e = []
+
+    def on_send(method, chat_id):
+        pending = sent_at.get(chat_id)
+        if pending:
+            e2e.append(time.perf_counter() - pending.pop(0))
+
+    async with StubServer(telegram_api_handler(on_send)) as api, StubServer(upstreams_handler) as upstreams:
+        env = dict(
+            os.environ,
+            BOT_MODE="webhook",
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(args.port),
+            WEBHOOK_SECRET=SECRET,
+            WEBHOOK_URL="",
+            TELEGRAM_BASE_URL=f"{api.url}/bot",
+            OPENWEATHERMAP_URL=f"{upstreams.url}/weather",
+            OPENFOODFACTS_URL=f"{upstreams.url}/search",
+            STORAGE_BACKEND="memory",
+            CONCURRENT_UPDATES=str(args.concurrent_updates),
+        )
+        process = subprocess.Popen([sys.executable, "bot.py"], cwd=ROOT, env=env)
+        base = f"http://127.0.0.1:{args.port}"
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+                await wait_ready(client, base + "/healthz", process)
+
+                update_ids = itertools.count(1)
+                ack = []
+                queue = asyncio.Queue()
+                for i in range(args.updates):
+                    queue.put_nowait((1 + i % args.users, COMMANDS[i % len(COMMANDS)]))
+
+                async def worker():
+                    while not queue.empty():
+                        user_id, text = queue.get_nowait()
+                        update = make_update(next(update_ids), user_id, text)
+                        sent_at.setdefault(user_id, []).append(time.perf_counter())
+                        started = time.perf_counter()
+                        response = await client.post(
+                            base + "/telegram", content=json.dumps(update),
+                            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET,
+                                     "Content-Type": "application/json"},
+                        )
+                        ack.append(time.perf_counter() - started)
+                        response.raise_for_status()
+
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+                accepted = time.perf_counter() - started
+
+                # Ждем, пока бот ответит на все обновления
+                deadline = time.monotonic() + args.drain_timeout
+                while len(e2e) < args.updates and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                finished = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"Обновлений: {args.updates}, пользователей: {args.users}, "
+          f"параллельных запросов: {args.concurrency}, CONCURRENT_UPDATES={args.concurrent_updates}")
+    print(f"Прием: {args.updates / accepted:.0f} обн/с, ответ webhook: {percentiles(ack)}")
+    if e2e:
+        print(f"Обработано: {len(e2e)} за {finished:.2f} с ({len(e2e) / finished:.0f} обн/с), "
+              f"полная задержка: {percentiles(e2e)}")
+    else:
+        print("Бот не отправил ни одного ответа")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных HTTP-запросов к webhook")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="CONCURRENT_UPDATES для бота")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Стресс-тест параллельной обработки обновлений.
+
+Много пользователей одновременно проходят /set_profile (с медленным
+ответом погоды) и сразу логируют воду; обновления разных пользователей
+перемешаны. Проверяется, что у каждого пользователя итоговое состояние
+верное, и как растет пропускная способность с числом параллельных обновлений.
+
+Для сравнения --processor simple использует SimpleUpdateProcessor
+из python-telegram-bot (без порядка для пользователя) — на нем
+многошаговые диалоги ломаются.
+
+Запуск:
+    python benchmarks/stress_scheduler.py --users 500 --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from telegram.ext import SimpleUpdateProcessor  # noqa: E402
+
+import bot  # noqa: E402
+from fakes import Outbox, dispatch, make_update  # noqa: E402
+from scheduler import PerUserUpdateProcessor  # noqa: E402
+
+WATER_ENTRIES = 5
+
+
+def user_script(user_id):
+    weight = 60 + user_id % 40
+    return [
+        "/set_profile", str(weight), "170", "30", "45", f"City{user_id}",
+        *["/log_water 250"] * WATER_ENTRIES,
+        "/check_progress",
+    ]
+
+
+def interleave(n_users):
+    """Сообщения всех пользователей вперемешку, но для каждого — в его порядке."""
+    scripts = {user_id: list(reversed(user_script(user_id))) for user_id in range(1, n_users + 1)}
+    order = []
+    while scripts:
+        user_id = random.choice(list(scripts))
+        order.append((user_id, scripts[user_id].pop()))
+        if not scripts[user_id]:
+            del scripts[user_id]
+    return order
+
+
+def check(n_users):
+    today = bot.datetime.now().date()
+    broken = 0
+    for user_id in range(1, n_users + 1):
+        user = bot.users._users.get(user_id)
+        ok = (
+            user is not None
+            and user.get("step") is None
+            and user.get("weight") == 60 + user_id % 40
+            and "water_logs" in user
+            and user["water_logs"].total(today) == 250 * WATER_ENTRIES
+        )
+        broken += not ok
+    return broken
+
+
+async def run_once(processor_name, concurrency, n_users, weather_latency):
+    bot.users._users.clear()
+    bot.users._missing.clear()
+    bot.weather_cache._entries.clear()
+
+    async def slow_weather(city):
+        await asyncio.sleep(weather_latency)
+        return 20.0
+
+    bot.fetch_weather = slow_weather
+
+    processor_class = PerUserUpdateProcessor if processor_name == "per-user" else SimpleUpdateProcessor
+    processor = processor_class(concurrency)
+    outbox = Outbox()
+    order = interleave(n_users)
+
+    started = time.perf_counter()
+    tasks = []
+    for user_id, text in order:
+        update, context = make_update(user_id, text, outbox)
+        # Как Application: по задаче на обновление, в порядке поступления
+        tasks.append(asyncio.create_task(processor.process_update(update, dispatch(bot, update, context))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    broken = check(n_users)
+    print(f"{processor_name:>8} x{concurrency:<4}: {len(order) / elapsed:8.0f} обн/с, "
+          f"{elapsed:6.2f} с, пользователей с неверным состоянием: {broken}/{n_users}")
+    return broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--processor", choices=["per-user", "simple"], default="per-user")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="задержка погоды, сек")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    failures = 0
+    for concurrency in args.concurrency:
+        failures += asyncio.run(run_once(args.processor, concurrency, args.users, args.weather_latency))
+    sys.exit(1 if failures and args.processor == "per-user" else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Локальная заглушка внешних сервисов (и Bot API) для бенчмарков.
+
+Минимальный HTTP/1.1 сервер на asyncio с поддержкой keep-alive:
+на каждый запрос ждет заданную задержку и отдает JSON, который
+вернул обработчик handler(method, path, query, body).
+"""
+import asyncio
+import itertools
+import json
+import re
+import time
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubServer:
+    def __init__(self, handler, latency=0.0, host="127.0.0.1", port=0):
+        self.handler = handler
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._server = None
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _serve(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = b""
+                if "content-length" in headers:
+                    body = await reader.readexactly(int(headers["content-length"]))
+
+                self.requests += 1
+                self._in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self._in_flight)
+                try:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    parts = urlsplit(target)
+                    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                    status, payload = self.handler(method, parts.path, query, body)
+                finally:
+                    self._in_flight -= 1
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "Connection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def openweathermap_handler(method, path, query, body):
+    return 200, {"main": {"temp": 20.0}, "name": query.get("q", "")}
+
+
+def openfoodfacts_handler(method, path, query, body):
+    return 200, {
+        "products": [{
+            "product_name": query.get("search_terms", "Продукт"),
+            "nutriments": {"energy-kcal_100g": 52},
+        }]
+    }
+
+
+def upstreams_handler(method, path, query, body):
+    """Отвечает и за погоду, и за продукты (по наличию параметров)."""
+    if "search_terms" in query:
+        return openfoodfacts_handler(method, path, query, body)
+    return openweathermap_handler(method, path, query, body)
+
+
+def _chat_id(body):
+    """chat_id из тела запроса Bot API (JSON, форма или multipart)."""
+    text = body.decode("utf-8", "replace")
+    try:
+        return int(json.loads(text)["chat_id"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    query = parse_qs(text)
+    if "chat_id" in query:
+        return int(query["chat_id"][0])
+    match = re.search(r'name="chat_id"\r\n(?:[^\r\n]*\r\n)*\r\n(-?\d+)', text)
+    return int(match.group(1)) if match else 0
+
+
+def telegram_api_handler(on_send=None, global_limit=None, chat_limit=None, on_flood=None):
+    """
+    Заглушка Bot API: отвечает "ok" на любой метод, а на отправку сообщений
+    возвращает правдоподобный Message. on_send(method, chat_id) вызывается
+    для каждого отправленного сообщения.
+
+    global_limit и chat_limit — лимиты Telegram (сообщений за секунду всего
+    и в один чат): сверх них заглушка, как и Telegram, отвечает 429 с
+    retry_after; on_flood(method, chat_id) вызывается на каждый такой ответ.
+    """
+    message_ids = itertools.count(1)
+    window = [0, 0, {}]  # секунда, сообщений за нее всего, по чатам
+
+    def flooded(chat_id):
+        second = int(time.monotonic())
+        if window[0] != second:
+            window[:] = [second, 0, {}]
+        window[1] += 1
+        window[2][chat_id] = window[2].get(chat_id, 0) + 1
+        return ((global_limit is not None and window[1] > global_limit)
+                or (chat_limit is not None and window[2][chat_id] > chat_limit))
+
+    def handler(method, path, query, body):
+        api_method = path.rsplit("/", 1)[-1]
+        if api_method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Bot", "username": "stub_bot"}}
+        if api_method.startswith("send"):
+            chat_id = _chat_id(body)
+            if flooded(chat_id):
+                if on_flood is not None:
+                    on_flood(api_method, chat_id)
+                return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                             "parameters": {"retry_after": 1}}
+            if on_send is not None:
+                on_send(api_method, chat_id)
+            message = {
+                "message_id": next(message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+            }
+            if api_method == "sendPhoto":
+                message["photo"] = [{"file_id": f"photo-{message['message_id']}",
+                                     "file_unique_id": f"u{message['message_id']}", "width": 800, "height": 600}]
+            else:
+                message["text"] = ""
+            return 200, {"ok": True, "result": message}
+        return 200, {"ok": True, "result": True}
+
+    return handler
@@ -1,53 +1,111 @@
+import startup  # первым: замер холодного старта
+import asyncio
 import logging
+import sys
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
-import requests
-import matplotlib.pyplot as plt
+from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
 import io
-import os
-from datetime import datetime
+import tempfile
+from datetime import date, datetime, timedelta
+
+import config
+from http_client import upstream, InstrumentedTelegramRequest
+from rendering import render_pool, render_progress_png, RenderQueueFull
+from graph_cache import graph_cache
+from storage import create_storage, UserRegistry
+from daily_logs import DailyLog
+from aggregation import HOUR, cumulative, daily_totals, hourly_cumulative, load_numpy
+from workouts import catalog as workout_catalog
+from history import detect_format, export_user, import_records_async, read_records, write_records
+from cache import AsyncTTLCache
+from products import search_product, product_cache, product_index
+from scheduler import PerUserUpdateProcessor
+from reminders import ReminderScheduler, format_quiet_hours
+from reports import DailyReports, flags_for, format_report, recommendation_text
+from outbound import OutboundLimiter
+from sharding import shard_for
+import metrics
+
+startup.mark("импорты")
 
 
 # Настройка логирования
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Хранение данных пользователей (в реальном проекте лучше использовать базу данных)
-users = {}
+# Хранение данных пользователей: профили и логи подгружаются из хранилища
+# при первом обращении (см. storage.py)
+storage = create_storage()
+users = UserRegistry(storage)
+
+# Все исходящие запросы к Bot API: лимиты Telegram, приоритет ответов над рассылками
+outbound = OutboundLimiter()
+
+# Напоминания о воде и еде: одна куча проверок на всех пользователей (см. reminders.py)
+reminders = ReminderScheduler(users, storage)
+
+# Отчеты и рекомендации: пересчитываются для всех сразу (см. reports.py).
+# В режиме нескольких процессов (sharding.py) — только свои пользователи
+daily_reports = DailyReports(users, storage,
+                             owns=lambda user_id: shard_for(user_id, config.SHARD_COUNT) == config.SHARD_INDEX)
+
+# Кэш температуры по городам
+weather_cache = AsyncTTLCache("weather", ttl=config.WEATHER_CACHE_TTL,
+                              stale_ttl=config.WEATHER_STALE_TTL, max_size=config.WEATHER_CACHE_SIZE)
+
+# Попадания в кэши и длина очередей — для /metrics
+metrics.register_callback(
+    "bot_cache_events_total", "Обращения к кэшам", ("cache", "event"),
+    lambda: {
+        (cache.name, event): cache.stats()[event]
+        for cache in (weather_cache, product_cache)
+        for event in ("hits", "misses", "coalesced", "stale_hits")
+    } | {("graphs", "hits"): graph_cache.hits, ("graphs", "misses"): graph_cache.misses},
+    kind="counter",
+)
+metrics.register_callback(
+    "bot_queue_depth", "Длина очередей", ("queue",),
+    lambda: {("render",): render_pool.pending, ("storage",): storage.pending,
+             ("reminders",): reminders.pending},
+)
+metrics.register_callback(
+    "bot_outbound_queue_depth", "Исходящие сообщения, ожидающие лимита", ("lane",),
+    lambda: {(lane,): depth for lane, depth in outbound.pending.items()},
+)
+metrics.register_callback(
+    "bot_outbound_total", "Исходящие сообщения: отправлены, повторены после 429, ошибки", ("event",),
+    lambda: {(event,): value for event, value in outbound.stats.items()},
+    kind="counter",
+)
+metrics.register_callback(
+    "bot_reminders_total", "Проверки и отправка напоминаний", ("event",),
+    lambda: {(event,): value for event, value in reminders.stats.items()},
+    kind="counter",
+)
+metrics.register_callback(
+    "bot_storage_writes_total", "Запись в хранилище: пачки, повторы, ошибки", ("event",),
+    lambda: {(event,): value for event, value in getattr(storage, "stats", {}).items()},
+    kind="counter",
+)
+metrics.register_callback(
+    "bot_reports_total", "Пересчеты дневных отчетов", ("event",),
+    lambda: {(event,): value for event, value in daily_reports.stats.items()},
+    kind="counter",
+)
 
 # Константы для расчетов
 WATER_BASE_MULTIPLIER = 30  # мл на кг веса
 ACTIVITY_WATER_BONUS = 500  # мл за каждые 30 минут активности
 HOT_WEATHER_WATER_BONUS = 500  # мл при температуре > 25°C
 CALORIE_ACTIVITY_BONUS = 200  # ккал за каждые 30 минут активности
+DEFAULT_WEIGHT = 70  # кг, если вес в профиле не указан (для расчета тренировок)
 
-WORKOUTS = {
-    "бег": {
-        "emoji": "🏃‍♂️",
-        "cal_per_min": 10,
-        "water_bonus_per_30min": 200
-    },
-    "ходьба": {
-        "emoji": "🚶‍♂️",
-        "cal_per_min": 4,
-        "water_bonus_per_30min": 100
-    },
-    "велосипед": {
-        "emoji": "🚴‍♂️",
-        "cal_per_min": 8,
-        "water_bonus_per_30min": 200
-    },
-    "плавание": {
-        "emoji": "🏊‍♂️",
-        "cal_per_min": 9,
-        "water_bonus_per_30min": 200
-    },
-    "йога": {
-        "emoji": "🧘‍♂️",
-        "cal_per_min": 3,
-        "water_bonus_per_30min": 100
-    },
-}
+# Графики /show_graph
+MAX_GRAPH_DAYS = 366  # самый длинный период
+HOURLY_GRAPH_MAX_DAYS = 7  # до недели — по часам, дальше — по дням
+
+# Импорт и экспорт истории
+MAX_IMPORT_BYTES = 20 * 1024 * 1024  # больше бот скачать из Telegram не может
 
 # Функция для расчета нормы воды
 def calculate_water_goal(weight, activity_minutes, temperature):
@@ -63,6 +121,10 @@ def calculate_calorie_goal(weight, height, age, activity_minutes):
     calorie_goal += (activity_minutes // 30) * CALORIE_ACTIVITY_BONUS
     return calorie_goal
 
+# Сохранение профиля пользователя (логи пишутся отдельно, см. log_water_entry)
+def save_user(user_id):
+    storage.save_profile(user_id, users[user_id])
+
 # Команда /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Привет! Я помогу вам отслеживать потребление воды и калорий. "
@@ -71,7 +133,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Команда /set_profile
 async def set_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
+    # Настройки напоминаний к профилю не относятся — сохраняем их
+    settings = users[user_id].get("reminders") if user_id in users else None
     users[user_id] = {"step": "weight"}
+    if settings:
+        users[user_id]["reminders"] = settings
+    storage.reset_user(user_id)
+    save_user(user_id)
+    graph_cache.invalidate_user(user_id)
     await update.message.reply_text("Введите ваш вес (в кг):")
 
 # Обработка текстовых сообщений для настройки профиля
@@ -89,6 +158,7 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
             weight = float(text)
             users[user_id]["weight"] = weight
             users[user_id]["step"] = "height"
+            save_user(user_id)
             await update.message.reply_text("Введите ваш рост (в см):")
         except ValueError:
             await update.message.reply_text("Пожалуйста, введите корректное число для веса.")
@@ -97,6 +167,7 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
             height = float(text)
             users[user_id]["height"] = height
             users[user_id]["step"] = "age"
+            save_user(user_id)
             await update.message.reply_text("Введите ваш возраст:")
         except ValueError:
             await update.message.reply_text("Пожалуйста, введите корректное число для роста.")
@@ -105,6 +176,7 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
             age = int(text)
             users[user_id]["age"] = age
             users[user_id]["step"] = "activity"
+            save_user(user_id)
             await update.message.reply_text("Сколько минут активности у вас в день?")
         except ValueError:
             await update.message.reply_text("Пожалуйста, введите корректное число для возраста.")
@@ -113,6 +185,7 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
             activity = int(text)
             users[user_id]["activity"] = activity
             users[user_id]["step"] = "city"
+            save_user(user_id)
             await update.message.reply_text("В каком городе вы находитесь? (en)")
         except ValueError:
             await update.message.reply_text("Пожалуйста, введите корректное число для активности.")
@@ -120,9 +193,10 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
         city = text
         users[user_id]["city"] = city
         users[user_id]["step"] = None
+        save_user(user_id)
 
         # Получаем температуру для города
-        temperature = get_weather(city)
+        temperature = await get_weather(city)
         if temperature is None:
             await update.message.reply_text("Не удалось получить данные о погоде. Попробуйте позже.")
             return
@@ -138,44 +212,59 @@ async def handle_profile_setup(update: Update, context: ContextTypes.DEFAULT_TYP
 
         users[user_id]["water_goal"] = water_goal
         users[user_id]["calorie_goal"] = calorie_goal
-        users[user_id]["logged_water"] = 0
-        users[user_id]["logged_calories"] = 0
-        users[user_id]["burned_calories"] = 0
-        users[user_id]["water_logs"] = []
-        users[user_id]["food_logs"] = []
+        users[user_id]["water_logs"] = DailyLog()
+        users[user_id]["food_logs"] = DailyLog()
+        users[user_id]["workout_logs"] = DailyLog()
+        users[user_id]["log_version"] = 0
+        save_user(user_id)
 
         await update.message.reply_text(f"Настройка завершена!\n"
                                         f"Ваша норма воды: {water_goal} мл\n"
-                                        f"Ваша норма калорий: {calorie_goal} ккал")
-
-# Получение погоды через OpenWeatherMap API
-def get_weather(city):
-    API_KEY = "openweathermap_key"
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
+                                        f"Ваша норма калорий: {calorie_goal} ккал\n"
+                                        f"Напоминания о воде и еде: /reminders on")
+
+# Получение погоды (из кэша или через OpenWeatherMap API)
+@metrics.timed("weather")
+async def get_weather(city):
+    # "  Moscow", "moscow" и "MOSCOW " — один и тот же город
+    key = " ".join(city.split()).casefold()
+    return await weather_cache.get(key, lambda: fetch_weather(city))
+
+async def fetch_weather(city):
+    params = {"q": city, "appid": config.OPENWEATHERMAP_KEY, "units": "metric"}
+    data = await upstream.get_json("openweathermap", config.OPENWEATHERMAP_URL, params=params)
+    if data is None:
+        return None
+    try:
         return data["main"]["temp"]
-    return None
+    except (KeyError, TypeError):
+        return None
+
+def get_today_totals(user_id):
+    """Выпито, съедено и сожжено за сегодня (суммы обнуляются в полночь)."""
+    today = datetime.now().date()
+    user_data = users[user_id]
+    return (user_data["water_logs"].total(today),
+            user_data["food_logs"].total(today),
+            user_data["workout_logs"].total(today))
 
 def log_water_entry(user_id, amount):
     """Логируем воду (с точным временем)."""
-    # Обновляем суммарное значение
-    users[user_id]["logged_water"] += amount
-    
-    # Пишем в историю
-    users[user_id]["water_logs"].append({
-        "datetime": datetime.now(),
-        "amount": amount
-    })
+    # Пишем в историю (сумма за день обновляется там же)
+    now = datetime.now()
+    users[user_id]["water_logs"].add(now, amount)
+    # Новая версия логов — сегодняшний график в кэше устарел
+    users[user_id]["log_version"] = users[user_id].get("log_version", 0) + 1
+    storage.append_water(user_id, now, amount)
+    save_user(user_id)
 
 def log_food_entry(user_id, calories):
     """Логируем еду (с точным временем)."""
-    users[user_id]["logged_calories"] += calories
-    users[user_id]["food_logs"].append({
-        "datetime": datetime.now(),
-        "calories": calories
-    })
+    now = datetime.now()
+    users[user_id]["food_logs"].add(now, calories)
+    users[user_id]["log_version"] = users[user_id].get("log_version", 0) + 1
+    storage.append_food(user_id, now, calories)
+    save_user(user_id)
 
 # Команда /log_water
 async def log_water(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -187,7 +276,8 @@ async def log_water(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         amount = int(context.args[0])
         log_water_entry(user_id, amount)
-        remaining = users[user_id]["water_goal"] - users[user_id]["logged_water"]
+        logged_water, _, _ = get_today_totals(user_id)
+        remaining = users[user_id]["water_goal"] - logged_water
         await update.message.reply_text(f"Добавлено {amount} мл воды.\n"
                                         f"Осталось выпить: {remaining} мл.")
     except (IndexError, ValueError):
@@ -201,10 +291,8 @@ async def check_progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     water_goal = users[user_id]["water_goal"]
-    logged_water = users[user_id]["logged_water"]
     calorie_goal = users[user_id]["calorie_goal"]
-    logged_calories = users[user_id]["logged_calories"]
-    burned_calories = users[user_id]["burned_calories"]
+    logged_water, logged_calories, burned_calories = get_today_totals(user_id)
 
     remaining_water = water_goal - logged_water
     remaining_calories = logged_calories - burned_calories
@@ -227,9 +315,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/log_water <количество> - Записать количество выпитой воды (в мл).\n"
         "/log_food <название продукта> - Записать потребление пищи.\n"
         "/log_workout <тип тренировки> <время (мин)> - Записать тренировку.\n"
+        "/workouts - Список видов тренировок.\n"
         "/check_progress - Проверить текущий прогресс по воде и калориям.\n"
-        "/show_graph - Вывести графики с потреблением воды и калорий.\n"
+        "/show_graph [дата | week | month | с..по] - Графики потребления воды и калорий.\n"
         "/recommend - Рекомендации по поведению относительно текущих показателей.\n"
+        "/report - Отчет за день: нормы, серия дней с нормой воды и график за неделю.\n"
+        "/reminders [on | off | quiet 22-8 | tz Europe/Moscow] - Напоминания о воде и еде.\n"
+        "/export [csv] - Выгрузить профиль и историю (NDJSON или CSV).\n"
+        "/import - Загрузить историю из файла NDJSON или CSV.\n"
         "/help - Показать это сообщение с описанием команд."
     )
     await update.message.reply_text(help_text)
@@ -247,8 +340,8 @@ async def log_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Используйте формат: /log_food <название продукта>")
             return
 
-        # Ищем продукт через OpenFoodFacts API
-        product_data = search_product(product_name)
+        # Ищем продукт (кэш, локальный индекс, OpenFoodFacts API)
+        product_data = await search_product(product_name)
         if not product_data:
             await update.message.reply_text(f"Продукт '{product_name}' не найден. Попробуйте другой запрос.")
             return
@@ -268,34 +361,11 @@ async def log_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "calories_per_100g": calories_per_100g,
             "name": product_data["name"],
         }
+        save_user(user_id)
     except Exception as e:
         logger.error(f"Ошибка при выполнении /log_food: {e}")
         await update.message.reply_text("Произошла ошибка. Попробуйте позже.")
 
-# Поиск продукта через OpenFoodFacts API
-def search_product(query):
-    url = f"https://world.openfoodfacts.org/cgi/search.pl"
-    params = {
-        "search_terms": query,
-        "search_simple": 1,
-        "action": "process",
-        "json": 1,
-    }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        products = data.get("products", [])
-        if products:
-            product = products[0]
-            name = product.get("product_name", "Неизвестный продукт")
-            emoji = "🍴" 
-            calories = None
-            nutriments = product.get("nutriments", {})
-            if "energy-kcal_100g" in nutriments:
-                calories = float(nutriments["energy-kcal_100g"])
-            return {"name": name, "calories": calories, "emoji": emoji}
-    return None
-
 # Обработка текстовых сообщений для завершения логирования еды
 async def handle_food_logging(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
@@ -312,9 +382,8 @@ async def handle_food_logging(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         # Рассчитываем потребленные калории
         consumed_calories = (calories_per_100g / 100) * grams
-        log_food_entry(user_id, consumed_calories)
-
         del users[user_id]["pending_food"]
+        log_food_entry(user_id, consumed_calories)
 
         await update.message.reply_text(f"Записано: {consumed_calories:.1f} ккал ({grams} г {name}).")
     except ValueError:
@@ -329,17 +398,13 @@ async def log_workout(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Если пользователь не указал параметры (или указал недостаточно)
     if len(context.args) < 2:
-        available_workouts = "\n".join([f"- {w}" for w in WORKOUTS.keys()])
-        await update.message.reply_text(
-            "Используйте формат: /log_workout <тип тренировки> <время (мин)>.\n\n"
-            "Доступные виды тренировок:\n"
-            f"{available_workouts}"
-        )
+        await update.message.reply_text(workout_catalog.help_text)
         return
 
-    workout_type = context.args[0].lower()
+    # Название может состоять из нескольких слов, время — последний аргумент
+    workout_query = " ".join(context.args[:-1])
     try:
-        duration = int(context.args[1])
+        duration = int(context.args[-1])
     except ValueError:
         await update.message.reply_text(
             "Пожалуйста, введите корректное число для времени в минутах.\n"
@@ -347,148 +412,256 @@ async def log_workout(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Проверяем, существует ли такой тип тренировки в словаре
-    if workout_type not in WORKOUTS:
-        available_workouts = "\n".join([f"- {w}" for w in WORKOUTS.keys()])
-        await update.message.reply_text(
-            f"Неизвестный тип тренировки '{workout_type}'.\n\n"
-            "Доступные виды тренировок:\n"
-            f"{available_workouts}"
-        )
+    # Ищем тренировку в каталоге (названия, синонимы, опечатки)
+    workout = workout_catalog.find(workout_query)
+    if workout is None:
+        suggestions = workout_catalog.suggest(workout_query)
+        reply_text = f"Неизвестный тип тренировки '{workout_query}'.\n"
+        if suggestions:
+            reply_text += "Возможно, вы имели в виду: " + ", ".join(w.name for w in suggestions) + ".\n"
+        reply_text += "Полный список: /workouts"
+        await update.message.reply_text(reply_text)
         return
 
-    # Считаем, сколько калорий сожжено
-    cal_per_min = WORKOUTS[workout_type]["cal_per_min"]
-    total_burned = cal_per_min * duration
-    users[user_id]["burned_calories"] += total_burned
+    # Сожженные калории зависят от веса: MET × вес × часы
+    total_burned = workout.calories(users[user_id].get("weight") or DEFAULT_WEIGHT, duration)
+    now = datetime.now()
+    users[user_id]["workout_logs"].add(now, total_burned)
+    users[user_id]["log_version"] = users[user_id].get("log_version", 0) + 1
 
     # Дополнительная вода
-    water_bonus_per_30 = WORKOUTS[workout_type]["water_bonus_per_30min"]
-    extra_water = (duration // 30) * water_bonus_per_30
+    extra_water = (duration // 30) * workout.water_bonus_per_30min
 
-    emoji = WORKOUTS[workout_type]["emoji"]
     reply_text = (
-        f"{emoji} {workout_type.capitalize()} {duration} мин — {total_burned} ккал.\n"
+        f"{workout.emoji} {workout.name.capitalize()} {duration} мин — {total_burned} ккал.\n"
     )
     if extra_water > 0:
         reply_text += f"Дополнительно: выпейте {extra_water} мл воды."
         users[user_id]["water_goal"] += extra_water
+        # Норма изменилась — на готовых графиках её линия устарела
+        graph_cache.invalidate_user(user_id)
     else:
         reply_text += "Хорошая работа!"
 
+    storage.append_workout(user_id, now, workout.name, duration, total_burned)
+    save_user(user_id)
+
     await update.message.reply_text(reply_text)
 
-def generate_time_based_plots(user_id, target_date=None):
+def parse_period(args, today):
     """
-    Строит график динамики (в течение дня или нескольких дней).
-    
-    Параметр target_date (формат 'YYYY-MM-DD') - если задан, фильтруем логи только за эту дату.
-    Если не задан, можно вывести за все время или тоже за сегодня (на ваш выбор).
+    Период графика по аргументам /show_graph: (первый день, последний день).
+    Без аргументов — сегодня; ГГГГ-ММ-ДД — один день; week/неделя и
+    month/месяц — последние 7 и 30 дней; ГГГГ-ММ-ДД..ГГГГ-ММ-ДД (или две
+    даты через пробел) — произвольный период. Иначе — ValueError.
     """
-    water_logs = users[user_id].get("water_logs", [])
-    food_logs = users[user_id].get("food_logs", [])
-
-    # Если нужно показывать только за конкретную дату, отфильтруем записи
-    # Если target_date не задан, можно выводить все.
-    if target_date:
-        year, month, day = map(int, target_date.split('-'))
-        filter_date = datetime(year, month, day).date()
-
-        water_logs = [w for w in water_logs if w["datetime"].date() == filter_date]
-        food_logs = [f for f in food_logs if f["datetime"].date() == filter_date]
-
-    # Сортируем по времени (на всякий случай)
-    water_logs.sort(key=lambda x: x["datetime"])
-    food_logs.sort(key=lambda x: x["datetime"])
-
-    if not water_logs and not food_logs:
+    if not args:
+        return today, today
+    arg = args[0].lower()
+    if arg in ("week", "неделя"):
+        return today - timedelta(days=6), today
+    if arg in ("month", "месяц"):
+        return today - timedelta(days=29), today
+
+    first, sep, last = arg.partition("..")
+    if not sep and len(args) > 1:
+        last = args[1]
+    first_date = date.fromisoformat(first)
+    last_date = date.fromisoformat(last) if last else first_date
+    if last_date < first_date or (last_date - first_date).days >= MAX_GRAPH_DAYS:
+        raise ValueError(f"Некорректный период: {first_date}..{last_date}")
+    return first_date, last_date
+
+
+def midnight(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+@metrics.timed("render")
+async def generate_time_based_plots(user_id, first_date, last_date, on_wait=None):
+    """
+    Строит графики воды и калорий за период от first_date до last_date.
+
+    За один день — накопительно по каждой записи, до недели — накопительно
+    по часам (с обнулением в полночь), за более длинный период — суммы по
+    дням; дневные нормы показаны линиями. Записи периода берутся срезом
+    массивов DailyLog и агрегируются в aggregation.py.
+    Сама отрисовка выполняется в пуле процессов (см. rendering.py),
+    on_wait вызывается, если придется ждать свободный процесс.
+    """
+    user = users[user_id]
+    water_logs = user["water_logs"]
+    food_logs = user["food_logs"]
+
+    days = (last_date - first_date).days + 1
+    start_ts = int(midnight(first_date).timestamp())
+    end_ts = int(midnight(last_date + timedelta(days=1)).timestamp())
+    water_ts, water_amounts = water_logs.range_arrays(start_ts, end_ts)
+    food_ts, food_amounts = food_logs.range_arrays(start_ts, end_ts)
+    if not water_ts and not food_ts:
         return None  # Нет данных для графика
 
-    # Считаем накопительные суммы
-    # Для воды
-    water_times = []
-    water_cumulative = 0
-    water_values = []
-    
-    for entry in water_logs:
-        water_cumulative += entry["amount"]
-        water_times.append(entry["datetime"])
-        water_values.append(water_cumulative)
-
-    # Для еды (калории)
-    food_times = []
-    food_cumulative = 0
-    food_values = []
-    
-    for entry in food_logs:
-        food_cumulative += entry["calories"]
-        food_times.append(entry["datetime"])
-        food_values.append(food_cumulative)
-
-    # Рисуем
-    fig, axes = plt.subplots(nrows=2, ncols=1, figsize=(8, 6))
-    if target_date:
-        fig.suptitle(f"Прогресс за {target_date}")
+    daily = days > HOURLY_GRAPH_MAX_DAYS
+    if days == 1:
+        water_times = [datetime.fromtimestamp(ts) for ts in water_ts]
+        water_values = cumulative(water_amounts)
+        food_times = [datetime.fromtimestamp(ts) for ts in food_ts]
+        food_values = cumulative(food_amounts)
+    elif not daily:
+        hours = [datetime.fromtimestamp(start_ts + i * HOUR) for i in range(days * 24)]
+        water_times = food_times = hours
+        water_values = hourly_cumulative(water_ts, water_amounts, start_ts, days)
+        food_values = hourly_cumulative(food_ts, food_amounts, start_ts, days)
     else:
-        fig.suptitle("Прогресс (за всё время)")
-
-    # --- Верхний график: Вода
-    if water_times:
-        axes[0].plot(water_times, water_values, marker='o', color='blue', label='Вода (мл)')
-    axes[0].set_title("Вода (накопительно)")
-    axes[0].set_xlabel("Время")
-    axes[0].set_ylabel("мл")
-    axes[0].grid(True)
-    axes[0].legend()
-
-    # --- Нижний график: Калории
-    if food_times:
-        axes[1].plot(food_times, food_values, marker='o', color='red', label='Калории (накопительно)')
-    axes[1].set_title("Калории (накопительно)")
-    axes[1].set_xlabel("Время")
-    axes[1].set_ylabel("ккал")
-    axes[1].grid(True)
-    axes[1].legend()
-
-    # Немного подправим расположение, поворот меток по X (чтобы не налезали)
-    plt.tight_layout()
-    for ax in axes:
-        for label in ax.get_xticklabels():
-            label.set_rotation(45)
-            label.set_ha('right')
-
-    # Сохраняем рисунок
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
+        dates = [midnight(first_date + timedelta(days=i)) for i in range(days)]
+        water_times = food_times = dates
+        water_values = daily_totals(*water_logs.day_totals(first_date, last_date), first_date.toordinal(), days)
+        food_values = daily_totals(*food_logs.day_totals(first_date, last_date), first_date.toordinal(), days)
+
+    # Пустой ряд не рисуем совсем (как и раньше), а не нулевой линией
+    if not water_ts:
+        water_times, water_values = [], []
+    if not food_ts:
+        food_times, food_values = [], []
+
+    if days == 1:
+        title = f"Прогресс за {first_date}"
+    else:
+        title = f"Прогресс за {first_date}..{last_date}"
 
-    return buf
+    png = await render_pool.render(
+        render_progress_png, title, water_times, water_values, food_times, food_values,
+        user.get("water_goal"), user.get("calorie_goal"), daily,
+        on_wait=on_wait,
+    )
+    return io.BytesIO(png)
 
 async def show_graph(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     if user_id not in users or "water_logs" not in users[user_id]:
         await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
         return
-    
-    # Проверим аргументы
-    if len(context.args) > 0:
-        target_date = context.args[0]  # ожидаем формат 'YYYY-MM-DD'
-    else:
-        # По умолчанию - сегодня
-        target_date = datetime.now().strftime("%Y-%m-%d")
 
-    buf = generate_time_based_plots(user_id, target_date)
-    if buf is None:
-        await update.message.reply_text(f"Данных для даты {target_date} нет.")
+    # Период: сегодня, дата, week, month или from..to
+    today = datetime.now().date()
+    try:
+        first_date, last_date = parse_period(context.args, today)
+    except ValueError:
+        await update.message.reply_text(
+            "Укажите дату (ГГГГ-ММ-ДД), период (ГГГГ-ММ-ДД..ГГГГ-ММ-ДД, "
+            f"не больше {MAX_GRAPH_DAYS} дней), week или month.\n"
+            "Пример: /show_graph week"
+        )
         return
+    period = str(first_date) if first_date == last_date else f"{first_date}..{last_date}"
+
+    # Графики за прошедшие дни не меняются, с сегодняшним днем — зависят от версии логов
+    if last_date < today:
+        version = None
+    else:
+        version = users[user_id].get("log_version", 0)
+
+    cached = graph_cache.get(user_id, period, version)
+    if cached is not None:
+        png, file_id = cached
+        photo = file_id or io.BytesIO(png)
+    else:
+        async def notify_rendering():
+            await update.message.reply_text("Рисую график…")
+
+        try:
+            buf = await generate_time_based_plots(user_id, first_date, last_date, on_wait=notify_rendering)
+        except RenderQueueFull:
+            await update.message.reply_text("Сейчас строится слишком много графиков. Попробуйте через минуту.")
+            return
+        if buf is None:
+            await update.message.reply_text(f"Данных за {period} нет.")
+            return
+        graph_cache.put(user_id, period, version, buf.getvalue())
+        photo = buf
 
     # Отправляем картинку
-    await context.bot.send_photo(
+    message = await context.bot.send_photo(
         chat_id=update.effective_chat.id,
-        photo=buf,
-        caption=f"Прогресс за {target_date}"
+        photo=photo,
+        caption=f"Прогресс за {period}"
     )
+    # Повторно отправлять будем по file_id, без загрузки байтов
+    if message.photo:
+        graph_cache.set_file_id(user_id, period, version, message.photo[-1].file_id)
+
+
+# Команда /workouts — полный каталог тренировок (тексты готовятся при старте)
+async def workouts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    for page in workout_catalog.list_pages:
+        await update.message.reply_text(page)
+
+
+# Команда /export — профиль и вся история одним файлом
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.message.from_user.id
+    if user_id not in users:
+        await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
+        return
+
+    fmt = "csv" if context.args and context.args[0].lower() == "csv" else "ndjson"
+    # Файл пишется пачками во временный файл на диске (память не растет)
+    # и в отдельном потоке, чтобы не блокировать цикл событий
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as f:
+        written = await asyncio.to_thread(write_records, export_user(user_id, users[user_id]), f, fmt)
+        f.flush()
+        f.buffer.seek(0)
+        await context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document=f.buffer,
+            filename=f"history_{user_id}.{fmt}",
+            caption=f"Записей: {written}. Загрузить обратно: отправьте файл с подписью /import.",
+        )
+
+
+# Команда /import — ждем файл (или файл сразу с подписью /import)
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.message.from_user.id
+    if user_id not in users:
+        await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
+        return
+    # Ожидание файла — состояние диалога, а не профиля: в хранилище не пишется
+    context.user_data["awaiting_import"] = True
+    await update.message.reply_text(
+        "Пришлите файл .ndjson или .csv (формат как у /export): "
+        "записи о воде, еде, тренировках и профиль."
+    )
+
+
+async def handle_import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.message.from_user.id
+    caption = (update.message.caption or "").strip()
+    awaiting = context.user_data.pop("awaiting_import", False)
+    if user_id not in users or not (awaiting or caption.startswith("/import")):
+        await update.message.reply_text("Чтобы загрузить историю, отправьте файл с подписью /import.")
+        return
+
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await update.message.reply_text("Файл слишком большой (больше 20 МБ). Разбейте его на части.")
+        return
+
+    buf = io.BytesIO()
+    telegram_file = await context.bot.get_file(document.file_id)
+    await telegram_file.download_to_memory(buf)
+    buf.seek(0)
+    text = io.TextIOWrapper(buf, encoding="utf-8-sig", errors="replace", newline="")
+    fmt = detect_format(document.file_name or "")
+
+    # Пользователь уже загружен, импорт трогает только его записи. Файл
+    # читается и проверяется в потоке, с логами сливается в цикле событий
+    result = await import_records_async(read_records(text, fmt), users, storage, user_id)
+    graph_cache.invalidate_user(user_id)
+
+    reply = f"Импортировано записей: {result['imported']}, пропущено: {result['skipped']}."
+    if result["errors"]:
+        reply += "\n" + "\n".join(result["errors"])
+    await update.message.reply_text(reply)
 
 
 def get_recommendations(user_id):
@@ -498,63 +671,184 @@ def get_recommendations(user_id):
       - Недостатке выпитой воды (если выпито меньше 80% от дневной нормы).
       - Перебое или недостатке калорий в рационе.
       - Балансе между потреблёнными и сожженными калориями.
+    Обычно берутся из готового отчета (reports.py); если после расчета
+    пользователь что-то записал, правила проверяются заново.
     """
     user_data = users[user_id]
-    water_goal = user_data.get("water_goal", 0)
-    logged_water = user_data.get("logged_water", 0)
-    calorie_goal = user_data.get("calorie_goal", 0)
-    logged_calories = user_data.get("logged_calories", 0)
-    burned_calories = user_data.get("burned_calories", 0)
+    report = daily_reports.store.fresh(user_id, user_data, datetime.now().date())
+    if report is not None:
+        return recommendation_text(report["flags"])
 
-    recommendations = []
+    logged_water, logged_calories, burned_calories = get_today_totals(user_id)
+    return recommendation_text(flags_for(user_data.get("water_goal", 0), user_data.get("calorie_goal", 0),
+                                         logged_water, logged_calories, burned_calories))
 
-    # Рекомендация по воде:
-    water_deficit = water_goal - logged_water
-    if water_deficit > water_goal * 0.2:
-        recommendations.append("Вы выпили недостаточно воды. Рекомендуем выпить еще стакан чистой воды.")
+async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.message.from_user.id
+    if user_id not in users or "water_goal" not in users[user_id]:
+        await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
+        return
 
-    # Рекомендация по рациону:
-    if logged_calories > calorie_goal:
-        recommendations.append("Ваш рацион превышает дневную норму калорий. Попробуйте выбрать легкие блюда (например, овощной салат или суп), чтобы немного снизить потребление калорий.")
-    elif logged_calories < calorie_goal * 0.7:
-        recommendations.append("Вы потребляете меньше калорий, чем требуется. Убедитесь, что получаете достаточное количество питательных веществ.")
+    recs = get_recommendations(user_id)
+    await update.message.reply_text(recs)
 
-    # Рекомендация по физической активности:
-    net_calories = logged_calories - burned_calories  # "чистые" калории, остающиеся после активности
-    if net_calories > calorie_goal:
-        recommendations.append("Ваш калорийный баланс довольно высок. Рекомендуем выполнить 30 минут кардио (например, бег или быструю ходьбу) для повышения расхода калорий.")
-    elif burned_calories < calorie_goal * 0.2:
-        recommendations.append("Добавьте физической активности в свой день. Например, попробуйте 20–30 минут йоги или легкой зарядки.")
+# Команда /report — готовый дневной отчет
+async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.message.from_user.id
+    if user_id not in users or "water_goal" not in users[user_id]:
+        await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
+        return
 
-    if not recommendations:
-        recommendations.append("Отлично! Вы хорошо соблюдаете свои нормы.")
+    report = daily_reports.store.lookup(user_id, users[user_id], datetime.now().date())
+    await update.message.reply_text(format_report(report))
 
-    return "\n".join(recommendations)
 
-async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Команда /reminders — включить, выключить, тихие часы и часовой пояс
+async def reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     if user_id not in users or "water_goal" not in users[user_id]:
         await update.message.reply_text("Сначала настройте профиль с помощью /set_profile.")
         return
 
-    recs = get_recommendations(user_id)
-    await update.message.reply_text(recs)
+    settings = dict(users[user_id].get("reminders") or {})
+    args = [arg.lower() for arg in context.args]
+    if args and args[0] in ("on", "вкл"):
+        settings["enabled"] = True
+    elif args and args[0] in ("off", "выкл"):
+        settings["enabled"] = False
+    elif len(args) == 2 and args[0] in ("quiet", "тихо"):
+        settings["quiet"] = args[1]
+    elif len(args) == 2 and args[0] in ("tz", "пояс"):
+        settings["tz"] = context.args[1]
+    elif args:
+        await update.message.reply_text(
+            "Используйте формат: /reminders on, /reminders off, "
+            "/reminders quiet 22-8 или /reminders tz Europe/Moscow (или +3)."
+        )
+        return
 
+    try:
+        schedule = reminders.schedule_for(settings)
+    except ValueError as e:
+        await update.message.reply_text(f"{e}.")
+        return
+    if args:
+        users[user_id]["reminders"] = settings
+        reminders.update(user_id, settings)
+        save_user(user_id)
+
+    status = "включены" if settings.get("enabled") else "выключены (/reminders on)"
+    tz = settings.get("tz") or config.REMINDER_TIMEZONE or "как у сервера"
+    await update.message.reply_text(
+        f"Напоминания {status}.\n"
+        f"Тихие часы: {format_quiet_hours(schedule.quiet_start, schedule.quiet_end)}, часовой пояс: {tz}.\n"
+        "Бот напомнит выпить воды, если вы отстаете от дневной нормы, и поесть — "
+        "если за день записано слишком мало калорий."
+    )
 
-# Основная функция
-def main():
-    TOKEN = "telegram_key"
-    application = ApplicationBuilder().token(TOKEN).build()
+
+async def warm_up():
+    """
+    Прогрев тяжелых подсистем в фоне, когда бот уже принимает обновления:
+    процессы отрисовки, HTTP-клиент, соединения с хранилищем и индексом
+    продуктов, NumPy. Без прогрева все это создается при первом обращении.
+    """
+    rendering = asyncio.ensure_future(render_pool.warm_up())
+    upstream.warm_up()
+    startup.mark("HTTP-клиент")
+    storage.warm_up()
+    startup.mark("хранилище")
+    product_index.warm_up()
+    startup.mark("индекс продуктов")
+    # NumPy (графики за период, отчеты) — не на пути старта, а здесь, в потоке
+    await asyncio.to_thread(load_numpy)
+    startup.mark("NumPy")
+    # В режиме нескольких процессов (sharding.py) — только свои пользователи
+    reminders.load(
+        (user_id, settings) for user_id, settings in await asyncio.to_thread(storage.reminder_settings)
+        if shard_for(user_id, config.SHARD_COUNT) == config.SHARD_INDEX
+    )
+    startup.mark("расписание напоминаний")
+    try:
+        await rendering
+    except Exception as e:
+        # Не страшно: процессы запустятся при первом графике
+        logger.warning(f"Не удалось прогреть пул отрисовки: {e!r}")
+    startup.mark("процессы отрисовки")
+    logger.info("Холодный старт:\n" + startup.report())
+
+
+warm_up_task = None
+
+
+async def preload_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Профиль и история читаются из хранилища в потоке, до обработчиков,
+    # которые обращаются к users синхронно
+    if update.effective_user is not None:
+        await users.load_async(update.effective_user.id)
+
+
+async def mark_first_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    elapsed = startup.mark_once("первое обновление")
+    if elapsed is not None:
+        logger.info(f"Первое обновление через {elapsed:.2f} с после запуска процесса")
+
+
+# После запуска бота поднимаем сервер метрик и прогреваем остальное в фоне
+async def on_startup(application):
+    global warm_up_task
+    startup.mark("подключение к Telegram")
+    await metrics.start()
+    reminders.start(application)
+    daily_reports.start(application)
+    warm_up_task = asyncio.create_task(warm_up())
+
+
+# При остановке бота закрываем пулы и дописываем изменения в хранилище
+async def on_shutdown(application):
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    reminders.stop()
+    daily_reports.stop()
+    await metrics.stop()
+    await upstream.aclose()
+    render_pool.shutdown()
+    storage.close()
+    logger.info(f"Кэш погоды: {weather_cache.stats()}")
+    logger.info(f"Кэш продуктов: {product_cache.stats()}")
+
+
+def build_application(token=None):
+    builder = (
+        ApplicationBuilder()
+        .token(token or config.TELEGRAM_TOKEN)
+        .base_url(config.TELEGRAM_BASE_URL)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .rate_limiter(outbound)
+    )
+    if config.METRICS_ENABLED:
+        builder = builder.request(InstrumentedTelegramRequest(connection_pool_size=256))
+    if config.CONCURRENT_UPDATES > 1:
+        # Разные пользователи — параллельно, один пользователь — по очереди
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(config.CONCURRENT_UPDATES))
+    application = builder.build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("set_profile", set_profile))
     application.add_handler(CommandHandler("log_water", log_water))
     application.add_handler(CommandHandler("log_food", log_food))
     application.add_handler(CommandHandler("log_workout", log_workout))
+    application.add_handler(CommandHandler("workouts", workouts_command))
     application.add_handler(CommandHandler("show_graph", show_graph))
     application.add_handler(CommandHandler("check_progress", check_progress))
     application.add_handler(CommandHandler("recommend", recommend_command))
+    application.add_handler(CommandHandler("report", report_command))
+    application.add_handler(CommandHandler("reminders", reminders_command))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("import", import_command))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_import_document))
 
 
     application.add_handler(
@@ -566,7 +860,51 @@ def main():
         group=1  # следующая группа
     )
 
-    application.run_polling()
+    # Замер времени и ошибок всех обработчиков (если метрики включены)
+    metrics.instrument_application(application)
+    # Время до первого обновления — в лог (обработчик ничего не отвечает)
+    application.add_handler(TypeHandler(Update, preload_user), group=-2)
+    application.add_handler(TypeHandler(Update, mark_first_update), group=-1)
+    metrics.register_callback(
+        "bot_update_queue_depth", "Обновления, ожидающие обработки", (),
+        lambda: {(): application.update_queue.qsize()},
+    )
+
+    return application
+
+
+def measure_startup():
+    """
+    python bot.py --startup-timing: импорты, сборка приложения и прогрев
+    без подключения к Telegram; печатает длительность этапов и выходит.
+    """
+    build_application(token=config.TELEGRAM_TOKEN or "0:startup-timing")
+    startup.mark("сборка приложения")
+
+    async def run():
+        try:
+            await warm_up()
+        finally:
+            await upstream.aclose()
+
+    asyncio.run(run())
+    render_pool.shutdown()
+    storage.close()
+
+
+# Основная функция
+def main():
+    if "--startup-timing" in sys.argv[1:]:
+        measure_startup()
+        return
+
+    application = build_application()
+    startup.mark("сборка приложения")
+    if config.BOT_MODE == "webhook":
+        from webhook import run_webhook  # uvicorn нужен только в этом режиме
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Асинхронный кэш с временем жизни записей для ответов внешних сервисов.
+
+- свежая запись (моложе ttl) отдается без запроса;
+- одновременные запросы одного ключа объединяются в один запрос к сервису;
+- если сервис не ответил, отдается устаревшая запись (моложе stale_ttl);
+- число записей ограничено, вытесняются давно не использованные.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    def __init__(self, name, ttl, stale_ttl, max_size):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # запросы, которые дождались чужого запроса к сервису
+        self.stale_hits = 0  # сервис не ответил, отдали устаревшее значение
+        self._entries = OrderedDict()  # ключ -> (значение, время записи)
+        self._inflight = {}  # ключ -> задача запроса к сервису
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key, fetch):
+        """
+        Значение по ключу; при промахе вызывается корутина fetch().
+        fetch возвращает None, если получить значение не удалось.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._refresh(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def put(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _refresh(self, key, fetch):
+        try:
+            value = await fetch()
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении кэша {self.name}: {e!r}")
+            value = None
+
+        if value is not None:
+            self.put(key, value)
+            return value
+
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.stale_ttl:
+            self.stale_hits += 1
+            return entry[0]
+        return None
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+        }
@@ -0,0 +1,118 @@
+"""
+Настройки бота.
+
+Все значения можно переопределить переменными окружения (удобно для Docker).
+"""
+import os
+
+# Ключи доступа
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "telegram_key")
+OPENWEATHERMAP_KEY = os.getenv("OPENWEATHERMAP_KEY", "openweathermap_key")
+
+# Адрес Bot API (можно подменить на локальный сервер или заглушку)
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "https://api.telegram.org/bot")
+
+# Режим получения обновлений: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # внешний адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+# Заголовок X-Telegram-Bot-Api-Secret-Token; пустой — случайный при старте (нужен WEBHOOK_URL)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Сколько обновлений обрабатывается одновременно (1 — строго по очереди).
+# Обновления одного пользователя всегда обрабатываются по порядку (см. scheduler.py)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))
+
+# Исходящие запросы к Bot API (см. outbound.py)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "25"))  # сообщений в секунду (лимит Telegram — 30)
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))  # сообщений в секунду в один чат
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))  # сколько можно отправить в чат подряд
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))  # повторов после 429
+
+# Шардирование (python sharding.py): число процессов-воркеров; у каждого
+# свои пользователи (user_id % SHARD_COUNT == SHARD_INDEX, индекс и число
+# воркеру передает front-процесс)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+
+# Адреса внешних сервисов (можно подменить на локальную заглушку)
+OPENWEATHERMAP_URL = os.getenv("OPENWEATHERMAP_URL", "http://api.openweathermap.org/data/2.5/weather")
+OPENFOODFACTS_URL = os.getenv("OPENFOODFACTS_URL", "https://world.openfoodfacts.org/cgi/search.pl")
+
+# HTTP-клиент
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # сек, общий таймаут запроса
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # сек
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # сек
+
+# Сколько одновременных запросов разрешено к каждому сервису
+UPSTREAM_CONCURRENCY = {
+    "openweathermap": int(os.getenv("OPENWEATHERMAP_CONCURRENCY", "10")),
+    "openfoodfacts": int(os.getenv("OPENFOODFACTS_CONCURRENCY", "5")),
+}
+# Таймауты для отдельных сервисов (сек)
+UPSTREAM_TIMEOUT = {
+    "openweathermap": float(os.getenv("OPENWEATHERMAP_TIMEOUT", "5")),
+    "openfoodfacts": float(os.getenv("OPENFOODFACTS_TIMEOUT", "10")),
+}
+
+# Отрисовка графиков
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))  # процессов в пуле
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "20"))  # сколько графиков может ждать в очереди
+# "lite" — встроенный рендерер без зависимостей, "matplotlib" — прежние графики
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "lite")
+
+# Каталог тренировок (MET, синонимы)
+WORKOUT_CATALOG_PATH = os.getenv(
+    "WORKOUT_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "workouts.txt"))
+
+# Кэш готовых графиков (байт)
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Хранилище: "sqlite", "journal" (в памяти + журнал на диске) или "memory" (данные теряются при перезапуске)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "bot.db")
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "500"))  # записей в одной транзакции
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "0.05"))  # сек ожидания пачки
+STORAGE_WRITE_RETRIES = int(os.getenv("STORAGE_WRITE_RETRIES", "3"))  # повторов пачки после ошибки SQLite
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))  # пользователей в памяти (SQLite), дальше — выгрузка
+USER_EVICT_IDLE = float(os.getenv("USER_EVICT_IDLE", "600"))  # сек без обращений, после которых можно выгрузить
+
+# Журнал (STORAGE_BACKEND=journal): данные в памяти, каждое изменение — в журнал на диске
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journal")
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "0.01"))  # сек: пачка изменений на один fsync
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "1") == "1"  # 0 — без fsync: переживет падение процесса, но не ОС
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(64 * 1024 * 1024)))  # размер сегмента до снимка
+JOURNAL_SNAPSHOT_INTERVAL = float(os.getenv("JOURNAL_SNAPSHOT_INTERVAL", "3600"))  # сек: снимок и по времени
+
+# Напоминания о воде и еде (/reminders)
+REMINDER_INTERVAL = float(os.getenv("REMINDER_INTERVAL", "3600"))  # сек между проверками одного пользователя
+REMINDER_TICK = float(os.getenv("REMINDER_TICK", "30"))  # сек, как часто снимать наступившие проверки
+REMINDER_QUEUE_SIZE = int(os.getenv("REMINDER_QUEUE_SIZE", "1000"))  # напоминаний, ожидающих отправки
+REMINDER_QUIET_HOURS = os.getenv("REMINDER_QUIET_HOURS", "22:00-08:00")  # по умолчанию
+REMINDER_TIMEZONE = os.getenv("REMINDER_TIMEZONE", "")  # по умолчанию; пусто — пояс сервера
+
+# Дневные отчеты и рекомендации для всех пользователей (/report, /recommend)
+REPORT_INTERVAL = float(os.getenv("REPORT_INTERVAL", "3600"))  # сек между пересчетами
+
+# Кэш погоды по городам
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "3600"))  # сек
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", str(24 * 3600)))  # сек, если сервис недоступен
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "10000"))  # городов
+
+# Поиск продуктов
+PRODUCT_INDEX_PATH = os.getenv("PRODUCT_INDEX_PATH", "products.db")  # локальный индекс (необязателен)
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", str(7 * 24 * 3600)))  # сек
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "50000"))  # запросов
+OPENFOODFACTS_PAGE_SIZE = int(os.getenv("OPENFOODFACTS_PAGE_SIZE", "5"))  # товаров в ответе API
+
+# Метрики (формат Prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # 0 — не поднимать HTTP-сервер
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))  # сек, 0 — не писать отчет в лог
@@ -0,0 +1,148 @@
+"""
+История записей (вода, еда, тренировки), разбитая по дням.
+
+Записи пользователя хранятся компактно, в двух параллельных массивах:
+время (секунды epoch, array('I')) и значение (array('d')), отсортированных
+по времени — около 12 байт на запись вместо словаря с datetime. Поверх них
+ведется индекс дней (тоже массивы): номер дня, где начинаются его записи,
+и сумма за день. Поэтому график или прогресс за день считаются только по
+записям этого дня, без просмотра всей истории. "Выпито сегодня" — это
+просто total(today), так что суммы сами обнуляются в полночь (по локальному
+времени сервера).
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from heapq import merge
+from itertools import repeat
+from operator import itemgetter
+
+
+class DailyLog:
+    __slots__ = ("_times", "_values", "_days", "_starts", "_totals")
+
+    def __init__(self, entries=()):
+        self._times = array("I")  # секунды epoch, по возрастанию
+        self._values = array("d")
+        self._days = array("I")  # date.toordinal() дней, у которых есть записи
+        self._starts = array("I")  # индекс первой записи дня в _times
+        self._totals = array("d")  # сумма за день
+        for dt, value in entries:
+            self.add(dt, value)
+
+    def _append(self, ts, day, value):
+        self._times.append(ts)
+        self._values.append(value)
+        if self._days and self._days[-1] == day:
+            self._totals[-1] += value
+        else:
+            self._days.append(day)
+            self._starts.append(len(self._times) - 1)
+            self._totals.append(value)
+
+    def add(self, dt, value):
+        ts = int(dt.timestamp())
+        day = dt.date().toordinal()
+
+        if not self._times or ts >= self._times[-1]:
+            # Обычный случай: новая запись позже всех остальных
+            self._append(ts, day, value)
+            return
+
+        # Запись из прошлого (например, при импорте) — вставляем по месту
+        pos = bisect_right(self._times, ts)
+        self._times.insert(pos, ts)
+        self._values.insert(pos, value)
+        i = bisect_left(self._days, day)
+        if i < len(self._days) and self._days[i] == day:
+            self._totals[i] += value
+            i += 1
+        else:
+            self._days.insert(i, day)
+            self._starts.insert(i, pos)
+            self._totals.insert(i, value)
+            i += 1
+        for j in range(i, len(self._starts)):
+            self._starts[j] += 1
+
+    def extend(self, entries):
+        """
+        Добавляет много записей [(datetime, значение)] сразу (импорт).
+        Записи сортируются и сливаются с историей за один проход, вместо
+        вставки каждой записи по месту.
+        """
+        new = sorted((int(dt.timestamp()), dt.date().toordinal(), value) for dt, value in entries)
+        if not new:
+            return
+        if self._times and new[0][0] < self._times[-1]:
+            old = list(zip(self._times, self._entry_days(), self._values))
+            new = merge(old, new, key=itemgetter(0))
+            self._times, self._values = array("I"), array("d")
+            self._days, self._starts, self._totals = array("I"), array("I"), array("d")
+        for ts, day, value in new:
+            self._append(ts, day, value)
+
+    def _entry_days(self):
+        """Номер дня для каждой записи (по индексу дней)."""
+        ends = list(self._starts[1:]) + [len(self._times)]
+        for day, start, end in zip(self._days, self._starts, ends):
+            yield from repeat(day, end - start)
+
+    def _day_range(self, date):
+        i = bisect_left(self._days, date.toordinal())
+        if i == len(self._days) or self._days[i] != date.toordinal():
+            return None, 0, 0
+        end = self._starts[i + 1] if i + 1 < len(self._starts) else len(self._times)
+        return i, self._starts[i], end
+
+    def day_arrays(self, date):
+        """Время (секунды epoch) и значения за день в виде массивов."""
+        _, start, end = self._day_range(date)
+        return self._times[start:end], self._values[start:end]
+
+    def day(self, date):
+        """Записи за день [(datetime, значение)] в порядке времени."""
+        times, values = self.day_arrays(date)
+        return [(datetime.fromtimestamp(ts), value) for ts, value in zip(times, values)]
+
+    def range_arrays(self, start_ts, end_ts):
+        """Время и значения записей с start_ts (включительно) до end_ts."""
+        start = bisect_left(self._times, start_ts)
+        end = bisect_left(self._times, end_ts)
+        return self._times[start:end], self._values[start:end]
+
+    def day_totals(self, first_date, last_date):
+        """Индекс дней от first_date до last_date включительно: (номера дней, суммы)."""
+        start = bisect_left(self._days, first_date.toordinal())
+        end = bisect_right(self._days, last_date.toordinal())
+        return self._days[start:end], self._totals[start:end]
+
+    def total(self, date):
+        i, _, _ = self._day_range(date)
+        return self._totals[i] if i is not None else 0
+
+    def days(self):
+        return [datetime.fromordinal(day).date() for day in self._days]
+
+    def arrays(self):
+        """Вся история: (время, значения) в виде массивов."""
+        return self._times, self._values
+
+    def dump(self):
+        """Все массивы вместе с индексом дней (для снимков journal.py)."""
+        return self._times, self._values, self._days, self._starts, self._totals
+
+    @classmethod
+    def restore(cls, times, values, days, starts, totals):
+        """DailyLog из массивов dump() — без пересчета индекса дней."""
+        log = cls.__new__(cls)
+        log._times, log._values, log._days, log._starts, log._totals = times, values, days, starts, totals
+        return log
+
+    def __iter__(self):
+        """Все записи [(datetime, значение)] в порядке времени."""
+        for ts, value in zip(self._times, self._values):
+            yield datetime.fromtimestamp(ts), value
+
+    def __len__(self):
+        return len(self._times)
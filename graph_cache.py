@@ -0,0 +1,86 @@
+"""
+Кэш готовых графиков /show_graph.
+
+Ключ — (пользователь, период): дата "ГГГГ-ММ-ДД" или "ГГГГ-ММ-ДД..ГГГГ-ММ-ДД".
+Графики за прошедшие периоды не меняются, поэтому хранятся без проверки
+версии. Для периода, включающего сегодня, запись действительна, только пока
+совпадает версия логов пользователя (её увеличивают log_water_entry/
+log_food_entry). При изменении нормы кэш пользователя сбрасывается целиком.
+
+После первой отправки Telegram возвращает file_id картинки: он
+сохраняется в кэше, а сами байты PNG освобождаются — повторная
+отправка идет по file_id без загрузки файла.
+"""
+from collections import OrderedDict
+
+import config
+
+
+class GraphCache:
+    def __init__(self, max_bytes=None):
+        self.max_bytes = config.GRAPH_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (user_id, период) -> [version, png, file_id]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(png, file_id):
+        return len(png or b"") + len(file_id or "")
+
+    def get(self, user_id, date, version):
+        """
+        Возвращает (png, file_id) или None.
+        version=None означает, что график за этот день уже не меняется;
+        такой запрос не примет запись, построенную, пока день еще шел.
+        """
+        key = (user_id, date)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, user_id, date, version, png):
+        key = (user_id, date)
+        self._remove(key)
+        size = self._entry_size(png, None)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = [version, png, None]
+        self.size += size
+        self._evict()
+
+    def set_file_id(self, user_id, date, version, file_id):
+        """Запоминает file_id отправленной картинки и освобождает байты PNG."""
+        entry = self._entries.get((user_id, date))
+        if entry is None or entry[0] != version:
+            return
+        self.size -= self._entry_size(entry[1], entry[2])
+        entry[1] = None
+        entry[2] = file_id
+        self.size += self._entry_size(None, file_id)
+
+    def invalidate_user(self, user_id):
+        """Удаляет все графики пользователя (например, после сброса профиля)."""
+        for key in [k for k in self._entries if k[0] == user_id]:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= self._entry_size(entry[1], entry[2])
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.size -= self._entry_size(entry[1], entry[2])
+
+
+# Общий кэш для всего бота
+graph_cache = GraphCache()
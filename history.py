@@ -0,0 +1,334 @@
+"""
+Импорт и экспорт истории пользователей: профили, вода, еда и тренировки.
+
+Форматы — NDJSON (один JSON-объект на строку) и CSV с колонками CSV_FIELDS.
+Записи выглядят так:
+    {"type": "profile", "user_id": 1, "weight": 70, "height": 175, "age": 30, ...}
+    {"type": "water", "user_id": 1, "time": "2024-05-01T08:30:00", "amount": 250}
+    {"type": "food", "user_id": 1, "time": "2024-05-01T13:00:00", "calories": 420.5}
+    {"type": "workout", "user_id": 1, "time": "...", "calories": 300, "workout": "бег", "duration": 30}
+
+Экспорт и импорт идут потоком, пачками по CHUNK_SIZE записей, так что
+память не зависит от размера файла. Каждая запись проверяется; записи
+пачки сливаются с логами пользователя за один проход (DailyLog.extend),
+пишутся в хранилище одной пачкой (Storage.append_many) и увеличивают
+версию логов — так же, как log_water_entry/log_food_entry.
+
+Командная строка (бота на время импорта лучше остановить):
+    python history.py export backup.ndjson [--user 123]
+    python history.py import backup.ndjson [--user 123]
+"""
+import asyncio
+import csv
+import json
+import logging
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from daily_logs import DailyLog
+from storage import LOG_KEYS, create_storage, UserRegistry
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+MAX_ERRORS = 10  # сколько ошибок с номерами строк показывать
+
+# Тип записи -> (ключ лога в словаре пользователя, поле значения, максимум на одну запись)
+LOG_TYPES = {
+    "water": ("water_logs", "amount", 10000),
+    "food": ("food_logs", "calories", 20000),
+    "workout": ("workout_logs", "calories", 10000),
+}
+PROFILE_FIELDS = {
+    "weight": float,
+    "height": float,
+    "age": int,
+    "activity": int,
+    "city": str,
+    "water_goal": float,
+    "calorie_goal": float,
+}
+CSV_FIELDS = ["type", "user_id", "time", "amount", "calories", "workout", "duration", *PROFILE_FIELDS]
+
+
+class InvalidRecord(ValueError):
+    """Запись не прошла проверку."""
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def detect_format(filename):
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+# --- Экспорт
+
+def export_user(user_id, user_data):
+    """Записи одного пользователя: профиль, затем логи по времени."""
+    profile = {field: user_data[field] for field in PROFILE_FIELDS if user_data.get(field) is not None}
+    if profile:
+        yield {"type": "profile", "user_id": user_id, **profile}
+    for kind, (key, field, _) in LOG_TYPES.items():
+        log = user_data.get(key)
+        if log is None:
+            continue
+        times, values = log.arrays()
+        # Тип и длительность тренировки в памяти не хранятся — только калории
+        # (экспорт тренировок их теряет, см. README)
+        for ts, value in zip(times, values):
+            yield {"type": kind, "user_id": user_id,
+                   "time": datetime.fromtimestamp(ts).isoformat(), field: value}
+
+
+def write_records(records, f, fmt):
+    """Пишет записи в текстовый файл f пачками; возвращает их число."""
+    written = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for chunk in chunked(records):
+            writer.writerows(chunk)
+            written += len(chunk)
+    else:
+        for chunk in chunked(records):
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in chunk))
+            written += len(chunk)
+    return written
+
+
+# --- Импорт
+
+def read_records(f, fmt):
+    """Записи из текстового файла: (номер строки, словарь или None, если строка не разобрана)."""
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(f), 2):
+            yield line_no, {k: v for k, v in row.items() if k and v not in ("", None)}
+        return
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_no, record if isinstance(record, dict) else None
+
+
+def _number(record, field, convert, low, high):
+    try:
+        value = convert(float(record[field])) if convert is int else convert(record[field])
+    except KeyError:
+        raise InvalidRecord(f"нет поля {field}")
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"некорректное значение {field}")
+    if not low <= value <= high:
+        raise InvalidRecord(f"{field} вне допустимого диапазона")
+    return value
+
+
+def parse_record(record, user_id=None, now=None):
+    """
+    Проверяет запись и возвращает (user_id, тип, данные):
+    для профиля — словарь полей, для логов — (datetime, значение),
+    для тренировок — (datetime, ккал, тип, минуты).
+    Если user_id задан, записи относятся к нему (поле user_id не нужно).
+    """
+    if record is None:
+        raise InvalidRecord("строка не разобрана")
+    kind = record.get("type")
+    if user_id is None:
+        try:
+            user_id = int(record["user_id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidRecord("нет user_id")
+
+    if kind == "profile":
+        profile = {}
+        for field, convert in PROFILE_FIELDS.items():
+            if field in record:
+                if convert is str:
+                    profile[field] = str(record[field]).strip()[:100]
+                else:
+                    profile[field] = _number(record, field, convert, 0, 100000)
+        if not profile:
+            raise InvalidRecord("пустой профиль")
+        return user_id, kind, profile
+
+    if kind not in LOG_TYPES:
+        raise InvalidRecord(f"неизвестный тип {kind!r}")
+    _, field, maximum = LOG_TYPES[kind]
+    try:
+        dt = datetime.fromisoformat(str(record["time"]))
+    except KeyError:
+        raise InvalidRecord("нет поля time")
+    except ValueError:
+        raise InvalidRecord("некорректное время")
+    if dt.tzinfo is not None:
+        # Логи хранятся в местном времени сервера
+        dt = dt.astimezone().replace(tzinfo=None)
+    if dt > (now or datetime.now()) + timedelta(days=1):
+        raise InvalidRecord("время в будущем")
+    # История хранит время в array('I'): секунды epoch от 0 до 2**32-1
+    try:
+        ts = dt.timestamp()
+    except (ValueError, OverflowError, OSError):
+        raise InvalidRecord("некорректное время")
+    if not 0 <= ts <= 2**32 - 1:
+        raise InvalidRecord("некорректное время")
+    value = _number(record, field, float, 0, maximum)
+    if kind == "workout":
+        duration = _number(record, "duration", int, 0, 24 * 60) if "duration" in record else 0
+        return user_id, kind, (dt, value, str(record.get("workout", "импорт"))[:50], duration)
+    return user_id, kind, (dt, value)
+
+
+def _ensure_user(users, user_id):
+    # Пользователь без профиля тоже может получить историю (например, при
+    # восстановлении из бэкапа, где логи идут раньше профиля)
+    if user_id in users:
+        user_data = users[user_id]
+    else:
+        user_data = users[user_id] = {}
+    for key in LOG_KEYS:
+        user_data.setdefault(key, DailyLog())
+    user_data.setdefault("log_version", 0)
+    return user_data
+
+
+def parse_chunk(chunk, result, user_id=None, now=None):
+    """
+    Проверяет пачку (номер строки, запись), ничего не меняя: возвращает
+    профили [(user_id, поля)] и записи логов {(user_id, тип): записи}.
+    Пропуски и ошибки считаются в result. Можно вызывать в другом потоке.
+    """
+    profiles = []
+    entries = defaultdict(list)  # (user_id, тип) -> записи
+    for line_no, record in chunk:
+        try:
+            record_user, kind, data = parse_record(record, user_id, now)
+        except InvalidRecord as e:
+            result["skipped"] += 1
+            if len(result["errors"]) < MAX_ERRORS:
+                result["errors"].append(f"строка {line_no}: {e}")
+            continue
+        if kind == "profile":
+            profiles.append((record_user, data))
+        else:
+            entries[record_user, kind].append(data)
+    return profiles, entries
+
+
+def apply_chunk(profiles, entries, users, storage, result):
+    """Сливает проверенную пачку (parse_chunk) с users и пишет ее в storage."""
+    touched = set()
+    for record_user, data in profiles:
+        _ensure_user(users, record_user).update(data)
+        touched.add(record_user)
+        result["imported"] += 1
+
+    for (record_user, kind), rows in entries.items():
+        key = LOG_TYPES[kind][0]
+        user_data = _ensure_user(users, record_user)
+        user_data[key].extend((row[0], row[1]) for row in rows)
+        storage.append_many(key, record_user, rows)
+        touched.add(record_user)
+        result["imported"] += len(rows)
+
+    for record_user in touched:
+        user_data = users[record_user]
+        user_data["log_version"] = user_data.get("log_version", 0) + 1
+        storage.save_profile(record_user, user_data)
+    result["users"] |= touched
+
+
+def _new_result():
+    return {"imported": 0, "skipped": 0, "errors": [], "users": set()}
+
+
+def import_records(records, users, storage, user_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Импортирует записи (номер строки, запись) в users и storage.
+    Возвращает словарь: imported, skipped, errors (первые MAX_ERRORS), users.
+    """
+    result = _new_result()
+    now = datetime.now()
+    for chunk in chunked(records, chunk_size):
+        apply_chunk(*parse_chunk(chunk, result, user_id, now), users, storage, result)
+    return result
+
+
+def _parse_next(chunks, user_id, now, result):
+    chunk = next(chunks, None)
+    return None if chunk is None else parse_chunk(chunk, result, user_id, now)
+
+
+async def import_records_async(records, users, storage, user_id=None, chunk_size=CHUNK_SIZE):
+    """
+    То же для бота: чтение и проверка пачки идут в потоке, а слияние с
+    users и storage — в цикле событий, пачка за пачкой. Логи и профили
+    пользователей меняет только цикл событий (их же читают обработчики,
+    напоминания и отчеты).
+    """
+    result = _new_result()
+    now = datetime.now()
+    chunks = chunked(records, chunk_size)
+    while (parsed := await asyncio.to_thread(_parse_next, chunks, user_id, now, result)) is not None:
+        apply_chunk(*parsed, users, storage, result)
+    return result
+
+
+def main():
+    import argparse
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Импорт и экспорт истории пользователей")
+    parser.add_argument("--storage", help="хранилище (по умолчанию STORAGE_BACKEND)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="выгрузить профили и логи")
+    export.add_argument("path", help="файл .ndjson или .csv (- — стандартный вывод)")
+    export.add_argument("--user", type=int, help="только этот пользователь")
+    export.add_argument("--format", choices=("ndjson", "csv"))
+    load = commands.add_parser("import", help="загрузить профили и логи")
+    load.add_argument("path", help="файл .ndjson или .csv")
+    load.add_argument("--user", type=int, help="загрузить все записи этому пользователю")
+    load.add_argument("--format", choices=("ndjson", "csv"))
+    args = parser.parse_args()
+
+    storage = create_storage(args.storage)
+    fmt = args.format or detect_format(args.path)
+    started = datetime.now()
+    try:
+        if args.command == "export":
+            user_ids = [args.user] if args.user else storage.user_ids()
+            # Пользователи читаются по одному и не задерживаются в памяти
+            records = (record for uid in user_ids
+                       for record in export_user(uid, storage.load_user(uid) or {}))
+            if args.path == "-":
+                written = write_records(records, sys.stdout, fmt)
+            else:
+                with open(args.path, "w", encoding="utf-8", newline="") as f:
+                    written = write_records(records, f, fmt)
+            print(f"Выгружено {written} записей ({len(user_ids)} польз.) за "
+                  f"{(datetime.now() - started).total_seconds():.1f} с", file=sys.stderr)
+        else:
+            users = UserRegistry(storage)
+            with open(args.path, encoding="utf-8-sig", newline="") as f:
+                result = import_records(read_records(f, fmt), users, storage, user_id=args.user)
+            storage.flush()
+            print(f"Загружено {result['imported']} записей ({len(result['users'])} польз.), "
+                  f"пропущено {result['skipped']} за {(datetime.now() - started).total_seconds():.1f} с")
+            for error in result["errors"]:
+                print(f"  {error}")
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
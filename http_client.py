@@ -0,0 +1,115 @@
+"""
+Асинхронный HTTP-клиент для внешних сервисов (OpenWeatherMap, OpenFoodFacts).
+
+Один общий httpx.AsyncClient с пулом keep-alive соединений, таймаутами
+на каждый запрос и ограничением числа одновременных запросов к каждому сервису,
+чтобы медленный сервис не блокировал цикл событий и остальных пользователей.
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+from telegram.request import HTTPXRequest
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClient:
+    def __init__(self, concurrency=None, timeouts=None):
+        self._client = None
+        self._concurrency = dict(config.UPSTREAM_CONCURRENCY if concurrency is None else concurrency)
+        self._timeouts = dict(config.UPSTREAM_TIMEOUT if timeouts is None else timeouts)
+        self._semaphores = {}
+
+    def _get_client(self):
+        # Клиент создается лениво, уже внутри работающего цикла событий
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._client
+
+    def _get_semaphore(self, upstream):
+        semaphore = self._semaphores.get(upstream)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._concurrency.get(upstream, 10))
+            self._semaphores[upstream] = semaphore
+        return semaphore
+
+    def warm_up(self):
+        """Создает клиент заранее: настройка TLS занимает заметное время."""
+        self._get_client()
+
+    async def get_json(self, upstream, url, params=None):
+        """
+        GET-запрос к сервису upstream. Возвращает разобранный JSON
+        или None, если сервис не ответил вовремя или вернул ошибку.
+        """
+        client = self._get_client()
+        timeout = self._timeouts.get(upstream, config.HTTP_TIMEOUT)
+        async with self._get_semaphore(upstream):
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, params=params, timeout=timeout)
+            except httpx.HTTPError as e:
+                logger.warning(f"Запрос к {upstream} не удался: {e!r}")
+                self._observe(upstream, started, failed=True)
+                return None
+            self._observe(upstream, started, failed=response.status_code != 200)
+
+        if response.status_code != 200:
+            logger.warning(f"{upstream} вернул статус {response.status_code}")
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            logger.warning(f"{upstream} вернул некорректный JSON")
+            return None
+
+    @staticmethod
+    def _observe(upstream, started, failed):
+        if config.METRICS_ENABLED:
+            label = f"http_{upstream}"
+            metrics.call_duration.observe(time.perf_counter() - started, label)
+            if failed:
+                metrics.call_errors.inc(label)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Общий клиент для всего бота
+upstream = UpstreamClient()
+
+
+class InstrumentedTelegramRequest(HTTPXRequest):
+    """Запросы к Bot API с замером времени по методам (sendMessage, sendPhoto, ...)."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        if api_method == "getUpdates":
+            # Длинный опрос длится десятки секунд, в метриках он только мешает
+            return await super().do_request(url, method, request_data=request_data, **kwargs)
+        started = time.perf_counter()
+        label = f"telegram_{api_method}"
+        try:
+            code, payload = await super().do_request(url, method, request_data=request_data, **kwargs)
+        except Exception:
+            metrics.call_errors.inc(label)
+            raise
+        finally:
+            metrics.call_duration.observe(time.perf_counter() - started, label)
+        if code >= 400:
+            metrics.call_errors.inc(label)
+        return code, payload
@@ -0,0 +1,515 @@
+"""
+Хранилище-журнал: все данные в памяти, каждое изменение — в журнал на диске.
+
+Профили и логи живут в памяти процесса, как с MemoryStorage: словарь
+пользователя, который держит UserRegistry, и есть состояние хранилища.
+Но каждое изменение дописывается в журнал (write-ahead log): шаги
+настройки профиля и изменения нормы воды (как разница с прошлой
+сохраненной версией профиля), сброс истории, записи воды, еды и
+тренировок, пачки импорта. Запись кодируется в компактный двоичный вид
+в вызывающем потоке и ставится в очередь; фоновый поток пишет записи
+пачками (group commit): все, что накопилось за JOURNAL_FLUSH_INTERVAL, —
+одной записью в файл и одним fsync. При падении теряется только
+последняя еще не записанная пачка.
+
+Журнал разбит на сегменты. Когда сегмент дорастает до JOURNAL_SEGMENT_BYTES
+(или старше JOURNAL_SNAPSHOT_INTERVAL), писатель переходит к новому, а
+отдельный поток сворачивает прошлый снимок и закрытые сегменты в новый
+снимок — массивы DailyLog как есть, без пересчета индекса дней — и
+удаляет старые файлы. Живое состояние при этом не трогается. При старте
+загружается последний снимок и проигрываются сегменты после него;
+недописанный хвост последнего сегмента (падение посреди записи)
+отбрасывается по контрольной сумме.
+
+Файлы в JOURNAL_DIR (в режиме нескольких процессов — свой каталог у каждого воркера):
+  snapshot-<N>.bin — состояние перед сегментом N;
+  journal-<N>.log — сегменты журнала.
+"""
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from datetime import date, datetime
+
+import config
+from daily_logs import DailyLog
+from storage import LOG_KEYS, Storage
+
+try:
+    import fcntl
+except ImportError:  # не Unix: без блокировки каталога
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Запись журнала: длина и crc32 тела, затем тело — вид записи, user_id и данные
+FRAME = struct.Struct("<II")
+HEAD = struct.Struct("<Bq")
+ADD_ENTRY = struct.Struct("<Bdd")  # номер лога в LOG_KEYS, время (секунды epoch), значение
+WORKOUT = struct.Struct("<ddI")  # время, ккал, минуты; дальше — название
+MANY = struct.Struct("<BI")  # номер лога и число записей, дальше — записи:
+MANY_ENTRY = struct.Struct("<dd")  # время и значение
+MANY_WORKOUT = struct.Struct("<ddIB")  # время, ккал, минуты, длина названия; дальше — название
+
+PROFILE, RESET, ADD, ADD_WORKOUT, ADD_MANY = 1, 2, 3, 4, 5
+WORKOUT_LOG = LOG_KEYS.index("workout_logs")
+
+# Снимок: заголовок, пользователи (профиль в JSON и массивы DailyLog.dump()), crc32 всего файла
+SNAPSHOT_MAGIC = b"FTJS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sH?Q")  # метка, версия, little-endian, число пользователей
+USER_HEADER = struct.Struct("<qI")  # user_id, длина профиля
+LOG_HEADER = struct.Struct("<II")  # записей и дней в DailyLog
+LOG_ARRAYS = ("I", "d", "I", "I", "d")  # типы массивов DailyLog.dump()
+CRC = struct.Struct("<I")
+
+_STOP = object()
+_ROTATE = object()
+_MISSING = object()
+
+
+def _path(directory, kind, seq):
+    return os.path.join(directory, f"{kind}-{seq:08d}.{'bin' if kind == 'snapshot' else 'log'}")
+
+
+def _list(directory, kind):
+    """[(номер, путь)] снимков или сегментов по возрастанию номера."""
+    files = []
+    for name in os.listdir(directory):
+        stem, _, ext = name.partition(".")
+        prefix, _, seq = stem.partition("-")
+        if prefix == kind and seq.isdigit() and ext in ("bin", "log"):
+            files.append((int(seq), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def _fsync_dir(directory):
+    # Новое имя файла переживет сбой ОС только после fsync каталога
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _saved_value(value):
+    # Вложенные словари и списки меняются на месте (reminders["enabled"]) —
+    # для сравнения с прошлой версией храним их копию в JSON
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+
+
+def _saved_profile(user_data):
+    """Поля профиля (без логов) в том виде, в каком они сравниваются при сохранении."""
+    return {key: _saved_value(value) for key, value in user_data.items() if key not in LOG_KEYS}
+
+
+class JournalState:
+    """Пользователи, восстановленные из снимка и сегментов журнала."""
+
+    def __init__(self):
+        self.users = {}
+        self.records = 0
+
+    def _user(self, user_id):
+        user_data = self.users.get(user_id)
+        if user_data is None:
+            user_data = self.users[user_id] = {key: DailyLog() for key in LOG_KEYS}
+        return user_data
+
+    def apply(self, body):
+        kind, user_id = HEAD.unpack_from(body)
+        offset = HEAD.size
+        user_data = self._user(user_id)
+        if kind == PROFILE:
+            changed, removed = json.loads(bytes(body[offset:]))
+            user_data.update(changed)
+            for key in removed:
+                user_data.pop(key, None)
+        elif kind == RESET:
+            for key in LOG_KEYS:
+                user_data[key] = DailyLog()
+        elif kind == ADD:
+            index, ts, value = ADD_ENTRY.unpack_from(body, offset)
+            user_data[LOG_KEYS[index]].add(datetime.fromtimestamp(ts), value)
+        elif kind == ADD_WORKOUT:
+            # Тип и длительность тренировки в памяти не хранятся — только калории
+            ts, calories, _ = WORKOUT.unpack_from(body, offset)
+            user_data["workout_logs"].add(datetime.fromtimestamp(ts), calories)
+        elif kind == ADD_MANY:
+            index, count = MANY.unpack_from(body, offset)
+            offset += MANY.size
+            entries = []
+            for _ in range(count):
+                if index == WORKOUT_LOG:
+                    ts, value, _, name_size = MANY_WORKOUT.unpack_from(body, offset)
+                    offset += MANY_WORKOUT.size + name_size
+                else:
+                    ts, value = MANY_ENTRY.unpack_from(body, offset)
+                    offset += MANY_ENTRY.size
+                entries.append((datetime.fromtimestamp(ts), value))
+            user_data[LOG_KEYS[index]].extend(entries)
+        else:
+            raise ValueError(f"неизвестная запись журнала: {kind}")
+        self.records += 1
+
+    def replay(self, data):
+        """Применяет записи сегмента; возвращает длину целой части (дальше — оборванный хвост)."""
+        view = memoryview(data)
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            start = offset + FRAME.size
+            body = view[start:start + length]
+            if length < HEAD.size or len(body) < length or zlib.crc32(body) != crc:
+                break
+            self.apply(body)
+            offset = start + length
+        return offset
+
+    def write_snapshot(self, f):
+        crc = 0
+
+        def write(chunk):
+            nonlocal crc
+            crc = zlib.crc32(chunk, crc)
+            f.write(chunk)
+
+        write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "little", len(self.users)))
+        for user_id, user_data in self.users.items():
+            profile = json.dumps({key: value for key, value in user_data.items() if key not in LOG_KEYS},
+                                 ensure_ascii=False).encode()
+            write(USER_HEADER.pack(user_id, len(profile)))
+            write(profile)
+            for key in LOG_KEYS:
+                arrays = user_data[key].dump()
+                write(LOG_HEADER.pack(len(arrays[0]), len(arrays[2])))
+                for values in arrays:
+                    write(memoryview(values).cast("B"))
+        f.write(CRC.pack(crc))
+
+    def load_snapshot(self, data):
+        view = memoryview(data)
+        if len(data) < SNAPSHOT_HEADER.size + CRC.size or \
+                zlib.crc32(view[:-CRC.size]) != CRC.unpack_from(data, len(data) - CRC.size)[0]:
+            raise ValueError("снимок журнала поврежден")
+        magic, version, little, count = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("неизвестный формат снимка журнала")
+        swap = little != (sys.byteorder == "little")
+
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            user_id, size = USER_HEADER.unpack_from(data, offset)
+            offset += USER_HEADER.size
+            user_data = json.loads(bytes(view[offset:offset + size]))
+            offset += size
+            for key in LOG_KEYS:
+                entries, days = LOG_HEADER.unpack_from(data, offset)
+                offset += LOG_HEADER.size
+                arrays = []
+                for typecode, length in zip(LOG_ARRAYS, (entries, entries, days, days, days)):
+                    values = array(typecode)
+                    size = values.itemsize * length
+                    values.frombytes(view[offset:offset + size])
+                    offset += size
+                    if swap:
+                        values.byteswap()
+                    arrays.append(values)
+                user_data[key] = DailyLog.restore(*arrays)
+            self.users[user_id] = user_data
+
+
+def restore(directory, below=None, truncate=False):
+    """
+    Состояние из последнего снимка и сегментов после него (только до
+    сегмента below, если он задан). truncate — обрезать оборванный хвост
+    последнего сегмента. Возвращает (состояние, прочитано байт журнала).
+    """
+    state = JournalState()
+    base = 0
+    snapshots = [(seq, path) for seq, path in _list(directory, "snapshot") if below is None or seq <= below]
+    if snapshots:
+        base, path = snapshots[-1]
+        with open(path, "rb") as f:
+            state.load_snapshot(f.read())
+
+    segments = [(seq, path) for seq, path in _list(directory, "journal")
+                if seq >= base and (below is None or seq < below)]
+    replayed = 0
+    for i, (seq, path) in enumerate(segments):
+        with open(path, "rb") as f:
+            data = f.read()
+        end = state.replay(data)
+        replayed += end
+        if end < len(data):
+            last = i == len(segments) - 1
+            logger.warning(f"Журнал {path}: отброшено {len(data) - end} байт "
+                           f"{'недописанного хвоста' if last else 'после поврежденной записи'}")
+            if truncate and last:
+                os.truncate(path, end)
+    return state, replayed
+
+
+class JournalStorage(Storage):
+    def __init__(self, directory=None, flush_interval=None, fsync=None, segment_bytes=None,
+                 snapshot_interval=None):
+        self.directory = directory or config.JOURNAL_DIR
+        if directory is None and config.SHARD_COUNT > 1:
+            # У каждого воркера sharding.py свой журнал (число воркеров менять нельзя)
+            self.directory = os.path.join(self.directory, f"shard-{config.SHARD_INDEX}")
+        self.flush_interval = config.JOURNAL_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.fsync = config.JOURNAL_FSYNC if fsync is None else fsync
+        self.segment_bytes = segment_bytes or config.JOURNAL_SEGMENT_BYTES
+        self.snapshot_interval = snapshot_interval or config.JOURNAL_SNAPSHOT_INTERVAL
+        self.stats = {"replayed": 0, "records": 0, "batches": 0, "bytes": 0, "snapshots": 0}
+        self._users = None
+        self._saved = {}  # user_id -> поля профиля, как они записаны в журнал
+        self._seq = None  # номер текущего сегмента
+        self._lock_file = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._compactor = None
+
+    def _get_users(self):
+        # Журнал читается лениво: процессы отрисовки, которые
+        # импортируют bot.py, не должны его трогать
+        if self._users is None:
+            with self._lock:
+                if self._users is None:
+                    self._open()
+        return self._users
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise RuntimeError(f"Журнал {self.directory} уже открыт другим процессом")
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))  # недописанный снимок
+
+        started = time.perf_counter()
+        state, replayed = restore(self.directory, truncate=True)
+        files = _list(self.directory, "snapshot") + _list(self.directory, "journal")
+        # Запись всегда идет в новый сегмент
+        self._seq = max((seq for seq, _ in files), default=0) + 1
+        self._users = state.users
+        self.stats["replayed"] = state.records
+        logger.info(f"Журнал: {len(state.users)} польз., {state.records} записей журнала "
+                    f"за {time.perf_counter() - started:.2f} с")
+        if replayed >= self.segment_bytes:
+            # Длинный журнал — сворачиваем сразу, чтобы следующий старт был быстрым
+            self._start_compaction(self._seq)
+
+    def _put(self, kind, user_id, body):
+        payload = HEAD.pack(kind, user_id) + body
+        if self._writer is None:
+            self._get_users()  # номер сегмента известен только после восстановления
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+
+    # --- Чтение
+
+    def load_user(self, user_id):
+        user_data = self._get_users().get(user_id)
+        if user_data is not None and user_id not in self._saved:
+            self._saved[user_id] = _saved_profile(user_data)
+        return user_data
+
+    def user_ids(self):
+        return sorted(self._get_users())
+
+    def reminder_settings(self):
+        # Вызывается из другого потока: list() — снимок словаря
+        return [(user_id, dict(user_data["reminders"])) for user_id, user_data in list(self._get_users().items())
+                if (user_data.get("reminders") or {}).get("enabled")]
+
+    def profile_goals(self):
+        return sorted(
+            (user_id, user_data["water_goal"], user_data.get("calorie_goal"), user_data.get("log_version"))
+            for user_id, user_data in list(self._get_users().items()) if user_data.get("water_goal") is not None
+        )
+
+    def log_day_totals(self, key, first, days):
+        last = date.fromordinal(first.toordinal() + days - 1)
+        rows = []
+        for user_id, user_data in list(self._get_users().items()):
+            log = user_data.get(key)
+            if log is not None:
+                rows.extend((user_id, day - first.toordinal(), total)
+                            for day, total in zip(*log.day_totals(first, last)))
+        return rows
+
+    def warm_up(self):
+        self._get_users()
+
+    # --- Запись: словарь пользователя уже изменен вызывающим кодом, в журнал — только само изменение
+
+    def save_profile(self, user_id, user_data):
+        users = self._get_users()
+        saved = self._saved.get(user_id)
+        if saved is None:
+            previous = users.get(user_id)
+            saved = self._saved[user_id] = _saved_profile(previous) if previous is not None else {}
+        users[user_id] = user_data
+
+        # В журнал — только изменившиеся поля (обычно log_version) и удаленные
+        changed = {}
+        for key, value in user_data.items():
+            if key not in LOG_KEYS:
+                new = _saved_value(value) if isinstance(value, (dict, list)) else value
+                old = saved.get(key, _MISSING)
+                if old.__class__ is not new.__class__ or old != new:
+                    saved[key] = new
+                    changed[key] = value
+        removed = [key for key in saved if key not in user_data]
+        for key in removed:
+            del saved[key]
+        if changed or removed:
+            self._put(PROFILE, user_id, json.dumps([changed, removed], ensure_ascii=False).encode())
+
+    def reset_user(self, user_id):
+        self._put(RESET, user_id, b"")
+
+    def append_water(self, user_id, dt, amount):
+        self._put(ADD, user_id, ADD_ENTRY.pack(0, dt.timestamp(), amount))
+
+    def append_food(self, user_id, dt, calories):
+        self._put(ADD, user_id, ADD_ENTRY.pack(1, dt.timestamp(), calories))
+
+    def append_workout(self, user_id, dt, workout_type, duration, calories):
+        self._put(ADD_WORKOUT, user_id, WORKOUT.pack(dt.timestamp(), calories, duration) + workout_type.encode())
+
+    def append_many(self, key, user_id, entries):
+        index = LOG_KEYS.index(key)
+        parts = [MANY.pack(index, len(entries))]
+        if index == WORKOUT_LOG:
+            for dt, calories, workout_type, duration in entries:
+                name = workout_type.encode()[:255]
+                parts.append(MANY_WORKOUT.pack(dt.timestamp(), calories, duration, len(name)) + name)
+        else:
+            parts.extend(MANY_ENTRY.pack(dt.timestamp(), value) for dt, value in entries)
+        self._put(ADD_MANY, user_id, b"".join(parts))
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Дожидается записи (и fsync) всех изменений."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def compact(self):
+        """Сворачивает журнал в снимок сейчас и дожидается снимка."""
+        self._get_users()
+        if self._writer is not None:
+            self._queue.put(_ROTATE)
+            self.flush()
+        else:
+            self._start_compaction(self._seq)
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # --- Фоновые потоки
+
+    def _open_segment(self):
+        f = open(_path(self.directory, "journal", self._seq), "ab", buffering=0)
+        _fsync_dir(self.directory)
+        return f
+
+    def _write_loop(self):
+        f = self._open_segment()
+        size = 0
+        opened = time.monotonic()
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            # Group commit: все, что придет за flush_interval, — одна запись и один fsync.
+            # Пока поток спит, он не отнимает GIL у вызывающих
+            time.sleep(self.flush_interval)
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                records = [item for item in batch if item is not _STOP and item is not _ROTATE]
+                stop = _STOP in batch
+                if records:
+                    data = b"".join(records)
+                    f.write(data)
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                    size += len(data)
+                    self.stats["records"] += len(records)
+                    self.stats["batches"] += 1
+                    self.stats["bytes"] += len(data)
+                if size and (_ROTATE in batch or size >= self.segment_bytes
+                             or time.monotonic() - opened >= self.snapshot_interval):
+                    f.close()
+                    self._seq += 1
+                    f = self._open_segment()
+                    size = 0
+                    opened = time.monotonic()
+                    self._start_compaction(self._seq)
+            except OSError as e:
+                logger.error(f"Ошибка записи журнала: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        f.close()
+
+    def _start_compaction(self, upto):
+        if self._compactor is not None and self._compactor.is_alive():
+            return  # закрытые сегменты войдут в следующий снимок
+        self._compactor = threading.Thread(target=self._compact, args=(upto,), name="journal-snapshot", daemon=True)
+        self._compactor.start()
+
+    def _compact(self, upto):
+        started = time.perf_counter()
+        path = _path(self.directory, "snapshot", upto)
+        try:
+            state, _ = restore(self.directory, below=upto)
+            with open(path + ".tmp", "wb") as f:
+                state.write_snapshot(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            _fsync_dir(self.directory)
+            for seq, old in _list(self.directory, "snapshot") + _list(self.directory, "journal"):
+                if seq < upto:
+                    os.remove(old)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось сделать снимок журнала: {e!r}")
+            return
+        self.stats["snapshots"] += 1
+        logger.info(f"Снимок журнала: {len(state.users)} польз., {os.path.getsize(path) / 2**20:.1f} МБ "
+                    f"за {time.perf_counter() - started:.2f} с")
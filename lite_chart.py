@@ -0,0 +1,392 @@
+"""
+Легкая отрисовка графиков прогресса без matplotlib.
+
+Два накопительных графика (вода и калории) рисуются прямо в RGB-буфер:
+оси, сетка, подписи (встроенный растровый шрифт 5x7 с кириллицей),
+линии с маркерами и легенда; результат кодируется в PNG через zlib.
+Импорт модуля почти ничего не стоит, в отличие от matplotlib.
+"""
+import math
+import struct
+import zlib
+from datetime import datetime
+
+WIDTH, HEIGHT = 800, 600  # как figsize=(8, 6) при 100 dpi у matplotlib
+
+WHITE = b"\xff\xff\xff"
+BLACK = b"\x00\x00\x00"
+GRID = b"\xdd\xdd\xdd"
+BLUE = b"\x00\x00\xff"
+RED = b"\xff\x00\x00"
+GREEN = b"\x00\x80\x00"
+
+# --- Шрифт: 5 точек в ширину, 7 в высоту над строкой и 2 под ней
+
+_CAPS = {
+    "А": ".###. #...# #...# ##### #...# #...# #...#",
+    "Б": "##### #.... #.... ####. #...# #...# ####.",
+    "В": "####. #...# #...# ####. #...# #...# ####.",
+    "Г": "##### #.... #.... #.... #.... #.... #....",
+    "Д": "..##. .#.#. .#.#. .#.#. .#.#. ##### #...#",
+    "Е": "##### #.... #.... ####. #.... #.... #####",
+    "Ё": ".#.#. ##### #.... ####. #.... #.... #####",
+    "Ж": "#.#.# #.#.# .###. ..#.. .###. #.#.# #.#.#",
+    "З": ".###. #...# ....# ..##. ....# #...# .###.",
+    "И": "#...# #...# #..## #.#.# ##..# #...# #...#",
+    "Й": ".#.#. #...# #..## #.#.# ##..# #...# #...#",
+    "К": "#...# #..#. #.#.. ##... #.#.. #..#. #...#",
+    "Л": "..### .#..# .#..# .#..# .#..# .#..# #...#",
+    "М": "#...# ##.## #.#.# #.#.# #...# #...# #...#",
+    "Н": "#...# #...# #...# ##### #...# #...# #...#",
+    "О": ".###. #...# #...# #...# #...# #...# .###.",
+    "П": "##### #...# #...# #...# #...# #...# #...#",
+    "Р": "####. #...# #...# ####. #.... #.... #....",
+    "С": ".###. #...# #.... #.... #.... #...# .###.",
+    "Т": "##### ..#.. ..#.. ..#.. ..#.. ..#.. ..#..",
+    "У": "#...# #...# #...# .#### ....# #...# .###.",
+    "Ф": "..#.. .###. #.#.# #.#.# #.#.# .###. ..#..",
+    "Х": "#...# #...# .#.#. ..#.. .#.#. #...# #...#",
+    "Ц": "#..#. #..#. #..#. #..#. #..#. ##### ....#",
+    "Ч": "#...# #...# #...# .#### ....# ....# ....#",
+    "Ш": "#.#.# #.#.# #.#.# #.#.# #.#.# #.#.# #####",
+    "Щ": "#.#.# #.#.# #.#.# #.#.# #.#.# ##### ....#",
+    "Ъ": "##... .#... .#... .###. .#..# .#..# .###.",
+    "Ы": "#...# #...# #...# ###.# #.#.# #.#.# ###.#",
+    "Ь": "#.... #.... #.... ####. #...# #...# ####.",
+    "Э": ".###. #...# ....# ..### ....# #...# .###.",
+    "Ю": "#..#. #.#.# #.#.# ###.# #.#.# #.#.# #..#.",
+    "Я": ".#### #...# #...# .#### ..#.# .#..# #...#",
+    "0": ".###. #...# #..## #.#.# ##..# #...# .###.",
+    "1": "..#.. .##.. ..#.. ..#.. ..#.. ..#.. .###.",
+    "2": ".###. #...# ....# ...#. ..#.. .#... #####",
+    "3": "##### ...#. ..#.. ...#. ....# #...# .###.",
+    "4": "...#. ..##. .#.#. #..#. ##### ...#. ...#.",
+    "5": "##### #.... ####. ....# ....# #...# .###.",
+    "6": "..##. .#... #.... ####. #...# #...# .###.",
+    "7": "##### ....# ...#. ..#.. .#... .#... .#...",
+    "8": ".###. #...# #...# .###. #...# #...# .###.",
+    "9": ".###. #...# #...# .#### ....# ...#. .##..",
+    " ": "..... ..... ..... ..... ..... ..... .....",
+    ".": "..... ..... ..... ..... ..... .##.. .##..",
+    ":": "..... .##.. .##.. ..... .##.. .##.. .....",
+    "-": "..... ..... ..... .###. ..... ..... .....",
+    "+": "..... ..#.. ..#.. ##### ..#.. ..#.. .....",
+    "=": "..... ..... ##### ..... ##### ..... .....",
+    "(": "...#. ..#.. .#... .#... .#... ..#.. ...#.",
+    ")": ".#... ..#.. ...#. ...#. ...#. ..#.. .#...",
+    "/": "....# ....# ...#. ..#.. .#... #.... #....",
+    "%": "##... ##..# ...#. ..#.. .#... #..## ...##",
+    "…": "..... ..... ..... ..... ..... ..... #.#.#",
+}
+
+# Строчные: 5 строк высоты x; "^" — строки над ней, "_" — под строкой
+_SMALL = {
+    "а": ".###. ....# .#### #...# .####",
+    "б": "^.#### ^#.... ####. #...# #...# #...# .###.",
+    "в": "####. #...# ####. #...# ####.",
+    "г": "##### #.... #.... #.... #....",
+    "д": ".###. .#.#. .#.#. .#.#. ##### _#...#",
+    "е": ".###. #...# ##### #.... .###.",
+    "ё": "^.#.#. .###. #...# ##### #.... .###.",
+    "ж": "#.#.# .###. ..#.. .###. #.#.#",
+    "з": ".###. #...# ..##. #...# .###.",
+    "и": "#...# #..## #.#.# ##..# #...#",
+    "й": "^.###. #...# #..## #.#.# ##..# #...#",
+    "к": "#..#. #.#.. ##... #.#.. #..#.",
+    "л": "..### .#..# .#..# .#..# #...#",
+    "м": "#...# ##.## #.#.# #...# #...#",
+    "н": "#...# #...# ##### #...# #...#",
+    "о": ".###. #...# #...# #...# .###.",
+    "п": "##### #...# #...# #...# #...#",
+    "р": "####. #...# #...# #...# ####. _#.... _#....",
+    "с": ".###. #...# #.... #...# .###.",
+    "т": "##### ..#.. ..#.. ..#.. ..#..",
+    "у": "#...# #...# #...# #...# .#### _....# _.###.",
+    "ф": "^..#.. .###. #.#.# #.#.# #.#.# .###. _..#..",
+    "х": "#...# .#.#. ..#.. .#.#. #...#",
+    "ц": "#..#. #..#. #..#. #..#. ##### _....#",
+    "ч": "#...# #...# .#### ....# ....#",
+    "ш": "#.#.# #.#.# #.#.# #.#.# #####",
+    "щ": "#.#.# #.#.# #.#.# #.#.# ##### _....#",
+    "ъ": "##... .#... .###. .#..# .###.",
+    "ы": "#...# #...# ###.# #.#.# ###.#",
+    "ь": "#.... #.... ####. #...# ####.",
+    "э": ".###. #...# ..### #...# .###.",
+    "ю": "#..#. #.#.# ###.# #.#.# #..#.",
+    "я": ".#### #...# .#### ..#.# .#..#",
+}
+
+GLYPH_W, GLYPH_H = 5, 9
+
+
+def _build_font():
+    font = {}
+    for char, rows in _CAPS.items():
+        font[char] = rows.split() + ["....."] * 2
+    for char, spec in _SMALL.items():
+        rows = spec.split()
+        above = [r[1:] for r in rows if r.startswith("^")]
+        below = [r[1:] for r in rows if r.startswith("_")]
+        body = [r for r in rows if r[0] not in "^_"]
+        top = ["....."] * (2 - len(above)) + above
+        font[char] = top + body + below + ["....."] * (2 - len(below))
+    # Для каждого символа — список (x, y) закрашенных точек
+    return {
+        char: [(x, y) for y, row in enumerate(rows) for x, cell in enumerate(row) if cell == "#"]
+        for char, rows in font.items()
+    }
+
+
+FONT = _build_font()
+UNKNOWN = [(x, y) for y in range(7) for x in range(5) if x in (0, 4) or y in (0, 6)]
+
+
+class Canvas:
+    def __init__(self, width, height, background=WHITE):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(background * (width * height))
+
+    def point(self, x, y, color):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y * self.width + x) * 3
+            self.pixels[i:i + 3] = color
+
+    def hline(self, x0, x1, y, color):
+        x0, x1 = max(0, min(x0, x1)), min(self.width - 1, max(x0, x1))
+        if 0 <= y < self.height and x0 <= x1:
+            i = (y * self.width + x0) * 3
+            self.pixels[i:i + (x1 - x0 + 1) * 3] = color * (x1 - x0 + 1)
+
+    def vline(self, x, y0, y1, color):
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            self.point(x, y, color)
+
+    def rect(self, x0, y0, x1, y1, color):
+        for y in range(y0, y1 + 1):
+            self.hline(x0, x1, y, color)
+
+    def frame(self, x0, y0, x1, y1, color):
+        self.hline(x0, x1, y0, color)
+        self.hline(x0, x1, y1, color)
+        self.vline(x0, y0, y1, color)
+        self.vline(x1, y0, y1, color)
+
+    def dotted_hline(self, x0, x1, y, color, step=4):
+        for x in range(x0, x1 + 1, step):
+            self.hline(x, min(x + step // 2 - 1, x1), y, color)
+
+    def dotted_vline(self, x, y0, y1, color, step=4):
+        for y in range(y0, y1 + 1, step):
+            self.vline(x, y, min(y + step // 2 - 1, y1), color)
+
+    def line(self, x0, y0, x1, y1, color, width=2):
+        # Брезенхем, толщина — квадратной "кистью"
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+        err = dx + dy
+        while True:
+            self.rect(x0, y0, x0 + width - 1, y0 + width - 1, color)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def disc(self, cx, cy, r, color):
+        for dy in range(-r, r + 1):
+            half = int(math.sqrt(r * r - dy * dy) + 0.5)
+            self.hline(cx - half, cx + half, cy + dy, color)
+
+    @staticmethod
+    def text_width(text, scale=2):
+        return len(text) * (GLYPH_W + 1) * scale - scale
+
+    def text(self, x, y, text, color=BLACK, scale=2, align="left", vertical=False):
+        """Текст с верхним левым углом в (x, y); vertical — снизу вверх."""
+        width = self.text_width(text, scale)
+        offset = {"left": 0, "center": width // 2, "right": width}[align]
+        for i, char in enumerate(text):
+            for gx, gy in FONT.get(char, UNKNOWN):
+                along = i * (GLYPH_W + 1) * scale + gx * scale - offset
+                for sx in range(scale):
+                    for sy in range(scale):
+                        if vertical:
+                            self.point(x + gy * scale + sy, y - along - sx, color)
+                        else:
+                            self.point(x + along + sx, y + gy * scale + sy, color)
+
+    def to_png(self):
+        raw = bytearray()
+        row = self.width * 3
+        for y in range(self.height):
+            raw += b"\x00"  # фильтр None
+            raw += self.pixels[y * row:(y + 1) * row]
+
+        def chunk(kind, data):
+            return (struct.pack(">I", len(data)) + kind + data
+                    + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+                + chunk(b"IDAT", zlib.compress(bytes(raw), 6)) + chunk(b"IEND", b""))
+
+
+def nice_ticks(lo, hi, max_ticks=6):
+    """Круглые деления оси: 1, 2, 2.5, 5 x 10^n."""
+    span = hi - lo
+    if span <= 0:
+        span = abs(hi) or 1.0
+    raw = span / max_ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for m in (1, 2, 2.5, 5, 10):
+        step = m * magnitude
+        if span / step <= max_ticks:
+            break
+    first = math.ceil(lo / step - 1e-9) * step
+    ticks = []
+    value = first
+    while value <= hi + step * 1e-9:
+        ticks.append(round(value, 10))
+        value += step
+    return ticks, step
+
+
+TIME_STEPS = (60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 14400, 21600, 43200,
+              86400, 172800, 604800, 1209600, 2592000)
+
+
+def time_ticks(lo, hi, max_ticks=8):
+    """Деления оси времени (секунды epoch), выровненные по местному времени."""
+    span = max(hi - lo, 1)
+    step = next((s for s in TIME_STEPS if span / s <= max_ticks), TIME_STEPS[-1])
+    start = datetime.fromtimestamp(lo).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    first = start + math.ceil((lo - start) / step) * step
+    ticks = []
+    value = first
+    while value <= hi:
+        ticks.append(value)
+        value += step
+    if span <= 86400:
+        fmt = "%H:%M"
+    elif step < 86400:
+        fmt = "%d.%m %H:%M"
+    else:
+        fmt = "%d.%m"
+    return ticks, fmt
+
+
+def format_number(value, step):
+    if step >= 1 and float(value).is_integer():
+        return str(int(value))
+    return f"{value:g}"
+
+
+def draw_panel(canvas, box, title, xlabel, ylabel, series, x_range, hlines=()):
+    """
+    Один график в прямоугольнике box = (x0, y0, x1, y1).
+    series — [(x: секунды epoch, y, цвет, подпись)], hlines — [(y, цвет, подпись)]
+    (горизонтальные линии, например норма за день).
+    """
+    x0, y0, x1, y1 = box
+    # Отступы под подписи осей и делений
+    left, right = x0 + 90, x1 - 10
+    top, bottom = y0 + 26, y1 - 50
+
+    canvas.text((x0 + x1) // 2, y0 + 2, title, align="center")
+
+    xmin, xmax = x_range
+    values = [v for _, ys, _, _ in series for v in ys] + [v for v, _, _ in hlines]
+    ymin = min([0.0] + values)
+    ymax = max([1.0] + values)
+    yticks, ystep = nice_ticks(ymin, ymax * 1.05)
+    ymin, ymax = min(ymin, yticks[0]), max(ymax * 1.05, yticks[-1])
+
+    def px(x):
+        return left + int((x - xmin) / (xmax - xmin) * (right - left))
+
+    def py(y):
+        return bottom - int((y - ymin) / (ymax - ymin) * (bottom - top))
+
+    # Сетка и деления
+    for tick in yticks:
+        y = py(tick)
+        canvas.dotted_hline(left, right, y, GRID)
+        canvas.hline(left - 4, left, y, BLACK)
+        canvas.text(left - 8, y - 7, format_number(tick, ystep), align="right")
+    xticks, fmt = time_ticks(xmin, xmax)
+    for tick in xticks:
+        x = px(tick)
+        canvas.dotted_vline(x, top, bottom, GRID)
+        canvas.vline(x, bottom, bottom + 4, BLACK)
+        label = datetime.fromtimestamp(tick).strftime(fmt)
+        if x + canvas.text_width(label) // 2 < canvas.width:
+            canvas.text(x, bottom + 8, label, align="center")
+    canvas.frame(left, top, right, bottom, BLACK)
+    canvas.text((left + right) // 2, bottom + 30, xlabel, align="center")
+    canvas.text(x0 + 4, (top + bottom) // 2, ylabel, align="center", vertical=True)
+
+    # Горизонтальные линии и данные
+    for value, color, _ in hlines:
+        y = py(value)
+        for x in range(left, right, 12):
+            canvas.line(x, y, min(x + 6, right), y, color)
+    drawn = []
+    for xs, ys, color, _ in series:
+        points = [(px(x), py(y)) for x, y in zip(xs, ys)]
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            canvas.line(ax, ay, bx, by, color)
+        for x, y in points:
+            canvas.disc(x, y, 3, color)
+        drawn.extend(points)
+    drawn.extend((x, py(value)) for value, _, _ in hlines for x in range(left, right, 12))
+
+    # Легенда — в том углу, где меньше всего точек (как loc="best")
+    labels = [(color, label, True) for xs, _, color, label in series if xs]
+    labels += [(color, label, False) for _, color, label in hlines]
+    if labels:
+        width = max(canvas.text_width(label) for _, label, _ in labels) + 46
+        height = 22 * len(labels) + 4
+        corners = [(left + 8, top + 8), (right - 8 - width, top + 8),
+                   (right - 8 - width, bottom - 8 - height), (left + 8, bottom - 8 - height)]
+        lx, ly = min(corners, key=lambda c: sum(
+            c[0] <= x <= c[0] + width and c[1] <= y <= c[1] + height for x, y in drawn))
+        canvas.rect(lx, ly, lx + width, ly + height, WHITE)
+        canvas.frame(lx, ly, lx + width, ly + height, GRID)
+        for i, (color, label, marker) in enumerate(labels):
+            cy = ly + 13 + 22 * i
+            canvas.line(lx + 6, cy, lx + 30, cy, color)
+            if marker:
+                canvas.disc(lx + 18, cy, 3, color)
+            canvas.text(lx + 38, cy - 7, label)
+
+
+def _epoch(times):
+    return [t.timestamp() if isinstance(t, datetime) else float(t) for t in times]
+
+
+def render_progress_png(title, water_times, water_values, food_times, food_values,
+                        water_goal=None, calorie_goal=None, daily=False):
+    """Те же два графика, что и rendering.render_progress_png, но без matplotlib."""
+    water_x, food_x = _epoch(water_times), _epoch(food_times)
+    all_x = water_x + food_x
+    xmin, xmax = min(all_x), max(all_x)
+    if xmax - xmin < 600:
+        xmin, xmax = xmin - 1800, xmax + 1800
+    pad = (xmax - xmin) * 0.05
+    x_range = (xmin - pad, xmax + pad)
+
+    canvas = Canvas(WIDTH, HEIGHT)
+    canvas.text(WIDTH // 2, 6, title, align="center")
+    kind = "за день" if daily else "накопительно"
+    draw_panel(canvas, (0, 32, WIDTH, 312), f"Вода ({kind})", "Время", "мл",
+               [(water_x, water_values, BLUE, "Вода (мл)")], x_range,
+               [(water_goal, GREEN, "Норма")] if water_goal else ())
+    draw_panel(canvas, (0, 316, WIDTH, HEIGHT - 4), f"Калории ({kind})", "Время", "ккал",
+               [(food_x, food_values, RED, f"Калории ({kind})")], x_range,
+               [(calorie_goal, GREEN, "Норма")] if calorie_goal else ())
+    return canvas.to_png()
@@ -0,0 +1,240 @@
+"""
+Метрики бота: длительность обработчиков и внешних вызовов, ошибки,
+попадания в кэши и длина очередей.
+
+Метрики отдаются в текстовом формате Prometheus по адресу
+http://<METRICS_LISTEN>:<METRICS_PORT>/metrics и, при желании,
+периодически пишутся в лог. Если METRICS_ENABLED выключен,
+instrument() и timed() возвращают функции без изменений — накладных
+расходов нет.
+"""
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # значения меток -> [счетчики по корзинам..., сумма, количество]
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def quantile(self, q, *label_values):
+        """Приблизительный квантиль: верхняя граница корзины."""
+        series = self._series.get(label_values)
+        if not series or not series[-1]:
+            return 0.0
+        rank = q * series[-1]
+        seen = 0
+        for i, bound in enumerate(self.buckets):
+            seen += series[i]
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                labels = _format_labels((*self.labels, "le"), (*label_values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Значение читается в момент запроса метрик: callback() -> {значения меток: число}.
+    Так отдаются счетчики кэшей и длины очередей, которые уже ведут сами объекты.
+    """
+
+    def __init__(self, name, help_text, labels, callback, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Не удалось получить метрику {self.name}: {e!r}")
+            return lines
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+handler_duration = Histogram("bot_handler_duration_seconds", "Длительность обработчиков", ("handler",))
+handler_errors = Counter("bot_handler_errors_total", "Исключения в обработчиках", ("handler",))
+call_duration = Histogram("bot_call_duration_seconds", "Длительность внешних вызовов и отрисовки", ("call",))
+call_errors = Counter("bot_call_errors_total", "Ошибки внешних вызовов и отрисовки", ("call",))
+outbound_wait = Histogram("bot_outbound_wait_seconds", "Ожидание места в лимитах Bot API", ("lane",))
+
+_registry = [handler_duration, handler_errors, call_duration, call_errors, outbound_wait]
+
+
+def register_callback(name, help_text, labels, callback, kind="gauge"):
+    if config.METRICS_ENABLED:
+        _registry.append(CallbackMetric(name, help_text, labels, callback, kind))
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _wrap(func, histogram, errors, label):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc(label)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, label)
+    return wrapper
+
+
+def instrument(func, name=None):
+    """Оборачивает обработчик Telegram (корутину) замером времени и ошибок."""
+    if not config.METRICS_ENABLED:
+        return func
+    return _wrap(func, handler_duration, handler_errors, name or func.__name__)
+
+
+def timed(name):
+    """Декоратор для внешних вызовов (погода, продукты, отрисовка)."""
+    def decorator(func):
+        if not config.METRICS_ENABLED:
+            return func
+        return _wrap(func, call_duration, call_errors, name)
+    return decorator
+
+
+def instrument_application(application):
+    """Оборачивает все зарегистрированные в application обработчики."""
+    if not config.METRICS_ENABLED:
+        return
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = instrument(handler.callback)
+
+
+async def _serve(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[1] == "/metrics":
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b""
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _log_summary():
+    parts = []
+    for histogram in (handler_duration, call_duration):
+        for label_values, series in sorted(histogram._series.items()):
+            count = series[-1]
+            if count:
+                parts.append(f"{label_values[0]}: n={count} avg={series[-2] / count * 1000:.0f}мс "
+                             f"p95<={histogram.quantile(0.95, *label_values) * 1000:.0f}мс")
+    if parts:
+        logger.info("Метрики: " + "; ".join(parts))
+
+
+async def _log_periodically(interval):
+    while True:
+        await asyncio.sleep(interval)
+        _log_summary()
+
+
+_running = []  # сервер /metrics и задача отчета в лог
+
+
+async def start():
+    """Запускает HTTP-сервер /metrics и периодический отчет в лог."""
+    if not config.METRICS_ENABLED:
+        return
+    if config.METRICS_PORT:
+        server = await asyncio.start_server(_serve, config.METRICS_LISTEN, config.METRICS_PORT)
+        _running.append(server)
+        logger.info(f"Метрики: http://{config.METRICS_LISTEN}:{config.METRICS_PORT}/metrics")
+    if config.METRICS_LOG_INTERVAL > 0:
+        _running.append(asyncio.create_task(_log_periodically(config.METRICS_LOG_INTERVAL)))
+
+
+async def stop():
+    while _running:
+        item = _running.pop()
+        if isinstance(item, asyncio.Task):
+            item.cancel()
+        else:
+            item.close()
+            await item.wait_closed()
+    _log_summary()
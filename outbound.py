@@ -0,0 +1,192 @@
+"""
+Исходящие запросы к Bot API: ограничение скорости, приоритеты и повторы.
+
+Обработчики по-прежнему вызывают reply_text и send_photo напрямую, но все
+вызовы бота проходят через OutboundLimiter (BaseRateLimiter из
+python-telegram-bot, подключается в ApplicationBuilder.rate_limiter):
+  - общий token bucket — не больше OUTBOUND_GLOBAL_RATE сообщений в секунду
+    (лимит Telegram — около 30) — и свой bucket на каждый чат
+    (OUTBOUND_CHAT_RATE в секунду, всплеск до OUTBOUND_CHAT_BURST);
+  - две полосы: ответы на команды (INTERACTIVE) получают место в общем
+    лимите раньше массовых рассылок (BULK — напоминания и т.п.). Полосу
+    задает вызов: bot.send_message(..., rate_limit_args={"priority": BULK});
+  - на 429 (RetryAfter) вся отправка встает на паузу, сколько попросил
+    Telegram, и запрос повторяется — до OUTBOUND_MAX_RETRIES раз;
+  - длина очередей по полосам, ожидание места и повторы видны в /metrics.
+
+Сначала запрос ждет свой чат (ожидающие одного чата не занимают общую
+очередь), потом место в общем лимите. Запросы без chat_id (getUpdates,
+getFile, setWebhook, ...) не ограничиваются.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+LANES = ("interactive", "bulk")
+CHAT_IDLE_TTL = 60  # сек; bucket чата без запросов дольше этого удаляется
+# Общий лимит без всплеска: иначе в первую секунду уходит burst + rate сообщений
+# (при burst = rate — до 50 при лимите Telegram около 30) и приходят 429
+GLOBAL_BURST = 1
+
+
+class TokenBucket:
+    """Не больше rate событий в секунду, всплеск — до burst. Ожидающие обслуживаются по очереди."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def idle_since(self):
+        return self._updated
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def retry_seconds(retry_after):
+    # В новых версиях python-telegram-bot retry_after — timedelta
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+class OutboundLimiter(BaseRateLimiter):
+    def __init__(self, global_rate=None, chat_rate=None, chat_burst=None, max_retries=None):
+        self.global_rate = global_rate or config.OUTBOUND_GLOBAL_RATE
+        self.chat_rate = chat_rate or config.OUTBOUND_CHAT_RATE
+        self.chat_burst = chat_burst or config.OUTBOUND_CHAT_BURST
+        self.max_retries = config.OUTBOUND_MAX_RETRIES if max_retries is None else max_retries
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+
+        self._bucket = TokenBucket(self.global_rate, GLOBAL_BURST)
+        self._chats = {}  # chat_id -> TokenBucket
+        self._chat_waiting = 0  # запросов, ждущих свой чат
+        self._lanes = tuple(deque() for _ in LANES)  # futures, ждущие место в общем лимите
+        self._paused_until = 0.0
+        self._wakeup = None
+        self._dispatcher = None
+        self._last_prune = time.monotonic()
+
+    @property
+    def pending(self):
+        """Ожидающие запросы: {полоса: число}, плюс "chat" — ждущие свой чат."""
+        depth = {lane: len(queue) for lane, queue in zip(LANES, self._lanes)}
+        depth["chat"] = self._chat_waiting
+        return depth
+
+    async def initialize(self):
+        if self._dispatcher is None:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for queue in self._lanes:
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.cancel()
+
+    async def _dispatch(self):
+        """Выдает места в общем лимите: сначала INTERACTIVE, затем BULK."""
+        while True:
+            if not any(self._lanes):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            await self._bucket.acquire()
+            for queue in self._lanes:
+                while queue:
+                    future = queue.popleft()
+                    if not future.done():  # отмененные запросы пропускаем
+                        future.set_result(None)
+                        break
+                else:
+                    continue
+                break
+
+    def _chat_bucket(self, chat_id):
+        now = time.monotonic()
+        if now - self._last_prune > CHAT_IDLE_TTL:
+            # Забываем чаты без запросов, чтобы словарь не рос с числом пользователей
+            self._last_prune = now
+            self._chats = {key: bucket for key, bucket in self._chats.items()
+                           if now - bucket.idle_since < CHAT_IDLE_TTL}
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _wait_turn(self, chat_id, priority):
+        started = time.perf_counter()
+        self._chat_waiting += 1
+        try:
+            await self._chat_bucket(chat_id).acquire()
+        finally:
+            self._chat_waiting -= 1
+        if self._dispatcher is None:
+            await self.initialize()
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(future)
+        self._wakeup.set()
+        await future
+        metrics.outbound_wait.observe(time.perf_counter() - started, LANES[priority])
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        priority = (rate_limit_args or {}).get("priority", INTERACTIVE)
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn(chat_id, priority)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                # Telegram считает, что мы превысили лимит: пауза для всех запросов
+                delay = retry_seconds(e.retry_after)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                self.stats["retried"] += 1
+                logger.warning(f"{endpoint}: Telegram просит подождать {delay:g} с, повтор {attempt + 1}")
+                continue
+            except Exception:
+                self.stats["failed"] += 1
+                raise
+            self.stats["sent"] += 1
+            return result
@@ -0,0 +1,283 @@
+"""
+Поиск продуктов для /log_food.
+
+Порядок поиска:
+  1. кэш в памяти: нормализованный запрос -> (название, ккал на 100 г);
+  2. локальный индекс на диске (SQLite), загружаемый из дампа OpenFoodFacts:
+     точное совпадение, затем по префиксу, затем по триграммам;
+  3. OpenFoodFacts API — только нужные поля и несколько первых товаров.
+
+Загрузка индекса из дампа (CSV/TSV или JSONL, можно .gz):
+    python products.py load en.openfoodfacts.org.products.csv.gz
+Поиск по индексу:
+    python products.py search "молоко"
+
+Запрос к индексу идет в потоке (asyncio.to_thread), а не в цикле событий:
+на большом дампе поиск по триграммам занимает десятки миллисекунд. У
+каждого потока свое соединение с индексом.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+
+import config
+from cache import AsyncTTLCache
+from http_client import upstream
+import metrics
+from textutil import normalize, trigrams
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_EMOJI = "🍴"
+TRIGRAM_CANDIDATES = 200  # сколько кандидатов с наибольшим числом общих триграмм сравнивать
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    norm TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    kcal REAL NOT NULL,
+    popularity INTEGER NOT NULL DEFAULT 1,
+    ntri INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    tri TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (tri, product_id)
+) WITHOUT ROWID;
+"""
+
+
+class ProductIndex:
+    """Локальный индекс продуктов в файле SQLite."""
+
+    def __init__(self, path=None):
+        self.path = path or config.PRODUCT_INDEX_PATH
+        self._local = threading.local()
+        self._conns = []  # соединения всех потоков, для close()
+        self._lock = threading.Lock()
+
+    def _connect(self, create=False):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Соединением пользуется только свой поток; check_same_thread=False —
+            # чтобы close() мог закрыть его из любого потока
+            if not create:
+                # Индекс не обязателен: если файла нет, просто идем в API
+                try:
+                    conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+                except sqlite3.OperationalError:
+                    return None
+            else:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.executescript(INDEX_SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def warm_up(self):
+        """Открывает индекс заранее и подгружает схему."""
+        conn = self._connect()
+        if conn is not None:
+            try:
+                conn.execute("SELECT 1 FROM products LIMIT 1").fetchall()
+            except sqlite3.DatabaseError as e:
+                logger.error(f"Ошибка индекса продуктов: {e}")
+
+    def lookup(self, query):
+        """Возвращает (название, ккал на 100 г) или None."""
+        conn = self._connect()
+        norm = normalize(query)
+        if conn is None or not norm:
+            return None
+
+        try:
+            row = conn.execute("SELECT name, kcal FROM products WHERE norm = ?", (norm,)).fetchone()
+            if row is None:
+                # Начало названия: "молоко" -> "молоко 3 2"
+                row = conn.execute(
+                    "SELECT name, kcal FROM products WHERE norm >= ? AND norm < ? "
+                    "ORDER BY popularity DESC, length(norm) LIMIT 1",
+                    (norm, norm + "\U0010ffff"),
+                ).fetchone()
+            if row is None:
+                row = self._lookup_trigrams(conn, norm)
+        except sqlite3.DatabaseError as e:
+            logger.error(f"Ошибка индекса продуктов: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    @staticmethod
+    def _lookup_trigrams(conn, norm):
+        # Похожие названия (опечатки, другой порядок слов): коэффициент Жаккара
+        # по триграммам, не меньше половины триграмм запроса должны совпасть.
+        # С products соединяются только TRIGRAM_CANDIDATES лучших по числу общих триграмм
+        tris = sorted(trigrams(norm))
+        placeholders = ",".join("?" * len(tris))
+        return conn.execute(
+            f"SELECT p.name, p.kcal FROM ("
+            f"  SELECT product_id, COUNT(*) AS shared FROM trigrams WHERE tri IN ({placeholders})"
+            f"  GROUP BY product_id HAVING shared * 2 >= ? ORDER BY shared DESC LIMIT ?"
+            f") AS t JOIN products AS p ON p.id = t.product_id "
+            f"ORDER BY t.shared * 1.0 / (? + p.ntri - t.shared) DESC, p.popularity DESC LIMIT 1",
+            (*tris, len(tris), TRIGRAM_CANDIDATES, len(tris)),
+        ).fetchone()
+
+    def bulk_load(self, records, batch_size=10000):
+        """
+        Загружает пары (название, ккал на 100 г). Одинаковые после нормализации
+        названия схлопываются, число повторов становится популярностью.
+        """
+        conn = self._connect(create=True)
+        loaded = 0
+        batch = []
+
+        def write(batch):
+            with conn:
+                for norm, name, kcal in batch:
+                    tris = trigrams(norm)
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO products (norm, name, kcal, ntri) VALUES (?, ?, ?, ?)",
+                        (norm, name, kcal, len(tris)),
+                    )
+                    if cursor.rowcount:
+                        conn.executemany("INSERT INTO trigrams VALUES (?, ?)",
+                                         ((tri, cursor.lastrowid) for tri in tris))
+                    else:
+                        conn.execute("UPDATE products SET popularity = popularity + 1 WHERE norm = ?", (norm,))
+
+        for name, kcal in records:
+            norm = normalize(name)
+            if not norm:
+                continue
+            batch.append((norm, name.strip(), kcal))
+            loaded += 1
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        write(batch)
+        return loaded
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+def read_dump(path):
+    """Читает дамп OpenFoodFacts построчно: (название, ккал на 100 г)."""
+    # Нужны только для загрузки индекса, бот их не импортирует
+    import csv
+    import gzip
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if ".jsonl" in path or ".json" in path:
+            for line in f:
+                try:
+                    product = json.loads(line)
+                    name = product.get("product_name")
+                    kcal = product.get("nutriments", {}).get("energy-kcal_100g")
+                    if name and kcal is not None:
+                        yield name, float(kcal)
+                except (ValueError, AttributeError, TypeError):
+                    continue
+        else:
+            csv.field_size_limit(sys.maxsize)
+            sample = f.readline()
+            # Официальный CSV-дамп разделен табуляцией и не использует кавычки
+            if "\t" in sample:
+                options = {"dialect": "excel-tab", "quoting": csv.QUOTE_NONE}
+            else:
+                options = {"dialect": "excel"}
+            columns = next(csv.reader([sample], **options))
+            for row in csv.DictReader(f, fieldnames=columns, **options):
+                name = row.get("product_name")
+                kcal = row.get("energy-kcal_100g")
+                if name and kcal:
+                    try:
+                        yield name, float(kcal)
+                    except ValueError:
+                        continue
+
+
+async def fetch_product(query):
+    """Поиск через OpenFoodFacts API. Возвращает (название, ккал на 100 г) или None."""
+    params = {
+        "search_terms": query,
+        "search_simple": 1,
+        "action": "process",
+        "json": 1,
+        # Только нужные поля и несколько первых товаров, а не вся выдача
+        "fields": "product_name,nutriments",
+        "page_size": config.OPENFOODFACTS_PAGE_SIZE,
+    }
+    data = await upstream.get_json("openfoodfacts", config.OPENFOODFACTS_URL, params=params)
+    if data is None:
+        return None
+    products = data.get("products", [])
+    if not products:
+        return None
+    # Первый товар, у которого указана калорийность (иначе просто первый)
+    for product in products:
+        nutriments = product.get("nutriments") or {}
+        if "energy-kcal_100g" in nutriments:
+            return product.get("product_name", "Неизвестный продукт"), float(nutriments["energy-kcal_100g"])
+    return products[0].get("product_name", "Неизвестный продукт"), None
+
+
+product_index = ProductIndex()
+product_cache = AsyncTTLCache("products", ttl=config.PRODUCT_CACHE_TTL,
+                              stale_ttl=config.PRODUCT_CACHE_TTL, max_size=config.PRODUCT_CACHE_SIZE)
+
+
+@metrics.timed("product_search")
+async def search_product(query):
+    """Ищет продукт: кэш, затем локальный индекс, затем OpenFoodFacts."""
+    key = normalize(query)
+    if not key:
+        return None
+
+    async def fetch():
+        return await asyncio.to_thread(product_index.lookup, query) or await fetch_product(query)
+
+    result = await product_cache.get(key, fetch)
+    if result is None:
+        return None
+    name, calories = result
+    return {"name": name, "calories": calories, "emoji": PRODUCT_EMOJI}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Локальный индекс продуктов OpenFoodFacts")
+    parser.add_argument("--index", default=config.PRODUCT_INDEX_PATH, help="файл индекса")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="загрузить дамп OpenFoodFacts (CSV/TSV/JSONL, можно .gz)")
+    load.add_argument("dump")
+    search = commands.add_parser("search", help="найти продукт в индексе")
+    search.add_argument("query")
+    args = parser.parse_args()
+
+    index = ProductIndex(args.index)
+    if args.command == "load":
+        started = time.perf_counter()
+        loaded = index.bulk_load(read_dump(args.dump))
+        print(f"Загружено {loaded} записей за {time.perf_counter() - started:.1f} с")
+    else:
+        started = time.perf_counter()
+        result = index.lookup(args.query)
+        print(f"{result} ({(time.perf_counter() - started) * 1e6:.0f} мкс)")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
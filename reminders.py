@@ -0,0 +1,335 @@
+"""
+Напоминания о воде и еде.
+
+Пользователь включает их командой /reminders и может задать тихие часы и
+часовой пояс. Норма воды распределяется равномерно на время бодрствования
+(от конца тихих часов до их начала): если к текущему часу выпито меньше
+PACE_TOLERANCE от ожидаемого и не хватает хотя бы стакана, приходит
+напоминание. Во второй половине дня, раз в день, бот напоминает и о еде,
+если калорий записано слишком мало.
+
+На каждого пользователя не заводится своя задача: время следующей проверки
+всех пользователей лежит в одной куче (heapq), и одна повторяющаяся задача
+job_queue раз в REMINDER_TICK секунд снимает с нее наступившие проверки.
+Пользователь проверяется не чаще раза в REMINDER_INTERVAL, проверки на
+тихие часы переносятся на утро. Историю пользователей, которые еще не
+загружены в память (например, после перезапуска), задание сначала
+читает из хранилища в отдельном потоке, а сама проверка базу не трогает.
+
+Напоминания ждут отправки в ограниченной очереди и уходят в полосе BULK
+общего ограничителя исходящих запросов (см. outbound.py): ответы на
+команды идут раньше, лимиты Telegram и RetryAfter соблюдаются там же.
+Если пользователь заблокировал бота, напоминания выключаются.
+"""
+import asyncio
+import heapq
+import logging
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from telegram.error import Forbidden, TelegramError
+
+import config
+from outbound import BULK
+
+logger = logging.getLogger(__name__)
+
+GLASS = 250  # мл — если отставание меньше стакана, не напоминаем
+PACE_TOLERANCE = 0.8  # напоминаем, если выпито меньше 80% от ожидаемого к этому часу
+FOOD_PACE_TOLERANCE = 0.5  # о еде — если записано меньше половины ожидаемого
+SENDERS = 8  # одновременных отправок (скорость ограничивает outbound.py)
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_quiet_hours(text):
+    """"22-8" или "22:30-07:00" -> (начало, конец) в минутах от полуночи."""
+    match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?", text.strip())
+    if not match:
+        raise ValueError(f"Некорректные тихие часы: {text}")
+    start = int(match[1]) * 60 + int(match[2] or 0)
+    end = int(match[3]) * 60 + int(match[4] or 0)
+    if start >= MINUTES_PER_DAY or end >= MINUTES_PER_DAY:
+        raise ValueError(f"Некорректные тихие часы: {text}")
+    return start, end
+
+
+def format_quiet_hours(start, end):
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+
+def parse_timezone(text):
+    """
+    "Europe/Moscow", "+3", "UTC-5:30" -> tzinfo.
+    Пустая строка — пояс сервера (None для datetime.fromtimestamp).
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if text.upper() in ("UTC", "GMT"):
+        return timezone.utc
+    match = re.fullmatch(r"(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?", text, re.IGNORECASE)
+    if match:
+        offset = timedelta(hours=int(match[2]), minutes=int(match[3] or 0))
+        if offset > timedelta(hours=14):
+            raise ValueError(f"Некорректный часовой пояс: {text}")
+        return timezone(-offset if match[1] == "-" else offset)
+    try:
+        return ZoneInfo(text)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Неизвестный часовой пояс: {text}")
+
+
+class Schedule:
+    """Тихие часы и часовой пояс пользователя (одинаковые настройки — один объект)."""
+    __slots__ = ("tz", "quiet_start", "quiet_end")
+
+    def __init__(self, tz, quiet_start, quiet_end):
+        self.tz = tz
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+
+    def local(self, ts):
+        return datetime.fromtimestamp(ts, self.tz)
+
+    def day_fraction(self, local):
+        """Доля времени бодрствования, прошедшая к моменту local; None в тихие часы."""
+        minute = local.hour * 60 + local.minute
+        elapsed = (minute - self.quiet_end) % MINUTES_PER_DAY
+        window = (self.quiet_start - self.quiet_end) % MINUTES_PER_DAY or MINUTES_PER_DAY
+        if elapsed >= window:
+            return None
+        return elapsed / window
+
+    def next_check(self, ts, interval):
+        """Время следующей проверки: через interval, а если это тихие часы — через interval после них."""
+        due = ts + interval
+        local = self.local(due)
+        if self.day_fraction(local) is None:
+            minute = local.hour * 60 + local.minute
+            due += (self.quiet_end - minute) % MINUTES_PER_DAY * 60 - local.second + interval
+        return due
+
+
+class ReminderScheduler:
+    def __init__(self, users, storage, interval=None, tick=None, queue_size=None):
+        self.users = users
+        self.storage = storage
+        self.interval = interval or config.REMINDER_INTERVAL
+        self.tick_interval = tick or config.REMINDER_TICK
+        self.queue_size = queue_size or config.REMINDER_QUEUE_SIZE
+        self.stats = {"checked": 0, "sent": 0, "failed": 0}
+
+        self._schedules = {}  # user_id -> Schedule
+        self._shared = {}  # (пояс, тихие часы) -> Schedule
+        self._due = {}  # user_id -> время ближайшей проверки
+        self._heap = []  # (время, user_id); записи, не совпадающие с _due, устарели
+        self._food_reminded = {}  # user_id -> день (ordinal), когда уже напомнили о еде
+        self._queue = None
+        self._tasks = []
+        self._job = None
+
+    def __len__(self):
+        return len(self._due)
+
+    @property
+    def pending(self):
+        """Напоминания, ожидающие отправки."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def schedule_for(self, settings):
+        """Schedule по настройкам из профиля; ValueError, если они некорректны."""
+        tz = settings.get("tz", config.REMINDER_TIMEZONE)
+        quiet = settings.get("quiet") or config.REMINDER_QUIET_HOURS
+        schedule = self._shared.get((tz, quiet))
+        if schedule is None:
+            schedule = self._shared[tz, quiet] = Schedule(parse_timezone(tz), *parse_quiet_hours(quiet))
+        return schedule
+
+    # --- Расписание
+
+    def update(self, user_id, settings, now=None):
+        """Включает, перенастраивает или (settings без enabled) выключает напоминания пользователя."""
+        if not settings or not settings.get("enabled"):
+            self.remove(user_id)
+            return
+        schedule = self._schedules[user_id] = self.schedule_for(settings)
+        due = schedule.next_check(now or time.time(), self.interval)
+        self._due[user_id] = due
+        heapq.heappush(self._heap, (due, user_id))
+
+    def remove(self, user_id):
+        self._schedules.pop(user_id, None)
+        self._due.pop(user_id, None)
+        self._food_reminded.pop(user_id, None)
+
+    def load(self, entries, now=None):
+        """
+        Расписание всех пользователей при старте: [(user_id, настройки)].
+        Первые проверки разбросаны по интервалу, чтобы не шли разом.
+        """
+        now = now or time.time()
+        for user_id, settings in entries:
+            try:
+                schedule = self._schedules[user_id] = self.schedule_for(settings)
+            except ValueError as e:
+                logger.warning(f"Напоминания пользователя {user_id} пропущены: {e}")
+                continue
+            due = schedule.next_check(now, random.uniform(0, self.interval))
+            self._due[user_id] = due
+            self._heap.append((due, user_id))
+        heapq.heapify(self._heap)
+
+    # --- Проверка
+
+    def check(self, user_id, ts):
+        """Текст напоминания, если пользователь отстает от нормы к этому часу, иначе None."""
+        schedule = self._schedules[user_id]
+        local = schedule.local(ts)
+        fraction = schedule.day_fraction(local)
+        # Только загруженные пользователи: чтение из базы здесь остановило бы цикл событий
+        user_data = self.users.peek(user_id)
+        if fraction is None or not user_data or "water_goal" not in user_data:
+            return None
+
+        day_start = int(local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+        lines = []
+        water = sum(user_data["water_logs"].range_arrays(day_start, ts + 1)[1])
+        expected = user_data["water_goal"] * fraction
+        if expected - water >= GLASS and water < expected * PACE_TOLERANCE:
+            lines.append(f"💧 К {local:%H:%M} стоит выпить около {round(expected, -1):.0f} мл, "
+                         f"а записано {water:.0f} мл. Выпейте стакан воды: /log_water {GLASS}")
+
+        calorie_goal = user_data.get("calorie_goal") or 0
+        today = local.toordinal()
+        if fraction >= 0.5 and self._food_reminded.get(user_id) != today:
+            food = sum(user_data["food_logs"].range_arrays(day_start, ts + 1)[1])
+            if food < calorie_goal * fraction * FOOD_PACE_TOLERANCE:
+                self._food_reminded[user_id] = today
+                lines.append(f"🍽 За сегодня записано {food:.0f} ккал из {calorie_goal:.0f}. "
+                             "Не забудьте поесть и записать еду: /log_food <продукт>")
+        return "\n".join(lines) or None
+
+    def tick(self, now=None):
+        """
+        Снимает с кучи наступившие проверки, ставит напоминания в очередь
+        отправки и планирует следующие проверки. Если очередь заполнена,
+        оставшиеся проверки ждут следующего тика. Возвращает число проверок.
+        """
+        now = now or time.time()
+        checked = 0
+        while self._heap and self._heap[0][0] <= now:
+            if self._queue is not None and self._queue.qsize() >= self.queue_size:
+                break
+            due, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) != due:
+                continue  # напоминания выключены или перенастроены
+            checked += 1
+            try:
+                text = self.check(user_id, now)
+            except Exception as e:
+                logger.error(f"Ошибка проверки напоминаний пользователя {user_id}: {e!r}")
+                text = None
+            if text is not None and self._queue is not None:
+                self._queue.put_nowait((user_id, text))
+            due = self._schedules[user_id].next_check(now, self.interval)
+            self._due[user_id] = due
+            heapq.heappush(self._heap, (due, user_id))
+        self.stats["checked"] += checked
+        return checked
+
+    # --- Отправка
+
+    async def _send(self, bot, user_id, text):
+        try:
+            await bot.send_message(chat_id=user_id, text=text, rate_limit_args={"priority": BULK})
+            self.stats["sent"] += 1
+            return
+        except Forbidden:
+            # Пользователь заблокировал бота — больше не напоминаем
+            self.disable(user_id)
+        except TelegramError as e:
+            # В том числе RetryAfter, если повторы в outbound.py не помогли
+            logger.warning(f"Не удалось отправить напоминание {user_id}: {e!r}")
+        self.stats["failed"] += 1
+
+    def disable(self, user_id):
+        self.remove(user_id)
+        # Только загруженный пользователь (проверенный перед отправкой) — без чтения из базы в цикле событий
+        user_data = self.users.peek(user_id)
+        if user_data and user_data.get("reminders"):
+            user_data["reminders"]["enabled"] = False
+            self.storage.save_profile(user_id, user_data)
+
+    async def _send_loop(self, bot):
+        while True:
+            user_id, text = await self._queue.get()
+            try:
+                await self._send(bot, user_id, text)
+            except Exception as e:
+                logger.error(f"Ошибка отправки напоминания {user_id}: {e!r}")
+
+    def _due_users(self, now):
+        """Пользователи с наступившей проверкой, еще не загруженные в память."""
+        # Обход кучи от корня: дальше записей позже now спускаться не нужно
+        found = []
+        stack = [0] if self._heap else []
+        while stack:
+            i = stack.pop()
+            due, user_id = self._heap[i]
+            if due > now:
+                continue
+            if self._due.get(user_id) == due and self.users.peek(user_id) is None:
+                found.append(user_id)
+            stack.extend(j for j in (2 * i + 1, 2 * i + 2) if j < len(self._heap))
+        return found
+
+    def _load_users(self, user_ids):
+        return [(user_id, self.storage.load_user(user_id)) for user_id in user_ids]
+
+    async def tick_async(self):
+        """tick(), но незагруженных пользователей сначала читает из хранилища в потоке."""
+        now = time.time()
+        missing = self._due_users(now)
+        if missing:
+            for user_id, user_data in await asyncio.to_thread(self._load_users, missing):
+                self.users.add_loaded(user_id, user_data)
+        return self.tick(now)
+
+    async def _safe_tick(self):
+        # Ошибка одного тика (например, чтения из базы) не должна останавливать проверки
+        try:
+            await self.tick_async()
+        except Exception as e:
+            logger.error(f"Ошибка проверки напоминаний: {e!r}")
+
+    async def _tick_job(self, context):
+        await self._safe_tick()
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            await self._safe_tick()
+
+    def start(self, application):
+        """Запускает отправку и проверки (после старта приложения, внутри цикла событий)."""
+        self._queue = asyncio.Queue()
+        for _ in range(SENDERS):
+            self._tasks.append(asyncio.create_task(self._send_loop(application.bot)))
+        if application.job_queue is not None:
+            self._job = application.job_queue.run_repeating(
+                self._tick_job, interval=self.tick_interval, first=self.tick_interval, name="reminders")
+        else:
+            # job_queue есть только с python-telegram-bot[job-queue]
+            logger.warning("job_queue недоступна, проверки напоминаний идут в отдельной задаче")
+            self._tasks.append(asyncio.create_task(self._tick_loop()))
+
+    def stop(self):
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
@@ -0,0 +1,177 @@
+"""
+Отрисовка графиков в отдельных процессах.
+
+Отрисовка нагружает процессор и держит GIL, поэтому графики рисуются
+в пуле процессов. По умолчанию используется легкий рендерер без
+зависимостей (lite_chart.py); matplotlib (объектный API Figure + Agg,
+без глобального состояния pyplot) включается через RENDER_BACKEND и
+используется, если легкий рендерер не справился. Очередь на отрисовку
+ограничена: если все процессы заняты, пользователь получает сообщение
+"рисую график…", а если очередь переполнена — просьбу повторить позже.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """Очередь на отрисовку переполнена."""
+
+
+def _warm_up():
+    # Импортируем рендерер заранее, чтобы первый график не ждал импорта
+    if config.RENDER_BACKEND != "matplotlib":
+        import lite_chart  # noqa: F401
+        return
+    _import_matplotlib()
+
+
+def _import_matplotlib():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates  # noqa: F401  (регистрирует конвертеры для datetime)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def render_progress_png(title, water_times, water_values, food_times, food_values,
+                        water_goal=None, calorie_goal=None, daily=False):
+    """
+    Рисует два графика (вода и калории) и возвращает PNG в байтах:
+    накопительные суммы или, если daily, суммы по дням; water_goal и
+    calorie_goal рисуются горизонтальными линиями нормы.
+    Выполняется в процессе-воркере.
+    """
+    args = (title, water_times, water_values, food_times, food_values, water_goal, calorie_goal, daily)
+    if config.RENDER_BACKEND == "matplotlib":
+        return render_progress_png_matplotlib(*args)
+    import lite_chart
+    try:
+        return lite_chart.render_progress_png(*args)
+    except Exception:
+        logger.exception("Легкий рендерер не справился, рисуем через matplotlib")
+        return render_progress_png_matplotlib(*args)
+
+
+def render_progress_png_matplotlib(title, water_times, water_values, food_times, food_values,
+                                   water_goal=None, calorie_goal=None, daily=False):
+    _import_matplotlib()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(nrows=2, ncols=1)
+    fig.suptitle(title)
+
+    kind = "за день" if daily else "накопительно"
+
+    # --- Верхний график: Вода
+    if water_times:
+        axes[0].plot(water_times, water_values, marker='o', color='blue', label='Вода (мл)')
+    if water_goal:
+        axes[0].axhline(water_goal, linestyle='--', color='green', label='Норма')
+    axes[0].set_title(f"Вода ({kind})")
+    axes[0].set_xlabel("Время")
+    axes[0].set_ylabel("мл")
+    axes[0].grid(True)
+    axes[0].legend()
+
+    # --- Нижний график: Калории
+    if food_times:
+        axes[1].plot(food_times, food_values, marker='o', color='red', label=f'Калории ({kind})')
+    if calorie_goal:
+        axes[1].axhline(calorie_goal, linestyle='--', color='green', label='Норма')
+    axes[1].set_title(f"Калории ({kind})")
+    axes[1].set_xlabel("Время")
+    axes[1].set_ylabel("ккал")
+    axes[1].grid(True)
+    axes[1].legend()
+
+    fig.tight_layout()
+    for ax in axes:
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_ha('right')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+class RenderPool:
+    def __init__(self, workers=None, max_queue=None):
+        self.workers = workers or config.RENDER_WORKERS
+        self.max_queue = config.RENDER_QUEUE_SIZE if max_queue is None else max_queue
+        self.pending = 0  # задачи в работе и в очереди
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: воркеры не наследуют потоки и сокеты основного процесса
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+            )
+        return self._executor
+
+    def _replace_broken(self, executor):
+        # Несколько отрисовок могли упасть на одном пуле — заменяет его первая
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def warm_up(self):
+        """Запускает процессы пула заранее, чтобы первый график не ждал их старта."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, _warm_up) for _ in range(self.workers)))
+
+    @property
+    def saturated(self):
+        return self.pending >= self.workers
+
+    async def render(self, func, *args, on_wait=None):
+        """
+        Выполняет func(*args) в пуле процессов.
+
+        Если все воркеры заняты, перед ожиданием вызывается корутина on_wait().
+        Если очередь заполнена, выбрасывается RenderQueueFull.
+        """
+        if self.pending >= self.workers + self.max_queue:
+            raise RenderQueueFull()
+
+        must_wait = self.saturated
+        self.pending += 1
+        try:
+            if must_wait and on_wait is not None:
+                await on_wait()
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # Воркер умер (OOM, падение): пул больше не принимает задачи —
+                # создаем новый и повторяем один раз
+                logger.warning("Пул отрисовки сломан, запускаем новый")
+                self._replace_broken(executor)
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Общий пул для всего бота
+render_pool = RenderPool()
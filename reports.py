@@ -0,0 +1,464 @@
+"""
+Дневные отчеты и рекомендации для всех пользователей одним заданием.
+
+Раз в REPORT_INTERVAL задание собирает столбцы по всем пользователям
+(collect): нормы воды и калорий и суммы воды, еды и тренировок по дням
+за последние REPORT_DAYS дней (последний — сегодня). Для пользователей,
+загруженных в память, суммы берутся из индекса дней их DailyLog, для
+остальных — одним GROUP BY в хранилище. Затем build считает все сразу,
+по столбцам (NumPy, если установлен, иначе — тот же расчет на чистом Python):
+  - суммы за сегодня и выполнение норм в процентах;
+  - флаги рекомендаций — те же правила, что в /recommend;
+  - серию дней подряд с выполненной нормой воды (если серия занимает все
+    окно, она продолжается от значения прошлого запуска) и число дней,
+    когда калории были в норме;
+  - маленький график — выполнение нормы воды по дням уровнями 0..8,
+    /report рисует его строкой ▁▂▃▄▅▆▇█.
+
+Результат хранится в ReportStore столбцами, отсортированными по user_id:
+/recommend и /report находят свою строку бинарным поиском. Если логи или
+нормы пользователя изменились после расчета, его строка считается заново
+тем же кодом, но только для него.
+"""
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from itertools import repeat
+
+import config
+from aggregation import load_numpy
+from storage import LOG_KEYS
+
+logger = logging.getLogger(__name__)
+
+REPORT_DAYS = 7  # окно отчета и графика, дней (не меньше 2)
+CHART = " ▁▂▃▄▅▆▇█"  # уровень 0 — за день ничего не записано
+
+# Флаги рекомендаций (битовая маска)
+WATER_LOW = 1
+FOOD_HIGH = 2
+FOOD_LOW = 4
+BALANCE_HIGH = 8
+ACTIVITY_LOW = 16
+
+RECOMMENDATIONS = {
+    WATER_LOW: "Вы выпили недостаточно воды. Рекомендуем выпить еще стакан чистой воды.",
+    FOOD_HIGH: "Ваш рацион превышает дневную норму калорий. Попробуйте выбрать легкие блюда (например, овощной салат или суп), чтобы немного снизить потребление калорий.",
+    FOOD_LOW: "Вы потребляете меньше калорий, чем требуется. Убедитесь, что получаете достаточное количество питательных веществ.",
+    BALANCE_HIGH: "Ваш калорийный баланс довольно высок. Рекомендуем выполнить 30 минут кардио (например, бег или быструю ходьбу) для повышения расхода калорий.",
+    ACTIVITY_LOW: "Добавьте физической активности в свой день. Например, попробуйте 20–30 минут йоги или легкой зарядки.",
+}
+ALL_GOOD = "Отлично! Вы хорошо соблюдаете свои нормы."
+
+# Калории "в норме" — от 70% до 100% нормы, как в правилах рекомендаций
+CALORIES_LOW = 0.7
+
+
+def flags_for(water_goal, calorie_goal, water, food, burned):
+    """Флаги рекомендаций по сегодняшним суммам одного пользователя."""
+    flags = 0
+    # Выпито меньше 80% нормы
+    if water_goal - water > water_goal * 0.2:
+        flags |= WATER_LOW
+    if food > calorie_goal:
+        flags |= FOOD_HIGH
+    elif food < calorie_goal * CALORIES_LOW:
+        flags |= FOOD_LOW
+    # "Чистые" калории, остающиеся после активности
+    if food - burned > calorie_goal:
+        flags |= BALANCE_HIGH
+    elif burned < calorie_goal * 0.2:
+        flags |= ACTIVITY_LOW
+    return flags
+
+
+def rule_flags(water_goal, calorie_goal, water, food, burned):
+    """Те же правила сразу для столбцов NumPy."""
+    np = load_numpy()
+    flags = np.where(water_goal - water > water_goal * 0.2, WATER_LOW, 0)
+    flags |= np.where(food > calorie_goal, FOOD_HIGH, np.where(food < calorie_goal * CALORIES_LOW, FOOD_LOW, 0))
+    flags |= np.where(food - burned > calorie_goal, BALANCE_HIGH,
+                      np.where(burned < calorie_goal * 0.2, ACTIVITY_LOW, 0))
+    return flags.astype(np.uint8)
+
+
+def recommendation_text(flags):
+    lines = [text for flag, text in RECOMMENDATIONS.items() if flags & flag]
+    return "\n".join(lines) if lines else ALL_GOOD
+
+
+class Columns:
+    """
+    Входные данные задания, строка — пользователь. Суммы по дням лежат
+    плоско: days значений на пользователя, последнее — сегодня.
+    """
+
+    def __init__(self, today, days=REPORT_DAYS):
+        self.today = today
+        self.days = days
+        self.user_ids = array("q")
+        self.versions = array("q")
+        self.water_goal = array("d")
+        self.calorie_goal = array("d")
+        self.water = array("d")
+        self.food = array("d")
+        self.burned = array("d")
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def log_column(self, key):
+        return {"water_logs": self.water, "food_logs": self.food, "workout_logs": self.burned}[key]
+
+    def add_user(self, user_id, water_goal, calorie_goal, version):
+        """Добавляет строку с нулевыми суммами; возвращает ее номер."""
+        self.user_ids.append(user_id)
+        self.versions.append(version or 0)
+        self.water_goal.append(water_goal or 0)
+        self.calorie_goal.append(calorie_goal or 0)
+        for column in (self.water, self.food, self.burned):
+            column.extend(repeat(0.0, self.days))
+        return len(self.user_ids) - 1
+
+    def add_logs(self, row, user_data):
+        """Суммы по дням из индекса дней DailyLog пользователя."""
+        first = self.today.toordinal() - self.days + 1
+        for key in LOG_KEYS:
+            log = user_data.get(key)
+            if log is None:
+                continue
+            column = self.log_column(key)
+            for day, total in zip(*log.day_totals(date.fromordinal(first), self.today)):
+                column[row * self.days + day - first] = total
+
+
+def collect(users, storage, today, days=REPORT_DAYS, owns=None):
+    """
+    Столбцы для всех пользователей с настроенными нормами.
+    owns(user_id) — отбор своих пользователей (в режиме нескольких процессов).
+    """
+    columns = Columns(today, days)
+    # Загруженные пользователи — из памяти: там есть записи, которые еще
+    # не дошли до базы. list() — снимок, словарь меняется в цикле событий
+    loaded = [user_id for user_id in list(users) if owns is None or owns(user_id)]
+    skip = set(loaded)
+
+    rows = {}
+    for user_id, water_goal, calorie_goal, version in storage.profile_goals():
+        if user_id not in skip and (owns is None or owns(user_id)):
+            rows[user_id] = columns.add_user(user_id, water_goal, calorie_goal, version)
+    if rows:
+        first = today - timedelta(days=days - 1)
+        for key in LOG_KEYS:
+            column = columns.log_column(key)
+            for user_id, day, total in storage.log_day_totals(key, first, days):
+                row = rows.get(user_id)
+                if row is not None:
+                    column[row * days + day] = total
+
+    for user_id in loaded:
+        # peek: без чтения из базы и без изменения порядка выгрузки — здесь другой поток
+        user_data = users.peek(user_id)
+        if user_data is None or "water_goal" not in user_data:
+            continue
+        row = columns.add_user(user_id, user_data["water_goal"], user_data.get("calorie_goal"),
+                               user_data.get("log_version"))
+        columns.add_logs(row, user_data)
+    return columns
+
+
+# --- Расчет
+
+def _build_numpy(columns):
+    np = load_numpy()
+    n, days = len(columns), columns.days
+    ids = np.frombuffer(columns.user_ids, dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+
+    def column(values, width=1):
+        values = np.frombuffer(values, dtype=values.typecode)
+        return (values.reshape(n, width) if width > 1 else values)[order]
+
+    water_goal, calorie_goal = column(columns.water_goal), column(columns.calorie_goal)
+    water, food, burned = (column(values, days) for values in (columns.water, columns.food, columns.burned))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        water_att = np.where(water_goal[:, None] > 0, water / water_goal[:, None], 0.0)
+        food_att = np.where(calorie_goal[:, None] > 0, food / calorie_goal[:, None], 0.0)
+
+    met = water_att >= 1
+    # Серия до вчера включительно: argmin находит первый невыполненный день с конца
+    before = met[:, -2::-1]
+    streak_done = np.where(before.all(axis=1), days - 1, np.argmin(before, axis=1))
+    chart = np.where(water > 0, np.clip(np.ceil(water_att * 8), 1, 8), 0)
+
+    return {
+        "user_ids": ids[order],
+        "versions": column(columns.versions),
+        "water_goal": water_goal,
+        "calorie_goal": calorie_goal,
+        "water": water[:, -1].copy(),
+        "food": food[:, -1].copy(),
+        "burned": burned[:, -1].copy(),
+        "water_pct": np.rint(water_att[:, -1] * 100).astype(np.int32),
+        "food_pct": np.rint(food_att[:, -1] * 100).astype(np.int32),
+        "streak_done": streak_done.astype(np.int32),
+        "met_today": met[:, -1],
+        "calorie_days": ((food_att >= CALORIES_LOW) & (food_att <= 1)).sum(axis=1).astype(np.uint8),
+        "flags": rule_flags(water_goal, calorie_goal, water[:, -1], food[:, -1], burned[:, -1]),
+        "chart": chart.astype(np.uint8).ravel(),
+    }
+
+
+def _build_python(columns):
+    days = columns.days
+    result = {
+        "user_ids": array("q"), "versions": array("q"),
+        "water_goal": array("d"), "calorie_goal": array("d"),
+        "water": array("d"), "food": array("d"), "burned": array("d"),
+        "water_pct": array("i"), "food_pct": array("i"),
+        "streak_done": array("i"), "met_today": array("B"),
+        "calorie_days": array("B"), "flags": array("B"), "chart": array("B"),
+    }
+    for row in sorted(range(len(columns)), key=columns.user_ids.__getitem__):
+        water_goal, calorie_goal = columns.water_goal[row], columns.calorie_goal[row]
+        window = slice(row * days, (row + 1) * days)
+        water, food, burned = columns.water[window], columns.food[window], columns.burned[window]
+        water_att = [value / water_goal if water_goal > 0 else 0.0 for value in water]
+        food_att = [value / calorie_goal if calorie_goal > 0 else 0.0 for value in food]
+
+        streak = 0
+        for attainment in reversed(water_att[:-1]):
+            if attainment < 1:
+                break
+            streak += 1
+
+        result["user_ids"].append(columns.user_ids[row])
+        result["versions"].append(columns.versions[row])
+        result["water_goal"].append(water_goal)
+        result["calorie_goal"].append(calorie_goal)
+        result["water"].append(water[-1])
+        result["food"].append(food[-1])
+        result["burned"].append(burned[-1])
+        result["water_pct"].append(round(water_att[-1] * 100))
+        result["food_pct"].append(round(food_att[-1] * 100))
+        result["streak_done"].append(streak)
+        result["met_today"].append(water_att[-1] >= 1)
+        result["calorie_days"].append(sum(CALORIES_LOW <= value <= 1 for value in food_att))
+        result["flags"].append(flags_for(water_goal, calorie_goal, water[-1], food[-1], burned[-1]))
+        # Уровень графика — выполнение нормы с округлением вверх, от 1 до 8
+        result["chart"].extend(min(8, max(1, -int(-value * 8 // 1))) if total > 0 else 0
+                               for total, value in zip(water, water_att))
+    return result
+
+
+def _carry_streaks(result, previous, today, days):
+    """
+    Серия, занявшая все окно, могла начаться раньше него: продолжаем ее
+    от значения прошлого запуска (вчерашнего или сегодняшнего).
+    """
+    if previous is None or not len(previous):
+        return
+    shift = (today - previous.day).days
+    if shift not in (0, 1):
+        return
+    full = days - 1
+    streak = result["streak_done"]
+    if not isinstance(streak, array):  # столбцы NumPy
+        np = load_numpy()
+        rows = np.flatnonzero(streak == full)
+        old = previous.streaks_done(result["user_ids"][rows])
+        known = old >= 0
+        streak[rows[known]] = np.maximum(full, old[known] + shift)
+        return
+    for row, value in enumerate(streak):
+        if value == full:
+            old = previous.streak_done(result["user_ids"][row])
+            if old is not None:
+                streak[row] = max(full, old + shift)
+
+
+def build(columns, previous=None, use_numpy=True):
+    """
+    Отчеты по столбцам, отсортированные по user_id. previous — ReportStore
+    прошлого запуска (для серий длиннее окна).
+    """
+    if use_numpy and len(columns) and load_numpy() is not None:
+        result = _build_numpy(columns)
+    else:
+        result = _build_python(columns)
+    _carry_streaks(result, previous, columns.today, columns.days)
+    # Сегодняшний день добавляется к серии, как только норма выполнена
+    met_today = result.pop("met_today")
+    if isinstance(met_today, array):
+        result["streak"] = array("i", map(int.__add__, result["streak_done"], met_today))
+    else:
+        result["streak"] = result["streak_done"] + met_today
+    return result
+
+
+FIELDS = ("versions", "water_goal", "calorie_goal", "water", "food", "burned",
+          "water_pct", "food_pct", "streak", "calorie_days", "flags")
+
+
+def format_report(report):
+    chart = "".join(CHART[level] for level in report["chart"])
+    days = len(report["chart"])
+    return (
+        f"Отчет за {report['day']:%d.%m.%Y} (обновлен в {report['computed_at']:%H:%M}):\n"
+        f"- Вода: {report['water']:.0f} из {report['water_goal']:.0f} мл ({report['water_pct']}%).\n"
+        f"- Калории: {report['food']:.0f} из {report['calorie_goal']:.0f} ккал ({report['food_pct']}%), "
+        f"сожжено: {report['burned']:.0f} ккал.\n"
+        f"- Норма воды выполняется дней подряд: {report['streak']}.\n"
+        f"- Дней с калориями в норме за {days} дн.: {report['calorie_days']}.\n"
+        f"- Вода за {days} дн.: {chart}"
+    )
+
+
+class ReportStore:
+    """Последние рассчитанные отчеты: столбцы, отсортированные по user_id."""
+
+    def __init__(self):
+        self.day = None
+        self.days = REPORT_DAYS
+        self.computed_at = None
+        self._columns = None
+
+    def __len__(self):
+        return len(self._columns["user_ids"]) if self._columns else 0
+
+    def replace(self, day, days, columns, computed_at=None):
+        """Новые отчеты (результат build) целиком заменяют старые."""
+        self.day = day
+        self.days = days
+        self.computed_at = computed_at or datetime.now()
+        self._columns = columns
+
+    @property
+    def nbytes(self):
+        """Память под столбцы, байт."""
+        if not self._columns:
+            return 0
+        return sum(values.nbytes if hasattr(values, "nbytes") else values.itemsize * len(values)
+                   for values in self._columns.values())
+
+    def _row(self, user_id):
+        if not self._columns:
+            return None
+        ids = self._columns["user_ids"]
+        if isinstance(ids, array):
+            i = bisect_left(ids, user_id)
+        else:
+            i = int(load_numpy().searchsorted(ids, user_id))
+        return i if i < len(ids) and ids[i] == user_id else None
+
+    def streak_done(self, user_id):
+        i = self._row(user_id)
+        return None if i is None else int(self._columns["streak_done"][i])
+
+    def streaks_done(self, user_ids):
+        """streak_done для массива NumPy user_ids; -1 — пользователя нет в отчетах."""
+        np = load_numpy()
+        ids = np.asarray(self._columns["user_ids"])
+        rows = np.searchsorted(ids, user_ids)
+        rows[rows == len(ids)] = 0
+        return np.where(ids[rows] == user_ids, np.asarray(self._columns["streak_done"])[rows], -1)
+
+    def get(self, user_id):
+        """Отчет пользователя (словарь) или None."""
+        i = self._row(user_id)
+        if i is None:
+            return None
+        report = {}
+        for field in FIELDS:
+            value = self._columns[field][i]
+            report[field] = value.item() if hasattr(value, "item") else value  # скаляр NumPy -> число
+        report["chart"] = [int(level) for level in self._columns["chart"][i * self.days:(i + 1) * self.days]]
+        report["day"] = self.day
+        report["computed_at"] = self.computed_at
+        return report
+
+    def fresh(self, user_id, user_data, today):
+        """Готовый отчет за сегодня, если логи и нормы не менялись после расчета, иначе None."""
+        report = self.get(user_id) if self.day == today else None
+        if (report is not None
+                and report["versions"] == user_data.get("log_version", 0)
+                and report["water_goal"] == user_data.get("water_goal")
+                and report["calorie_goal"] == (user_data.get("calorie_goal") or 0)):
+            return report
+        return None
+
+    def lookup(self, user_id, user_data, today):
+        """Отчет за сегодня: готовый или пересчитанный только для этого пользователя."""
+        report = self.fresh(user_id, user_data, today)
+        if report is not None:
+            return report
+        columns = Columns(today, self.days)
+        row = columns.add_user(user_id, user_data.get("water_goal"), user_data.get("calorie_goal"),
+                               user_data.get("log_version"))
+        columns.add_logs(row, user_data)
+        single = ReportStore()
+        single.replace(today, self.days, build(columns, self, use_numpy=False))
+        return single.get(user_id)
+
+
+class DailyReports:
+    """Задание, которое раз в REPORT_INTERVAL пересчитывает отчеты всех пользователей."""
+
+    def __init__(self, users, storage, interval=None, owns=None):
+        self.users = users
+        self.storage = storage
+        self.interval = interval or config.REPORT_INTERVAL
+        self.owns = owns
+        self.store = ReportStore()
+        self.stats = {"runs": 0, "failed": 0}
+        self._running = False
+        self._task = None
+        self._job = None
+
+    async def run(self):
+        """Один пересчет; сбор и расчет идут в отдельном потоке."""
+        if self._running:
+            return  # прошлый пересчет еще идет
+        self._running = True
+        started = time.perf_counter()
+        today = date.today()
+        try:
+            columns = await asyncio.to_thread(collect, self.users, self.storage, today, owns=self.owns)
+            result = await asyncio.to_thread(build, columns, self.store)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Ошибка расчета отчетов: {e!r}")
+            return
+        finally:
+            self._running = False
+        self.store.replace(today, columns.days, result)
+        self.stats["runs"] += 1
+        logger.info(f"Отчеты пересчитаны: {len(self.store)} польз. за {time.perf_counter() - started:.2f} с")
+
+    async def _run_job(self, context):
+        await self.run()
+
+    async def _run_loop(self):
+        while True:
+            await self.run()
+            await asyncio.sleep(self.interval)
+
+    def start(self, application):
+        """Первый пересчет — сразу после старта, дальше раз в interval секунд."""
+        if application.job_queue is not None:
+            self._job = application.job_queue.run_repeating(
+                self._run_job, interval=self.interval, first=0, name="reports")
+        else:
+            # job_queue есть только с python-telegram-bot[job-queue]
+            self._task = asyncio.create_task(self._run_loop())
+
+    def stop(self):
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,63 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+Обработчики ведут многошаговые диалоги (users[user_id]["step"],
+"pending_food"), поэтому два обновления одного пользователя нельзя
+обрабатывать одновременно. PerUserUpdateProcessor обрабатывает обновления
+разных пользователей параллельно (не больше max_concurrent_updates сразу),
+а обновления одного пользователя — строго по очереди, в порядке поступления.
+
+Блокировка пользователя живет, только пока у него есть обновления
+в работе или в ожидании, потом удаляется — память не растет с числом
+пользователей.
+"""
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # user_id -> [asyncio.Lock, число обновлений в работе и в ожидании]
+
+    @staticmethod
+    def _key(update):
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat is not None else None
+
+    @property
+    def active_users(self):
+        return len(self._locks)
+
+    async def process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        # Сначала очередь пользователя, потом общий лимит: ожидающие
+        # обновления одного пользователя не занимают общие слоты
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,232 @@
+"""
+Режим нескольких процессов: пользователи разделены между воркерами.
+
+Один процесс бота упирается в одно ядро: обработчики, разбор обновлений и
+отправка ответов конкурируют за GIL. В этом режиме front-процесс только
+получает обновления (long polling или webhook, по BOT_MODE) и, не разбирая
+их, раскладывает по воркерам: обновление пользователя user_id уходит
+воркеру shard_for(user_id) через multiprocessing.Queue, пачками.
+
+Каждый воркер — обычный bot.py со своим Application (те же обработчики,
+process_update через очередь Application) и своей частью пользователей:
+словарь users, кэши графиков и напоминания только для своего шарда.
+Все обновления одного пользователя попадают в один воркер и в одну
+очередь, так что порядок их обработки сохраняется. Хранилище общее
+(SQLite в режиме WAL), но каждый воркер пишет только строки своих
+пользователей. Метрики воркера i — на METRICS_PORT + 1 + i. Лимит
+исходящих сообщений OUTBOUND_GLOBAL_RATE делится между воркерами.
+
+Запуск:
+    python sharding.py              # SHARD_WORKERS воркеров (по умолчанию — по числу ядер)
+    python sharding.py --workers 4
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+
+import config
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30  # сек, long polling getUpdates
+POLL_LIMIT = 100  # обновлений за один getUpdates (максимум Telegram)
+
+
+def shard_for(user_id, count):
+    return user_id % count
+
+
+def update_user_id(data):
+    """user_id (или chat_id) из обновления в виде словаря; 0, если его нет."""
+    for value in data.values():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user")
+            if user:
+                return user["id"]
+            chat = value.get("chat")
+            if chat:
+                return chat["id"]
+    return 0
+
+
+# --- Воркер
+
+def _worker_main(index, count, queue, env):
+    # Настройки читаются при импорте config (он уже импортирован этим
+    # модулем), поэтому меняем окружение и перечитываем config до импорта бота
+    os.environ.update(env)
+    os.environ["SHARD_INDEX"] = str(index)
+    os.environ["SHARD_COUNT"] = str(count)
+    importlib.reload(config)
+    if config.METRICS_PORT:
+        config.METRICS_PORT += 1 + index
+    # Лимит Telegram — на токен бота, а не на процесс: воркеры делят его поровну.
+    # Чат принадлежит одному воркеру, так что лимит на чат не меняется
+    config.OUTBOUND_GLOBAL_RATE /= count
+    import bot
+
+    try:
+        asyncio.run(_serve_shard(bot.build_application(), queue))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve_shard(application, queue):
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    async with application:
+        # Как в run_webhook: post_init/post_shutdown вызываем сами
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, queue.get)
+                if batch is None:
+                    break
+                for data in batch:
+                    await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            await application.stop()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+
+# --- Front-процесс
+
+class ShardRouter:
+    """Процессы-воркеры и раскладка обновлений между ними."""
+
+    def __init__(self, workers=None, env=None):
+        """env — переменные окружения для воркеров: словарь или список словарей (свой каждому)."""
+        self.count = workers or config.SHARD_WORKERS
+        self.env = env if isinstance(env, list) else [env or {}] * self.count
+        self.routed = [0] * self.count
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue() for _ in range(self.count)]
+        self._processes = [None] * self.count
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=_worker_main, args=(index, self.count, self._queues[index], self.env[index]),
+            name=f"bot-shard-{index}", daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+        logger.info(f"Запущено воркеров: {self.count}")
+
+    def check_workers(self):
+        """Перезапускает упавшие воркеры; их очереди (и обновления в них) сохраняются."""
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                logger.error(f"Воркер {index} завершился (код {process.exitcode}), перезапускаем")
+                self._spawn(index)
+
+    def dispatch(self, updates):
+        """Раскладывает пачку обновлений (словари Bot API) по воркерам, сохраняя порядок."""
+        batches = [[] for _ in range(self.count)]
+        for data in updates:
+            batches[shard_for(update_user_id(data), self.count)].append(data)
+        for index, batch in enumerate(batches):
+            if batch:
+                self._queues[index].put(batch)
+                self.routed[index] += len(batch)
+
+    def stop(self, timeout=30):
+        """Воркеры дообрабатывают очередь и останавливаются."""
+        for queue in self._queues:
+            queue.put(None)
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+
+
+async def poll(router):
+    """Long polling: getUpdates без разбора обновлений — сразу по воркерам."""
+    import httpx
+
+    base = f"{config.TELEGRAM_BASE_URL}{config.TELEGRAM_TOKEN}"
+    offset = 0
+    async with httpx.AsyncClient(timeout=POLL_TIMEOUT + config.HTTP_TIMEOUT) as client:
+        # Как run_polling: обновления не придут, пока установлен webhook
+        await client.post(f"{base}/deleteWebhook")
+        while True:
+            try:
+                response = await client.post(f"{base}/getUpdates",
+                                             json={"offset": offset, "timeout": POLL_TIMEOUT, "limit": POLL_LIMIT})
+                payload = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"getUpdates: {e!r}")
+                await asyncio.sleep(1)
+                continue
+            if not payload.get("ok"):
+                delay = (payload.get("parameters") or {}).get("retry_after", 1)
+                logger.warning(f"getUpdates: {payload.get('description')}")
+                await asyncio.sleep(delay)
+                continue
+            updates = payload["result"]
+            router.check_workers()
+            if updates:
+                router.dispatch(updates)
+                offset = updates[-1]["update_id"] + 1
+
+
+async def serve_webhook(router):
+    """Webhook: те же проверки, что у WebhookApp, но обновление уходит воркеру как есть."""
+    from telegram import Bot, Update
+
+    from webhook import WebhookApp, make_server, webhook_secret
+
+    class ShardWebhookApp(WebhookApp):
+        def parse(self, data):
+            if not isinstance(data, dict) or "update_id" not in data:
+                raise ValueError("нет update_id")
+            return data
+
+        async def deliver(self, update):
+            router.dispatch([update])
+
+    secret = webhook_secret()
+    if config.WEBHOOK_URL:
+        async with Bot(config.TELEGRAM_TOKEN, base_url=config.TELEGRAM_BASE_URL) as bot:
+            await bot.set_webhook(
+                url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            )
+    server = make_server(ShardWebhookApp(None, config.WEBHOOK_PATH, secret))
+    logger.info(f"Webhook слушает {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    await server.serve()
+
+
+def main():
+    import argparse
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Бот в нескольких процессах (пользователи по воркерам)")
+    parser.add_argument("--workers", type=int, help="число воркеров (по умолчанию SHARD_WORKERS)")
+    args = parser.parse_args()
+
+    router = ShardRouter(args.workers)
+    router.start()
+    try:
+        asyncio.run(serve_webhook(router) if config.BOT_MODE == "webhook" else poll(router))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Обновлений по воркерам: {router.routed}")
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Замер холодного старта: от запуска процесса до готовности бота
+и первого обработанного обновления.
+
+bot.py отмечает окончание этапов через mark(), report() возвращает
+таблицу длительностей. Режим замера без подключения к Telegram:
+    python bot.py --startup-timing
+"""
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age():
+    """Сколько секунд назад запущен процесс (Linux), иначе None."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+_origin = time.perf_counter() - (_process_age() or 0.0)
+_marks = [("интерпретатор", time.perf_counter() - _origin)]
+_seen = {"интерпретатор"}
+
+
+def mark(name):
+    """Отмечает окончание этапа name; возвращает секунды с запуска процесса."""
+    elapsed = time.perf_counter() - _origin
+    _marks.append((name, elapsed))
+    _seen.add(name)
+    return elapsed
+
+
+def mark_once(name):
+    """Как mark(), но только в первый раз; иначе возвращает None."""
+    if name in _seen:
+        return None
+    return mark(name)
+
+
+def report():
+    lines = [f"{'этап':<24}{'этап, мс':>10}{'с запуска, мс':>15}"]
+    previous = 0.0
+    for name, elapsed in _marks:
+        lines.append(f"{name:<24}{(elapsed - previous) * 1000:>10.0f}{elapsed * 1000:>15.0f}")
+        previous = elapsed
+    return "\n".join(lines)
@@ -0,0 +1,483 @@
+"""
+Хранилище профилей и логов пользователей.
+
+Обработчики по-прежнему работают со словарем users, но теперь это
+UserRegistry: профиль и история пользователя подгружаются из хранилища
+при первом обращении (а не все сразу при старте), а изменения
+записываются через небольшой API (save_profile, append_water, ...).
+
+Хранилища:
+  - MemoryStorage — ничего не сохраняет (прежнее поведение);
+  - SQLiteStorage — SQLite в режиме WAL, записи группируются и
+    фиксируются одной транзакцией в фоновом потоке;
+  - JournalStorage (journal.py) — все в памяти, изменения дописываются
+    в журнал на диске, при старте состояние восстанавливается из
+    снимка и журнала.
+"""
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import date, datetime
+
+import config
+from daily_logs import DailyLog
+
+logger = logging.getLogger(__name__)
+
+# Ключи словаря пользователя, которые хранятся отдельными таблицами
+LOG_KEYS = ("water_logs", "food_logs", "workout_logs")
+LOG_VALUE_COLUMNS = {"water_logs": "amount", "food_logs": "calories", "workout_logs": "calories"}
+WRITE_RETRY_DELAY = 0.1  # сек перед первым повтором пачки, дальше — вдвое больше
+MISSING_CACHE_SIZE = 100_000  # сколько ненайденных user_id помнить (LRU)
+
+
+class Storage:
+    """Интерфейс хранилища. Методы записи не обязаны выполняться сразу."""
+
+    # Пользователя можно выгрузить из памяти и прочитать заново (load_user)
+    evictable = False
+
+    def load_user(self, user_id):
+        """Возвращает словарь пользователя (профиль + логи) или None."""
+        return None
+
+    def save_profile(self, user_id, user_data):
+        pass
+
+    def reset_user(self, user_id):
+        """Удаляет историю пользователя (при повторной настройке профиля)."""
+        pass
+
+    def append_water(self, user_id, dt, amount):
+        pass
+
+    def append_food(self, user_id, dt, calories):
+        pass
+
+    def append_workout(self, user_id, dt, workout_type, duration, calories):
+        pass
+
+    def append_many(self, key, user_id, entries):
+        """
+        Пачка записей лога key (см. LOG_KEYS): [(datetime, значение)],
+        для тренировок — [(datetime, ккал, тип, минуты)].
+        """
+        pass
+
+    def user_ids(self):
+        """Все пользователи с сохраненным профилем."""
+        return []
+
+    def reminder_settings(self):
+        """Настройки напоминаний всех, у кого они включены: [(user_id, настройки)]."""
+        return []
+
+    def profile_goals(self):
+        """Нормы всех настроенных профилей: [(user_id, вода, калории, log_version)] по user_id."""
+        return []
+
+    def log_day_totals(self, key, first_date, days):
+        """
+        Суммы лога key по дням для всех пользователей: [(user_id, день, сумма)],
+        день — номер календарного дня (местное время сервера, как в DailyLog)
+        от first_date, от 0 до days - 1.
+        """
+        return []
+
+    def warm_up(self):
+        """Открывает соединения заранее, чтобы первый запрос их не ждал."""
+        pass
+
+    @property
+    def pending(self):
+        """Сколько изменений еще не записано."""
+        return 0
+
+    def flush(self):
+        """Дожидается записи всех изменений."""
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryStorage(Storage):
+    """Все данные живут только в памяти процесса."""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS water_logs (
+    user_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS food_logs (
+    user_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    calories REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workout_logs (
+    user_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    workout TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    calories REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS water_logs_user_ts ON water_logs (user_id, ts);
+CREATE INDEX IF NOT EXISTS food_logs_user_ts ON food_logs (user_id, ts);
+CREATE INDEX IF NOT EXISTS workout_logs_user_ts ON workout_logs (user_id, ts);
+"""
+
+_STOP = object()
+
+
+class SQLiteStorage(Storage):
+    evictable = True
+
+    def __init__(self, path=None, batch_size=None, flush_interval=None, retries=None):
+        self.path = path or config.SQLITE_PATH
+        self.batch_size = batch_size or config.STORAGE_BATCH_SIZE
+        self.flush_interval = config.STORAGE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.retries = config.STORAGE_WRITE_RETRIES if retries is None else retries
+        self.stats = {"batches": 0, "retries": 0, "failed": 0, "lost": 0}
+        self._local = threading.local()  # соединение для чтения у каждого потока
+        self._readers = []  # все такие соединения, для close()
+        self._writer = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _get_reader(self):
+        # Соединение открывается лениво: процессы отрисовки, которые
+        # импортируют bot.py, не должны трогать базу. У каждого потока свое:
+        # пользователей читают и цикл событий, и asyncio.to_thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False — только чтобы close() закрыл его из любого потока
+            conn = self._local.conn = self._connect(check_same_thread=False)
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def _put(self, item):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+                self._writer.start()
+        self._queue.put(item)
+
+    # --- Чтение
+
+    def load_user(self, user_id):
+        conn = self._get_reader()
+        row = conn.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user_data = json.loads(row[0])
+        for key in LOG_KEYS:
+            # Имена таблиц совпадают с ключами словаря пользователя
+            rows = conn.execute(f"SELECT ts, {LOG_VALUE_COLUMNS[key]} FROM {key} WHERE user_id = ? ORDER BY ts",
+                                (user_id,))
+            user_data[key] = DailyLog((datetime.fromtimestamp(ts), value) for ts, value in rows)
+        return user_data
+
+    def warm_up(self):
+        self._get_reader()
+
+    # --- Запись (через очередь фонового потока)
+
+    def save_profile(self, user_id, user_data):
+        profile = {k: v for k, v in user_data.items() if k not in LOG_KEYS}
+        self._put(("profile", user_id, json.dumps(profile, ensure_ascii=False)))
+
+    def reset_user(self, user_id):
+        for table in LOG_KEYS:
+            self._put(("sql", f"DELETE FROM {table} WHERE user_id = ?", (user_id,)))
+
+    def append_water(self, user_id, dt, amount):
+        self._put(("sql", "INSERT INTO water_logs VALUES (?, ?, ?)", (user_id, dt.timestamp(), amount)))
+
+    def append_food(self, user_id, dt, calories):
+        self._put(("sql", "INSERT INTO food_logs VALUES (?, ?, ?)", (user_id, dt.timestamp(), calories)))
+
+    def append_workout(self, user_id, dt, workout_type, duration, calories):
+        self._put(("sql", "INSERT INTO workout_logs VALUES (?, ?, ?, ?, ?)",
+                   (user_id, dt.timestamp(), workout_type, duration, calories)))
+
+    def append_many(self, key, user_id, entries):
+        if key == "workout_logs":
+            sql = "INSERT INTO workout_logs VALUES (?, ?, ?, ?, ?)"
+            rows = [(user_id, dt.timestamp(), workout_type, duration, calories)
+                    for dt, calories, workout_type, duration in entries]
+        else:
+            sql = f"INSERT INTO {key} VALUES (?, ?, ?)"
+            rows = [(user_id, dt.timestamp(), value) for dt, value in entries]
+        self._put(("many", sql, rows))
+
+    def user_ids(self):
+        return [row[0] for row in self._get_reader().execute("SELECT user_id FROM profiles ORDER BY user_id")]
+
+    def _read_all(self, sql, params=()):
+        # Отдельное соединение: вызывается из других потоков (при старте
+        # и из заданий). Профили целиком не разбираются — поля достает сам SQLite
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def reminder_settings(self):
+        rows = self._read_all(
+            "SELECT user_id, json_extract(data, '$.reminders') FROM profiles "
+            "WHERE json_extract(data, '$.reminders.enabled') = 1"
+        )
+        return [(user_id, json.loads(settings)) for user_id, settings in rows]
+
+    def profile_goals(self):
+        return self._read_all(
+            "SELECT user_id, json_extract(data, '$.water_goal'), json_extract(data, '$.calorie_goal'), "
+            "json_extract(data, '$.log_version') FROM profiles "
+            "WHERE json_extract(data, '$.water_goal') IS NOT NULL ORDER BY user_id"
+        )
+
+    def log_day_totals(self, key, first_date, days):
+        # Границы дней — местные полуночи, как у индекса дней DailyLog: в дни
+        # перевода часов сутки длиннее или короче 86400 секунд
+        bounds = [datetime.combine(date.fromordinal(first_date.toordinal() + i), datetime.min.time()).timestamp()
+                  for i in range(days + 1)]
+        ranges = ", ".join("(?, ?, ?)" for _ in range(days))
+        return self._read_all(
+            f"WITH days(day, start, end) AS (VALUES {ranges}) "
+            f"SELECT user_id, days.day, SUM({LOG_VALUE_COLUMNS[key]}) FROM {key} "
+            f"JOIN days ON ts >= days.start AND ts < days.end "
+            f"WHERE ts >= ? AND ts < ? GROUP BY user_id, days.day",
+            (*(value for i in range(days) for value in (i, bounds[i], bounds[i + 1])), bounds[0], bounds[-1]),
+        )
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._local = threading.local()
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            # Собираем пачку: все, что уже лежит в очереди, и то, что
+            # успеет прийти за flush_interval, фиксируем одной транзакцией
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+
+            items = [item for item in batch if item is not _STOP]
+            stop = len(items) < len(batch)
+            try:
+                if items:
+                    self._write_batch(conn, items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        # Транзакция при ошибке откатывается, так что пачку можно повторить
+        # (например, база занята другим процессом)
+        for attempt in range(self.retries + 1):
+            try:
+                self._commit(conn, batch)
+                self.stats["batches"] += 1
+                return
+            except sqlite3.Error as e:
+                if attempt == self.retries:
+                    logger.error(f"Ошибка записи в SQLite ({len(batch)} изменений): {e}")
+                    break
+                self.stats["retries"] += 1
+                logger.warning(f"Ошибка записи в SQLite, повтор {attempt + 1}: {e}")
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+        self.stats["failed"] += 1
+        # Пачка не записывается целиком — пишем изменения по одному,
+        # чтобы потерять только те, что не проходят сами
+        for item in batch:
+            try:
+                self._commit(conn, [item])
+            except sqlite3.Error as e:
+                self.stats["lost"] += 1
+                logger.error(f"Изменение не записано в SQLite: {e}")
+
+    @staticmethod
+    def _commit(conn, batch):
+        profiles = {}
+        with conn:
+            for item in batch:
+                if item[0] == "profile":
+                    # Из нескольких версий профиля достаточно последней
+                    profiles[item[1]] = item[2]
+                elif item[0] == "many":
+                    conn.executemany(item[1], item[2])
+                else:
+                    conn.execute(item[1], item[2])
+            conn.executemany(
+                "INSERT INTO profiles (user_id, data) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                profiles.items(),
+            )
+
+
+def create_storage(backend=None):
+    backend = backend or config.STORAGE_BACKEND
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend == "journal":
+        from journal import JournalStorage  # journal.py сам импортирует storage.py
+        return JournalStorage()
+    raise ValueError(f"Неизвестное хранилище: {backend}")
+
+
+class UserRegistry(MutableMapping):
+    """
+    Словарь пользователей с ленивой загрузкой из хранилища.
+    Пользователь читается из базы при первом обращении — в боте заранее,
+    в потоке (load_async), чтобы чтение не останавливало цикл событий.
+
+    Если хранилище позволяет (Storage.evictable), загруженных пользователей
+    не больше max_size: сверх него выгружаются давно не использованные —
+    не раньше чем через min_idle секунд после последнего обращения, когда
+    все их изменения уже записаны фоновым потоком хранилища.
+    """
+
+    def __init__(self, storage, max_size=None, min_idle=None):
+        self.storage = storage
+        self.max_size = config.USER_CACHE_SIZE if max_size is None else max_size
+        self.min_idle = config.USER_EVICT_IDLE if min_idle is None else min_idle
+        self._users = OrderedDict()  # от давно не использованных к недавним
+        self._used = {}  # user_id -> time.monotonic() последнего обращения
+        self.evicted = 0
+        # Кого уже искали в хранилище и не нашли. Ограничен: поток случайных
+        # user_id не должен расти без предела, старые просто ищутся заново
+        self._missing = OrderedDict()
+
+    def _touch(self, user_id):
+        self._users.move_to_end(user_id)
+        self._used[user_id] = time.monotonic()
+
+    def _add(self, user_id, user_data):
+        self._users[user_id] = user_data
+        self._touch(user_id)
+        if len(self._users) > self.max_size and self.storage.evictable:
+            self._evict()
+
+    def _evict(self):
+        deadline = time.monotonic() - self.min_idle
+        while len(self._users) > self.max_size:
+            user_id = next(iter(self._users))
+            if self._used[user_id] > deadline:
+                break  # остальные использовались еще позже
+            del self._users[user_id]
+            del self._used[user_id]
+            self.evicted += 1
+
+    def _remember_missing(self, user_id):
+        self._missing[user_id] = None
+        if len(self._missing) > MISSING_CACHE_SIZE:
+            self._missing.popitem(last=False)
+
+    def _load(self, user_id):
+        user_data = self._users.get(user_id)
+        if user_data is not None:
+            self._touch(user_id)
+            return user_data
+        if user_id in self._missing:
+            self._missing.move_to_end(user_id)
+            return None
+        user_data = self.storage.load_user(user_id)
+        if user_data is None:
+            self._remember_missing(user_id)
+        else:
+            self._add(user_id, user_data)
+        return user_data
+
+    async def load_async(self, user_id):
+        """Загружает пользователя заранее, читая хранилище в потоке."""
+        if user_id in self._users or user_id in self._missing:
+            return
+        user_data = await asyncio.to_thread(self.storage.load_user, user_id)
+        if user_data is None:
+            if user_id not in self._users:
+                self._remember_missing(user_id)
+        else:
+            self.add_loaded(user_id, user_data)
+
+    def __contains__(self, user_id):
+        return self._load(user_id) is not None
+
+    def __getitem__(self, user_id):
+        user_data = self._load(user_id)
+        if user_data is None:
+            raise KeyError(user_id)
+        return user_data
+
+    def peek(self, user_id):
+        """
+        Пользователь, если он уже загружен, иначе None — без обращения к
+        хранилищу и без изменения порядка выгрузки (можно из другого потока).
+        """
+        return self._users.get(user_id)
+
+    def add_loaded(self, user_id, user_data):
+        """
+        Добавляет пользователя, прочитанного из хранилища в другом потоке
+        (load_user). Если он уже загружен, остается загруженная версия.
+        """
+        if user_data is not None and user_id not in self._users:
+            self._missing.pop(user_id, None)
+            self._add(user_id, user_data)
+
+    def __setitem__(self, user_id, user_data):
+        self._missing.pop(user_id, None)
+        self._add(user_id, user_data)
+
+    def __delitem__(self, user_id):
+        del self._users[user_id]
+        del self._used[user_id]
+
+    def __iter__(self):
+        # Только загруженные пользователи
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
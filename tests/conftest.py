@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Модули бота и заглушки из benchmarks/ (stub_server.py)
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,40 @@
+import asyncio
+import io
+
+from history import import_records, import_records_async, read_records
+from storage import MemoryStorage, UserRegistry
+
+
+def test_import_skips_time_out_of_range():
+    data = io.StringIO(
+        '{"type": "water", "user_id": 1, "time": "2024-05-01T08:30:00", "amount": 250}\n'
+        '{"type": "water", "user_id": 1, "time": "1969-12-31T12:00:00", "amount": 300}\n'
+        '{"type": "food", "user_id": 1, "time": "0001-01-01T00:00:00", "calories": 100}\n'
+        '{"type": "food", "user_id": 1, "time": "2024-05-01T13:00:00", "calories": 420.5}\n'
+    )
+    users = UserRegistry(MemoryStorage())
+    result = import_records(read_records(data, "ndjson"), users, MemoryStorage(), chunk_size=2)
+
+    assert result["imported"] == 2
+    assert result["skipped"] == 2
+    assert result["errors"] == ["строка 2: некорректное время", "строка 3: некорректное время"]
+    assert len(users[1]["water_logs"]) == 1
+    assert len(users[1]["food_logs"]) == 1
+
+
+def test_import_async_merges_on_loop():
+    data = io.StringIO(
+        '{"type": "profile", "water_goal": 2500}\n'
+        '{"type": "water", "time": "2024-05-01T08:30:00", "amount": 250}\n'
+        '{"type": "water", "time": "2024-05-01T07:30:00", "amount": 200}\n'
+        'не json\n'
+    )
+    storage = MemoryStorage()
+    users = UserRegistry(storage)
+    users[7] = {}
+    result = asyncio.run(import_records_async(read_records(data, "ndjson"), users, storage, 7, chunk_size=2))
+
+    assert (result["imported"], result["skipped"]) == (3, 1)
+    assert users[7]["water_goal"] == 2500
+    assert list(users[7]["water_logs"].arrays()[1]) == [200, 250]
+    assert users[7]["log_version"] == 2
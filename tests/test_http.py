@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from http_client import UpstreamClient
+from stub_server import StubServer, upstreams_handler
+
+LATENCY = 0.2
+
+
+async def ticker(lags, stop, tick=0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - started - tick)
+
+
+def test_slow_upstream_does_not_block_event_loop():
+    async def run():
+        async with StubServer(upstreams_handler, latency=LATENCY) as stub:
+            client = UpstreamClient(concurrency={"openweathermap": 10})
+            lags, stop = [], asyncio.Event()
+            tick_task = asyncio.create_task(ticker(lags, stop))
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                client.get_json("openweathermap", stub.url + "/data/2.5/weather", {"q": f"City{i}"})
+                for i in range(20)
+            ))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await tick_task
+            await client.aclose()
+            return stub, results, elapsed, lags
+
+    stub, results, elapsed, lags = asyncio.run(run())
+    assert [r["main"]["temp"] for r in results] == [20.0] * 20
+    # Запросы идут параллельно (до лимита сервиса), цикл событий не блокируется
+    assert stub.max_in_flight == 10
+    assert elapsed < 20 * LATENCY / 2
+    assert max(lags) < LATENCY / 2
+
+
+def test_upstream_timeout_returns_none():
+    async def run():
+        async with StubServer(upstreams_handler, latency=LATENCY) as stub:
+            client = UpstreamClient(timeouts={"openweathermap": LATENCY / 4})
+            result = await client.get_json("openweathermap", stub.url + "/data/2.5/weather", {"q": "Moscow"})
+            await client.aclose()
+            return result
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from collections import Counter
+
+from telegram.ext import ExtBot
+
+from outbound import BULK, GLOBAL_BURST, OutboundLimiter
+from stub_server import StubServer, _chat_id, telegram_api_handler
+
+RATE = 40
+CHATS = 50
+FLOOD_CHAT = 999
+RETRY_AFTER = 1
+
+
+def flood_once_handler(on_send, on_flood):
+    """Bot API, который один раз отвечает 429 на сообщение в FLOOD_CHAT."""
+    api = telegram_api_handler(on_send=on_send)
+    flooded = []
+
+    def handler(method, path, query, body):
+        if path.endswith("/sendMessage") and _chat_id(body) == FLOOD_CHAT and not flooded:
+            flooded.append(True)
+            on_flood()
+            return 429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {RETRY_AFTER}",
+                         "parameters": {"retry_after": RETRY_AFTER}}
+        return api(method, path, query, body)
+
+    return handler
+
+
+def test_limiter_retries_after_429_and_holds_global_rate():
+    sent = []  # (время, chat_id)
+    floods = []
+    handler = flood_once_handler(lambda method, chat_id: sent.append((time.monotonic(), chat_id)),
+                                 lambda: floods.append(time.monotonic()))
+
+    async def run():
+        async with StubServer(handler) as stub:
+            limiter = OutboundLimiter(global_rate=RATE, chat_rate=10, chat_burst=3, max_retries=3)
+            bot = ExtBot("1:test", base_url=f"{stub.url}/bot", rate_limiter=limiter)
+            await bot.initialize()
+            try:
+                await asyncio.gather(
+                    *(bot.send_message(chat_id=FLOOD_CHAT, text="reply") for _ in range(3)),
+                    *(bot.send_message(chat_id=chat_id, text="bulk", rate_limit_args={"priority": BULK})
+                      for chat_id in range(1, CHATS + 1)),
+                )
+            finally:
+                await bot.shutdown()
+            return limiter.stats
+
+    stats = asyncio.run(run())
+
+    # Ничего не потеряно: запрос после 429 повторен
+    assert len(floods) == 1
+    assert stats == {"sent": CHATS + 3, "retried": 1, "failed": 0}
+    delivered = Counter(chat_id for _, chat_id in sent)
+    assert delivered[FLOOD_CHAT] == 3
+    assert all(delivered[chat_id] == 1 for chat_id in range(1, CHATS + 1))
+
+    # После 429 повтор и вся остальная отправка ждут retry_after; успевают
+    # дойти только запросы, уже отправленные до ответа 429
+    pause_end = floods[0] + RETRY_AFTER * 0.95
+    assert any(t >= pause_end for t, chat_id in sent if chat_id == FLOOD_CHAT)
+    times = sorted(t for t, _ in sent)
+    assert sum(1 for t in times if floods[0] < t < pause_end) <= 2
+
+    # В любую секунду уходит не больше RATE сообщений (плюс всплеск общего лимита)
+    for i, start in enumerate(times):
+        in_window = sum(1 for t in times[i:] if t < start + 1)
+        assert in_window <= RATE + GLOBAL_BURST
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from reminders import ReminderScheduler
+from storage import SQLiteStorage, UserRegistry
+
+
+def test_tick_loads_due_user_after_restart(tmp_path):
+    path = str(tmp_path / "bot.db")
+    storage = SQLiteStorage(path)
+    storage.save_profile(1, {"water_goal": 2500, "calorie_goal": 2000,
+                             "reminders": {"enabled": True, "quiet": "00:00-00:01"}})
+    storage.close()
+
+    # Перезапуск: соединение открыто в цикле событий, пользователь еще не загружен
+    storage = SQLiteStorage(path)
+    storage.warm_up()
+    users = UserRegistry(storage)
+    scheduler = ReminderScheduler(users, storage, interval=60)
+    scheduler.load(storage.reminder_settings(), now=time.time() - 3600)
+
+    async def tick():
+        scheduler._queue = asyncio.Queue()
+        return await scheduler.tick_async()
+
+    try:
+        assert asyncio.run(tick()) == 1
+        assert users.peek(1)["water_goal"] == 2500
+    finally:
+        storage.close()
@@ -0,0 +1,48 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from scheduler import PerUserUpdateProcessor
+
+USERS = 20
+UPDATES = 10
+MAX_CONCURRENT = 4
+
+
+def test_updates_of_one_user_are_handled_in_order():
+    processor = PerUserUpdateProcessor(MAX_CONCURRENT)
+    handled = {user_id: [] for user_id in range(USERS)}
+    running_users = set()
+    state = {"running": 0, "max_running": 0, "overlap": False}
+    rng = random.Random(1)
+
+    async def handle(user_id, seq, delay):
+        if user_id in running_users:
+            state["overlap"] = True
+        running_users.add(user_id)
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        await asyncio.sleep(delay)
+        handled[user_id].append(seq)
+        state["running"] -= 1
+        running_users.discard(user_id)
+
+    async def run():
+        await processor.initialize()
+        tasks = []
+        # Обновления приходят вперемешку, как от Telegram; обработка — разной длительности
+        for seq in range(UPDATES):
+            for user_id in rng.sample(range(USERS), USERS):
+                update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+                coroutine = handle(user_id, seq, rng.uniform(0, 0.005))
+                tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert all(seqs == list(range(UPDATES)) for seqs in handled.values())
+    assert not state["overlap"]
+    # Разные пользователи — параллельно, но не больше общего лимита
+    assert 1 < state["max_running"] <= MAX_CONCURRENT
+    # Блокировки пользователей удаляются, когда обновлений больше нет
+    assert processor.active_users == 0
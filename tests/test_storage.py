@@ -0,0 +1,59 @@
+import asyncio
+import time
+from datetime import date, datetime
+
+from daily_logs import DailyLog
+from storage import SQLiteStorage, UserRegistry
+
+
+def test_registry_evicts_idle_users_and_reloads_them(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "bot.db"))
+    users = UserRegistry(storage, max_size=2, min_idle=0)
+    try:
+        for user_id in (1, 2, 3):
+            users[user_id] = {"water_goal": 2000 + user_id}
+            storage.save_profile(user_id, users[user_id])
+        storage.flush()
+
+        assert list(users) == [2, 3]
+        assert users.evicted == 1
+        # Выгруженный пользователь читается заново, в потоке
+        asyncio.run(users.load_async(1))
+        assert users.peek(1)["water_goal"] == 2001
+        assert list(users) == [3, 1]
+    finally:
+        storage.close()
+
+
+def test_registry_keeps_recently_used_users(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "bot.db"))
+    users = UserRegistry(storage, max_size=1, min_idle=3600)
+    try:
+        users[1] = {}
+        users[2] = {}
+        assert len(users) == 2 and users.evicted == 0
+    finally:
+        storage.close()
+
+
+def test_log_day_totals_use_local_dates_across_dst(tmp_path, monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        storage = SQLiteStorage(str(tmp_path / "bot.db"))
+        # Переход на летнее время 10 марта 2024: эти сутки короче на час
+        entries = [(datetime(2024, 3, day, hour, 30), 100 * day + hour)
+                   for day in range(8, 13) for hour in (0, 12, 23)]
+        storage.append_many("water_logs", 1, entries)
+        storage.flush()
+        log = DailyLog(entries)
+
+        first = date(2024, 3, 8)
+        days, totals = log.day_totals(first, date(2024, 3, 12))
+        expected = {day - first.toordinal(): total for day, total in zip(days, totals)}
+        rows = storage.log_day_totals("water_logs", first, 5)
+        assert {day: total for _, day, total in rows} == expected
+        storage.close()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
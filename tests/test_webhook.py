@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from webhook import WebhookApp
+
+SECRET = "secret"
+
+
+async def post(app, body, token=SECRET):
+    sent = []
+
+    async def receive():
+        return {"body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(b"x-telegram-bot-api-secret-token", token.encode())]
+    await app({"type": "http", "path": "/telegram", "method": "POST", "headers": headers}, receive, send)
+    return sent[0]["status"]
+
+
+@pytest.mark.parametrize("body", [b"[]", b"1", b"null", b"not json"])
+def test_rejects_body_that_is_not_an_update(body):
+    app = WebhookApp(None, "/telegram", SECRET)
+    assert asyncio.run(post(app, body)) == 400
+
+
+def test_rejects_wrong_secret():
+    app = WebhookApp(None, "/telegram", SECRET)
+    assert asyncio.run(post(app, b"{}", token="forged")) == 403
+    assert app.rejected == 1
@@ -0,0 +1,18 @@
+"""
+Нормализация текста и триграммы для нечеткого поиска.
+
+Общие для индекса продуктов (products.py) и каталога тренировок
+(workouts.py); модуль ничего не импортирует из бота.
+"""
+import re
+
+
+def normalize(text):
+    """Нижний регистр, ё -> е, только буквы и цифры через один пробел."""
+    text = text.casefold().replace("ё", "е")
+    return " ".join(re.findall(r"\w+", text))
+
+
+def trigrams(norm):
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
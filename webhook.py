@@ -0,0 +1,149 @@
+"""
+Режим webhook: Telegram сам присылает обновления по HTTP.
+
+WebhookApp — ASGI-приложение, которое проверяет секретный токен
+(без него webhook не запускается: если WEBHOOK_SECRET не задан, секрет
+генерируется при старте и передается Telegram в set_webhook),
+разбирает обновление и кладет его в очередь Application; дальше оно
+обрабатывается теми же обработчиками, что и в режиме polling.
+Сервер — uvicorn, запускается в том же цикле событий, что и бот.
+"""
+import hmac
+import json
+import logging
+import secrets
+
+from telegram import Update
+
+import config
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024  # обновления Telegram намного меньше
+
+
+async def _respond(send, status, body=b""):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def webhook_secret():
+    """
+    Секрет для заголовка X-Telegram-Bot-Api-Secret-Token: WEBHOOK_SECRET или,
+    если он не задан, случайный — тогда webhook должен регистрировать сам
+    бот (нужен WEBHOOK_URL), иначе Telegram о секрете не узнает.
+    """
+    if config.WEBHOOK_SECRET:
+        return config.WEBHOOK_SECRET
+    if not config.WEBHOOK_URL:
+        raise RuntimeError("Для BOT_MODE=webhook задайте WEBHOOK_SECRET или WEBHOOK_URL")
+    logger.info("WEBHOOK_SECRET не задан, используется случайный секрет")
+    return secrets.token_urlsafe(32)
+
+
+class WebhookApp:
+    def __init__(self, application, path, secret):
+        if not secret:
+            raise ValueError("Webhook без секретного токена не запускается")
+        self.application = application
+        self.path = path
+        self.secret = secret.encode()
+        self.received = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["path"] == "/healthz":
+            await _respond(send, 200, b"ok")
+            return
+        if scope["path"] != self.path:
+            await _respond(send, 404)
+            return
+        if scope["method"] != "POST":
+            await _respond(send, 405)
+            return
+
+        headers = dict(scope["headers"])
+        token = headers.get(b"x-telegram-bot-api-secret-token", b"")
+        if not hmac.compare_digest(token, self.secret):
+            self.rejected += 1
+            await _respond(send, 403)
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_SIZE:
+                await _respond(send, 413)
+                return
+            if not message.get("more_body"):
+                break
+
+        try:
+            payload = json.loads(body)
+            # Обновление — JSON-объект; [] или 1 de_json не разберет
+            if not isinstance(payload, dict):
+                raise ValueError("обновление не JSON-объект")
+            update = self.parse(payload)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Некорректное обновление в webhook: {e!r}")
+            await _respond(send, 400)
+            return
+
+        # Отвечаем Telegram сразу, обработка идет в очереди Application
+        self.received += 1
+        await self.deliver(update)
+        await _respond(send, 200)
+
+    def parse(self, data):
+        return Update.de_json(data, self.application.bot)
+
+    async def deliver(self, update):
+        await self.application.update_queue.put(update)
+
+
+def make_server(app):
+    """uvicorn-сервер для ASGI-приложения app на WEBHOOK_LISTEN:WEBHOOK_PORT."""
+    import uvicorn
+
+    return uvicorn.Server(uvicorn.Config(
+        app,
+        host=config.WEBHOOK_LISTEN,
+        port=config.WEBHOOK_PORT,
+        lifespan="off",
+        log_level="warning",
+    ))
+
+
+async def run_webhook(application):
+    """Запускает бота в режиме webhook (вместо application.run_polling())."""
+    secret = webhook_secret()
+    app = WebhookApp(application, config.WEBHOOK_PATH, secret)
+    server = make_server(app)
+
+    async with application:
+        # run_polling() вызывает post_init/post_shutdown сам, здесь — вручную
+        if application.post_init:
+            await application.post_init(application)
+        if config.WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            )
+        await application.start()
+        logger.info(f"Webhook слушает {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        try:
+            await server.serve()
+        finally:
+            await application.stop()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
@@ -0,0 +1,182 @@
+"""
+Каталог тренировок для /log_workout.
+
+Виды активности загружаются из файла (config.WORKOUT_CATALOG_PATH, см.
+data/workouts.txt): у каждого есть категория, MET (метаболический
+эквивалент) и синонимы. Сожженные калории = MET × вес (кг) × часы.
+
+Все, что нужно для ответа, строится один раз при загрузке:
+  - словарь нормализованных названий, синонимов и их транслитерации
+    ("beg", "plavanie") для точного поиска;
+  - обратный индекс триграмм для нечеткого поиска (опечатки, другой
+    порядок слов) — коэффициент Жаккара, как в индексе продуктов;
+  - тексты подсказки и полного списка.
+"""
+import logging
+from collections import defaultdict
+
+import config
+from textutil import normalize, trigrams
+
+logger = logging.getLogger(__name__)
+
+MIN_SIMILARITY = 0.4  # ниже — считаем, что тренировка не найдена
+MAX_MESSAGE_LENGTH = 4000  # Telegram ограничивает сообщение 4096 символами
+HELP_EXAMPLES = 3  # примеров из каждой категории в подсказке
+
+TRANSLIT = dict(zip(
+    "абвгдежзийклмнопрстуфхцчшщъыьэюя",
+    ["a", "b", "v", "g", "d", "e", "zh", "z", "i", "y", "k", "l", "m", "n", "o", "p", "r",
+     "s", "t", "u", "f", "h", "ts", "ch", "sh", "sch", "", "y", "", "e", "yu", "ya"],
+))
+
+
+def transliterate(norm):
+    return "".join(TRANSLIT.get(char, char) for char in norm)
+
+
+class Workout:
+    __slots__ = ("name", "met", "category", "emoji")
+
+    def __init__(self, name, met, category, emoji):
+        self.name = name
+        self.met = met
+        self.category = category
+        self.emoji = emoji
+
+    @property
+    def water_bonus_per_30min(self):
+        # Интенсивные тренировки (от 6 MET) — больше воды
+        return 200 if self.met >= 6 else 100
+
+    def calories(self, weight, minutes):
+        return round(self.met * weight * minutes / 60)
+
+
+def read_catalog(path):
+    """Читает файл каталога: [(Workout, [синонимы])] в порядке файла."""
+    workouts = []
+    category, emoji = "Другое", "🏅"
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("["):
+                category, _, emoji = line[1:].partition("]")
+                emoji = emoji.strip() or "🏅"
+                continue
+            parts = [part.strip() for part in line.split(";")]
+            try:
+                met = float(parts[1])
+            except (IndexError, ValueError):
+                logger.warning(f"{path}:{line_no}: пропущена строка каталога тренировок")
+                continue
+            aliases = [alias.strip() for alias in parts[2].split(",")] if len(parts) > 2 else []
+            workouts.append((Workout(parts[0], met, category, emoji), [a for a in aliases if a]))
+    return workouts
+
+
+class WorkoutCatalog:
+    def __init__(self, entries):
+        """entries — [(Workout, [синонимы])], первым идет основное название."""
+        self.workouts = []
+        self._exact = {}  # нормализованное название/синоним -> Workout
+        self._keys = []  # [(Workout, число триграмм ключа)]
+        self._trigrams = defaultdict(list)  # триграмма -> номера ключей
+
+        for workout, aliases in entries:
+            self.workouts.append(workout)
+            for name in (workout.name, *aliases):
+                norm = normalize(name)
+                for key in {norm, transliterate(norm)}:
+                    if not key or key in self._exact:
+                        continue
+                    self._exact[key] = workout
+                    tris = trigrams(key)
+                    for tri in tris:
+                        self._trigrams[tri].append(len(self._keys))
+                    self._keys.append((workout, len(tris)))
+
+        self.help_text = self._build_help()
+        self.list_pages = self._build_list()
+
+    @classmethod
+    def load(cls, path=None):
+        return cls(read_catalog(path or config.WORKOUT_CATALOG_PATH))
+
+    def __len__(self):
+        return len(self.workouts)
+
+    def _scores(self, norm):
+        """Лучшее сходство для каждой тренировки: {Workout: коэффициент Жаккара}."""
+        tris = trigrams(norm)
+        shared = defaultdict(int)
+        for tri in tris:
+            for key in self._trigrams.get(tri, ()):
+                shared[key] += 1
+        best = {}
+        for key, count in shared.items():
+            workout, size = self._keys[key]
+            score = count / (len(tris) + size - count)
+            if score > best.get(workout, 0):
+                best[workout] = score
+        return best
+
+    def find(self, query):
+        """Тренировка по названию, синониму или похожему написанию; None, если не найдена."""
+        norm = normalize(query)
+        if not norm:
+            return None
+        workout = self._exact.get(norm)
+        if workout is not None:
+            return workout
+        scores = self._scores(norm)
+        if not scores:
+            return None
+        workout, score = max(scores.items(), key=lambda item: item[1])
+        return workout if score >= MIN_SIMILARITY else None
+
+    def suggest(self, query, limit=3):
+        """Несколько самых похожих тренировок (для ответа на неизвестное название)."""
+        norm = normalize(query)
+        scores = self._scores(norm) if norm else {}
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [workout for workout, _ in ranked[:limit]]
+
+    def _by_category(self):
+        categories = {}
+        for workout in self.workouts:
+            categories.setdefault((workout.category, workout.emoji), []).append(workout)
+        return categories
+
+    def _build_help(self):
+        lines = []
+        for (category, emoji), workouts in self._by_category().items():
+            # Для примеров — общие названия, без вариантов со скоростью
+            names = [w.name for w in workouts if not any(char.isdigit() for char in w.name)]
+            examples = ", ".join(names[:HELP_EXAMPLES])
+            lines.append(f"{emoji} {category}: {examples}…")
+        return (
+            "Используйте формат: /log_workout <тип тренировки> <время (мин)>.\n"
+            "Пример: /log_workout бег 30\n\n"
+            f"Видов активности в каталоге: {len(self.workouts)}, например:\n"
+            + "\n".join(lines)
+            + "\n\nПолный список: /workouts"
+        )
+
+    def _build_list(self):
+        pages = []
+        page = ""
+        for (category, emoji), workouts in self._by_category().items():
+            block = f"{emoji} {category}\n" + "\n".join(f"- {w.name}" for w in workouts) + "\n\n"
+            if page and len(page) + len(block) > MAX_MESSAGE_LENGTH:
+                pages.append(page.rstrip())
+                page = ""
+            page += block
+        if page:
+            pages.append(page.rstrip())
+        return pages
+
+
+catalog = WorkoutCatalog.load()